@@ -0,0 +1,359 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modelo_estrella import METRICAS, version_reglas
+
+# Bodega SQLite del modelo estrella (compartida por todas las sesiones y reinicios)
+DW_PATH = Path(os.environ.get("DASHBOARD_DW_PATH", "Datos/educacion_dw.db"))
+
+# Sentencias compiladas que SQLite guarda por conexión
+SENTENCIAS_PREPARADAS = 256
+
+# Resultados de agregación guardados por (versión, consulta, parámetros)
+_MAX_RESULTADOS = 128
+
+_PESO = 'poblaci_n_5_16'
+
+# Sumas parciales por celda (municipio, año): las agregaciones leen esta tabla y no los hechos
+COLUMNAS_CELDAS = ['id_geo', 'id_tiempo', 'filas'] + [
+    f"{prefijo}_{m}" for m in METRICAS for prefijo in ('suma', 'conteo', 'suma_pond', 'peso')]
+
+ESQUEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS metadatos (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS dim_tiempo (
+    id_tiempo INTEGER PRIMARY KEY,
+    a_o INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dim_geo (
+    id_geo INTEGER PRIMARY KEY,
+    id_departamento INTEGER NOT NULL,
+    c_digo_departamento TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    municipio TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hechos_educacion (
+    id_tiempo INTEGER NOT NULL REFERENCES dim_tiempo (id_tiempo),
+    id_geo INTEGER NOT NULL REFERENCES dim_geo (id_geo),
+    {", ".join(f"{col} REAL" for col in METRICAS)}
+);
+CREATE TABLE IF NOT EXISTS agregado_celdas (
+    id_geo INTEGER NOT NULL REFERENCES dim_geo (id_geo),
+    id_tiempo INTEGER NOT NULL REFERENCES dim_tiempo (id_tiempo),
+    filas INTEGER NOT NULL,
+    {", ".join(f"{col} REAL" for col in COLUMNAS_CELDAS[3:])}
+);
+"""
+
+# Se crean después de la carga masiva: construirlos una vez es más barato que mantenerlos fila a fila
+INDICES_SQL = """
+CREATE INDEX IF NOT EXISTS ix_hechos_geo_tiempo ON hechos_educacion (id_geo, id_tiempo);
+CREATE INDEX IF NOT EXISTS ix_hechos_tiempo ON hechos_educacion (id_tiempo);
+CREATE INDEX IF NOT EXISTS ix_geo_departamento ON dim_geo (departamento);
+CREATE INDEX IF NOT EXISTS ix_celdas_geo_tiempo ON agregado_celdas (id_geo, id_tiempo);
+"""
+
+# Columnas de agrupación de cada nivel de agregación
+NIVELES_SQL = {
+    'departamento_anio': ['g.departamento', 't.a_o'],
+    'municipio_anio': ['g.id_geo', 'g.municipio', 'g.departamento', 't.a_o'],
+    'departamento': ['g.departamento', 'g.c_digo_departamento'],
+    'municipio': ['g.id_geo', 'g.municipio', 'g.departamento'],
+    'anio': ['t.a_o'],
+}
+
+_local = threading.local()
+_escritura = threading.Lock()
+_en_curso: set = set()
+_en_curso_lock = threading.Lock()
+_modelo_leido: dict = {}
+_resultados: OrderedDict = OrderedDict()
+_resultados_lock = threading.Lock()
+
+
+# ===================================================================
+# Función: conectar
+# ===================================================================
+def conectar(ruta: Path = DW_PATH) -> sqlite3.Connection:
+    """
+    Devuelve la conexión del hilo actual a la bodega, creando el esquema si hace falta.
+
+    En modo WAL los lectores de otras sesiones no se bloquean mientras se escribe.
+
+    Returns:
+        sqlite3.Connection: Conexión reutilizada por hilo (con caché de sentencias preparadas).
+    """
+    ruta = Path(ruta)
+    conexiones = getattr(_local, "conexiones", None)
+    if conexiones is None:
+        conexiones = _local.conexiones = {}
+    con = conexiones.get(ruta)
+    if con is None:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(ruta, timeout=30, cached_statements=SENTENCIAS_PREPARADAS)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA foreign_keys=ON")
+        con.executescript(ESQUEMA_SQL)
+        conexiones[ruta] = con
+    return con
+
+
+def cerrar(ruta: Path = DW_PATH):
+    """Cierra la conexión del hilo actual a la bodega, si existe."""
+    con = getattr(_local, "conexiones", {}).pop(Path(ruta), None)
+    if con is not None:
+        con.close()
+
+
+def version_guardada(ruta: Path = DW_PATH) -> Optional[str]:
+    """Versión (huella) del modelo guardado en la bodega, o None si está vacía."""
+    fila = conectar(ruta).execute("SELECT valor FROM metadatos WHERE clave = 'version'").fetchone()
+    return fila[0] if fila else None
+
+
+def version_crudo(ruta: Path = DW_PATH) -> Optional[str]:
+    """
+    Huella del dataset crudo del que salió el modelo guardado, si se conoce.
+
+    Con ella una sesión que recibe ese mismo crudo (ej. el snapshot que dejó el
+    ETL programado, ver `etl.py`) lee el modelo de la bodega en vez de repetir el pipeline.
+    """
+    if not Path(ruta).exists():
+        return None
+    fila = conectar(ruta).execute("SELECT valor FROM metadatos WHERE clave = 'version_crudo'").fetchone()
+    # Un modelo armado con otras reglas de limpieza (u otro registro DIVIPOLA) no corresponde a este crudo
+    crudo, _, reglas = fila[0].rpartition("/") if fila else (None, "", None)
+    return crudo if reglas == version_reglas() else None
+
+
+def _registrar_crudo(con: sqlite3.Connection, crudo: Optional[str]):
+    if crudo is None:
+        con.execute("DELETE FROM metadatos WHERE clave = 'version_crudo'")
+    else:
+        con.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('version_crudo', ?)",
+                    (f"{crudo}/{version_reglas()}",))
+
+
+def _filas(df: pd.DataFrame, columnas: list):
+    # tolist() entrega tipos nativos de Python, que es lo que acepta sqlite3
+    return zip(*(df[col].tolist() for col in columnas))
+
+
+def _celdas(df_fact: pd.DataFrame) -> pd.DataFrame:
+    """Sumas, conteos y sumas ponderadas por (id_geo, id_tiempo), calculadas con bincount."""
+    n_tiempo = int(df_fact['id_tiempo'].max()) if len(df_fact) else 0
+    # `id_geo` es el código DIVIPOLA (no consecutivo): las celdas presentes salen de `np.unique`
+    celda = df_fact['id_geo'].to_numpy(np.int64) * n_tiempo + df_fact['id_tiempo'].to_numpy(np.int64) - 1
+    presentes, celda = np.unique(celda, return_inverse=True)
+    n = len(presentes)
+    peso = df_fact[_PESO].to_numpy(np.float64)
+
+    columnas = {
+        'id_geo': presentes // n_tiempo,
+        'id_tiempo': presentes % n_tiempo + 1,
+        'filas': np.bincount(celda, minlength=n),
+    }
+    for m in METRICAS:
+        valores = df_fact[m].to_numpy(np.float64)
+        validos = ~np.isnan(valores)
+        con_peso = validos & ~np.isnan(peso)
+        columnas[f"suma_{m}"] = np.bincount(celda, np.where(validos, valores, 0.0), n)
+        columnas[f"conteo_{m}"] = np.bincount(celda, validos, n)
+        columnas[f"suma_pond_{m}"] = np.bincount(celda, np.where(con_peso, valores * peso, 0.0), n)
+        columnas[f"peso_{m}"] = np.bincount(celda, np.where(con_peso, peso, 0.0), n)
+    return pd.DataFrame(columnas)
+
+
+# ===================================================================
+# Función: guardar_modelo
+# ===================================================================
+def guardar_modelo(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                   version: str, ruta: Path = DW_PATH, crudo: Optional[str] = None) -> bool:
+    """
+    Reemplaza el contenido de la bodega con el modelo estrella en una sola transacción.
+
+    Usa `executemany` para la carga masiva y recrea los índices al final. Si la
+    bodega ya tiene esta `version`, no escribe nada (salvo anotar `crudo`).
+
+    Args:
+        version (str): Huella de `df_fact`.
+        crudo (str): Huella del dataset crudo del que salió el modelo (ver `version_crudo`).
+
+    Returns:
+        bool: True si se escribió el modelo.
+    """
+    con = conectar(ruta)
+    with _escritura:
+        if version_guardada(ruta) == version:
+            if crudo is not None:
+                with con:
+                    _registrar_crudo(con, crudo)
+            return False
+        columnas_geo = ['id_geo', 'id_departamento', 'c_digo_departamento', 'departamento', 'municipio']
+        columnas_hechos = ['id_tiempo', 'id_geo'] + METRICAS
+        with con:
+            # BEGIN explícito: así también el DROP INDEX queda dentro de la transacción
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("DROP INDEX IF EXISTS ix_hechos_geo_tiempo")
+            con.execute("DROP INDEX IF EXISTS ix_hechos_tiempo")
+            con.execute("DROP INDEX IF EXISTS ix_geo_departamento")
+            con.execute("DROP INDEX IF EXISTS ix_celdas_geo_tiempo")
+            con.execute("DELETE FROM agregado_celdas")
+            con.execute("DELETE FROM hechos_educacion")
+            con.execute("DELETE FROM dim_geo")
+            con.execute("DELETE FROM dim_tiempo")
+            con.executemany("INSERT INTO dim_tiempo (id_tiempo, a_o) VALUES (?, ?)",
+                            _filas(dim_tiempo, ['id_tiempo', 'a_o']))
+            con.executemany(f"INSERT INTO dim_geo ({', '.join(columnas_geo)}) "
+                            f"VALUES ({', '.join('?' * len(columnas_geo))})",
+                            _filas(dim_geo, columnas_geo))
+            con.executemany(f"INSERT INTO hechos_educacion ({', '.join(columnas_hechos)}) "
+                            f"VALUES ({', '.join('?' * len(columnas_hechos))})",
+                            _filas(df_fact, columnas_hechos))
+            con.executemany(f"INSERT INTO agregado_celdas ({', '.join(COLUMNAS_CELDAS)}) "
+                            f"VALUES ({', '.join('?' * len(COLUMNAS_CELDAS))})",
+                            _filas(_celdas(df_fact), COLUMNAS_CELDAS))
+            for sentencia in filter(str.strip, INDICES_SQL.split(";")):
+                con.execute(sentencia)
+            con.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('version', ?)", (version,))
+            _registrar_crudo(con, crudo)
+        con.execute("ANALYZE")
+    return True
+
+
+def guardar_en_segundo_plano(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                             version: str, ruta: Path = DW_PATH, crudo: Optional[str] = None) -> bool:
+    """
+    Lanza `guardar_modelo` en un hilo aparte para no bloquear la sesión.
+
+    Returns:
+        bool: False si esa versión ya se está guardando.
+    """
+    clave = (str(Path(ruta)), version)
+    with _en_curso_lock:
+        if clave in _en_curso:
+            return False
+        _en_curso.add(clave)
+
+    def guardar():
+        try:
+            guardar_modelo(df_fact, dim_geo, dim_tiempo, version, ruta, crudo)
+        finally:
+            with _en_curso_lock:
+                _en_curso.discard(clave)
+
+    threading.Thread(target=guardar, name=f"bodega-{version}", daemon=True).start()
+    return True
+
+
+def guardando(ruta: Path = DW_PATH) -> bool:
+    """Indica si hay una escritura de la bodega en curso."""
+    with _en_curso_lock:
+        return any(r == str(Path(ruta)) for r, _ in _en_curso)
+
+
+# ===================================================================
+# Función: cargar_modelo
+# ===================================================================
+def cargar_modelo(ruta: Path = DW_PATH):
+    """
+    Lee el modelo estrella guardado, con los mismos tipos que produce `build_star_schema`.
+
+    Permite que un servidor recién reiniciado muestre los tableros sin repetir el ETL.
+
+    Returns:
+        tuple | None: (df_fact, dim_geo, dim_tiempo), o None si la bodega está vacía.
+    """
+    if not Path(ruta).exists():
+        return None
+    version = version_guardada(ruta)
+    if version is None:
+        return None
+    # Todas las sesiones reciben los mismos objetos, y con ellos la misma vista y cubo
+    conocido = _modelo_leido.get(str(Path(ruta)))
+    if conocido and conocido[0] == version:
+        return conocido[1]
+
+    con = conectar(ruta)
+    dim_tiempo = pd.read_sql("SELECT id_tiempo, a_o FROM dim_tiempo ORDER BY id_tiempo", con)
+    dim_tiempo = dim_tiempo.astype({'id_tiempo': 'int32', 'a_o': 'int16'})
+    dim_geo = pd.read_sql("SELECT id_geo, id_departamento, c_digo_departamento, departamento, municipio "
+                          "FROM dim_geo ORDER BY id_geo", con)
+    dim_geo = dim_geo.astype({'id_geo': 'int32', 'id_departamento': 'int32'})
+    df_fact = pd.read_sql(f"SELECT id_tiempo, id_geo, {', '.join(METRICAS)} FROM hechos_educacion "
+                          "ORDER BY rowid", con)
+    df_fact = df_fact.astype({'id_tiempo': 'int32', 'id_geo': 'int32', **{c: 'float32' for c in METRICAS}})
+    _modelo_leido[str(Path(ruta))] = (version, (df_fact, dim_geo, dim_tiempo))
+    return df_fact, dim_geo, dim_tiempo
+
+
+def _sql_agregado(nivel: str, estadistico: str) -> str:
+    grupos = NIVELES_SQL[nivel]
+    formulas = {
+        'media': "SUM(c.suma_{m}) / SUM(c.conteo_{m})",
+        'suma': "SUM(c.suma_{m})",
+        'conteo': "SUM(c.conteo_{m})",
+        'media_pond': "SUM(c.suma_pond_{m}) / SUM(c.peso_{m})",
+    }
+    if estadistico not in formulas:
+        raise ValueError(f"Estadístico no soportado: {estadistico}")
+    expresiones = [f"{formulas[estadistico].format(m=m)} AS {m}" for m in METRICAS]
+    # Los filtros opcionales van como parámetros: el texto SQL no cambia y la sentencia se reutiliza
+    return (f"SELECT {', '.join(g + ' AS ' + g.split('.')[1] for g in grupos)}, "
+            f"{', '.join(expresiones)}, SUM(c.filas) AS filas "
+            "FROM agregado_celdas c "
+            "JOIN dim_geo g ON g.id_geo = c.id_geo "
+            "JOIN dim_tiempo t ON t.id_tiempo = c.id_tiempo "
+            "WHERE (:departamento IS NULL OR g.departamento = :departamento) "
+            "AND (:anio IS NULL OR t.a_o = :anio) "
+            f"GROUP BY {', '.join(grupos)} ORDER BY {', '.join(grupos)}")
+
+
+# ===================================================================
+# Función: agregado
+# ===================================================================
+def agregado(nivel: str, estadistico: str = 'media_pond', departamento: Optional[str] = None,
+             anio=None, ruta: Path = DW_PATH) -> pd.DataFrame:
+    """
+    Agrega las métricas en SQL al nivel pedido, con caché de resultados por versión.
+
+    Las consultas leen `agregado_celdas` (sumas por municipio y año calculadas al
+    guardar), así que su costo depende del número de celdas y no de filas de hechos.
+
+    Args:
+        nivel (str): 'departamento_anio', 'municipio_anio', 'departamento', 'municipio' o 'anio'.
+        estadistico (str): 'media', 'suma', 'conteo' o 'media_pond'.
+        departamento (str): Filtro opcional por departamento.
+        anio: Filtro opcional por año.
+
+    Returns:
+        pd.DataFrame: Una fila por grupo; es compartido y no debe modificarse en su lugar.
+    """
+    sql = _sql_agregado(nivel, estadistico)
+    params = {"departamento": departamento, "anio": None if anio is None else int(anio)}
+    clave = (str(Path(ruta)), version_guardada(ruta), sql, tuple(sorted(params.items())))
+    with _resultados_lock:
+        if clave in _resultados:
+            _resultados.move_to_end(clave)
+            return _resultados[clave]
+
+    cursor = conectar(ruta).execute(sql, params)
+    columnas = [c[0] for c in cursor.description]
+    resultado = pd.DataFrame.from_records(cursor.fetchall(), columns=columnas)
+    resultado[METRICAS] = resultado[METRICAS].astype(np.float64)
+
+    with _resultados_lock:
+        _resultados[clave] = resultado
+        while len(_resultados) > _MAX_RESULTADOS:
+            _resultados.popitem(last=False)
+    return resultado
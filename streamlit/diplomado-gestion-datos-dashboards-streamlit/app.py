@@ -1,39 +1,59 @@
 import streamlit as st
 
-from cargar_datos import show_data_tab
-from transformacion import show_transform_tab
+import datos_compartidos
+import instrumentacion
+import precarga
+from cargar_datos import precargar_educacion, show_data_tab
+from transformacion import preparar_modelo, show_transform_tab
 from visualizaciones import show_visualization_tab
 from mapa import show_map_tab
 from comparativo import show_comparativo_tab
-from cargar_infraestructura import show_infraestructura_tab
+from cargar_infraestructura import descargar_infraestructura, show_infraestructura_tab
 from comparacion import show_comparacion_tab
-
-# Crear pestañas en el cuerpo de la aplicación
-tabs = st.tabs([
-    "📥 Carga de Datos", 
-    "🔧 Transformación y Métricas", 
-    "📊 Visualizaciones", 
-    "🗺️ Mapa",
-    "🏗️ Infraestructura",
-    "🧩 Comparación"
-])
-
-
-# Mostrar contenido en cada pestaña
-with tabs[0]:
-    show_data_tab()
-
-with tabs[1]:
-    show_transform_tab()
-
-with tabs[2]:
-    show_visualization_tab()
-
-with tabs[3]:
-    show_map_tab()
-
-with tabs[4]:
-    show_infraestructura_tab()
-
-with tabs[5]:
-    show_comparacion_tab()
+from registro_geografico import descargar_divipola
+from instrumentacion import etapa
+
+# Las sesiones comparten los datasets: lo que una escriba en su referencia no llega a las demás
+datos_compartidos.activar_copy_on_write()
+instrumentacion.nueva_ejecucion()
+
+# Ambos datasets y la tabla DIVIPOLA empiezan a cargar en paralelo apenas se abre la sesión
+precarga.iniciar_precarga(st.session_state, {
+    'educacion': precargar_educacion,
+    'infraestructura': descargar_infraestructura,
+    'divipola': descargar_divipola,
+})
+precarga.entregar(st.session_state)
+
+# Las demás pestañas leen el modelo estrella aunque no se haya abierto la de transformación
+try:
+    with etapa("preparar modelo"):
+        preparar_modelo()
+except ValueError:
+    pass  # La pestaña de transformación muestra el error
+
+# Progreso visible desde cualquier pestaña; deja de refrescarse cuando todo llegó
+if precarga.pendientes(st.session_state):
+    precarga.mostrar_progreso()
+
+# Crear el selector de pestañas en el cuerpo de la aplicación.
+# `st.tabs` ejecutaría el contenido de las siete pestañas en cada interacción; con
+# un selector con clave solo se ejecuta la función de la pestaña elegida.
+pestanas = {
+    "📥 Carga de Datos": show_data_tab,
+    "🔧 Transformación y Métricas": show_transform_tab,
+    "📊 Visualizaciones": show_visualization_tab,
+    "🗺️ Mapa": show_map_tab,
+    "🏗️ Infraestructura": show_infraestructura_tab,
+    "🧩 Comparación": show_comparacion_tab,
+    "📉 Comparativo": show_comparativo_tab,
+}
+nombre = st.radio("Pestaña", list(pestanas), key="pestana_activa",
+                  horizontal=True, label_visibility="collapsed")
+
+# Mostrar contenido solo de la pestaña elegida
+with etapa(f"pestaña: {nombre}"):
+    pestanas[nombre]()
+
+# Con DASHBOARD_PERF=1: tiempos, memoria, cache y bytes de cada etapa de esta ejecución
+instrumentacion.mostrar_panel()
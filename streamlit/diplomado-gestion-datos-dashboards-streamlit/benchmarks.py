@@ -0,0 +1,1305 @@
+"""
+Benchmarks del dashboard.
+
+Uso:
+    python benchmarks.py socrata --filas 200000 --latencia 0.05
+    python benchmarks.py cache --filas 200000
+    python benchmarks.py modelo --filas 200000
+    python benchmarks.py hechos --filas 1000000
+    python benchmarks.py almacen --filas 1000000
+    python benchmarks.py particiones --filas 250000 1000000 4000000
+    python benchmarks.py mapa --shapes data/shapes/MGN_ANM_DPTOS.shp
+    python benchmarks.py exportacion --filas 200000
+    python benchmarks.py proyecciones --filas 1000000
+    python benchmarks.py geografia --filas 100000
+    python benchmarks.py soql --filas 200000
+    python benchmarks.py rerun --filas 200000
+    python benchmarks.py precarga --filas 200000 --latencia 0.05
+    python benchmarks.py etapas --filas 50000 500000 5000000 [--guardar-linea-base]
+    python benchmarks.py sesiones --sesiones 1 10 25 --filas 200000
+    python benchmarks.py graficos --filas 1000000
+    python benchmarks.py etl --filas 1000000 4000000 --procesos 1 2 4
+    python benchmarks.py ingesta --filas 1000000
+    python benchmarks.py pronosticos --filas 1000000
+"""
+import argparse
+import gc
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+import almacen
+import cache_snapshots
+import datos_compartidos
+import datos_sinteticos
+import exportacion
+import modelo_estrella
+import particiones
+import precarga
+import proyecciones
+import registro_geografico
+from instrumentacion import rss_mb
+from servidor_local import ServidorSocrataLocal
+from socrata import fetch_dataset
+from vista_hechos import VistaHechos
+
+
+# ===================================================================
+# Función: registros_sinteticos
+# ===================================================================
+def registros_sinteticos(n_filas: int) -> list:
+    """Genera registros con la forma de la respuesta JSON de `nudc-7mev` (municipios DIVIPOLA reales)."""
+    municipios = registro_geografico.tabla_proyecciones()[['cod_dpto', 'dpto', 'nom_mpio']].to_numpy()
+    return [
+        {
+            "a_o": str(2011 + i % 13),
+            "c_digo_departamento": str(municipios[i % len(municipios)][0]),
+            "departamento": municipios[i % len(municipios)][1],
+            "municipio": municipios[i % len(municipios)][2],
+            "poblaci_n_5_16": str(1000 + i % 5000),
+            "tasa_matriculaci_n_5_16": f"{50 + i % 50}.5",
+            "cobertura_neta": f"{40 + i % 60}.25",
+            "cobertura_bruta": f"{60 + i % 50}.75",
+        }
+        for i in range(n_filas)
+    ]
+
+
+# ===================================================================
+# Función: bench_socrata
+# ===================================================================
+def bench_socrata(n_filas: int = 200_000, page_sizes=(5_000, 20_000, 50_000),
+                  workers=(1, 2, 4, 8), latencia: float = 0.05) -> pd.DataFrame:
+    """
+    Mide el tiempo total de `fetch_dataset` contra un servidor local
+    variando el tamaño de página y el número de hilos.
+
+    Returns:
+        pd.DataFrame: Una fila por combinación con segundos y peticiones hechas.
+    """
+    registros = registros_sinteticos(n_filas)
+    resultados = []
+    with ServidorSocrataLocal({"nudc-7mev": registros}, latencia=latencia) as srv:
+        for page_size in page_sizes:
+            for max_workers in workers:
+                srv.peticiones = 0
+                inicio = time.perf_counter()
+                df = fetch_dataset("nudc-7mev", page_size=page_size,
+                                   max_workers=max_workers, base_url=srv.base_url)
+                segundos = time.perf_counter() - inicio
+                assert len(df) == n_filas
+                resultados.append({
+                    "page_size": page_size,
+                    "max_workers": max_workers,
+                    "peticiones": srv.peticiones,
+                    "segundos": round(segundos, 3),
+                })
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_cache
+# ===================================================================
+def bench_cache(n_filas: int = 200_000, latencia: float = 0.05) -> pd.DataFrame:
+    """
+    Compara la carga en frío (API), con snapshot vigente, con snapshot revalidado (304)
+    y con la API caída (modo offline), usando una carpeta de cache temporal.
+
+    Returns:
+        pd.DataFrame: Una fila por escenario con el origen reportado y los segundos.
+    """
+    registros = registros_sinteticos(n_filas)
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        cache_snapshots.CACHE_DIR = Path(carpeta)
+        srv = ServidorSocrataLocal({"nudc-7mev": registros}, latencia=latencia)
+        with srv:
+            def descargar():
+                return fetch_dataset("nudc-7mev", base_url=srv.base_url)
+
+            for escenario, ttl in [("frío", 3600), ("caliente", 3600), ("vencido", 0)]:
+                inicio = time.perf_counter()
+                df, origen = cache_snapshots.cargar_con_cache(
+                    "nudc-7mev", None, descargar, ttl=ttl, offline=False, base_url=srv.base_url)
+                resultados.append({"escenario": escenario, "origen": origen, "filas": len(df),
+                                   "segundos": round(time.perf_counter() - inicio, 4)})
+
+        inicio = time.perf_counter()
+        df, origen = cache_snapshots.cargar_con_cache(
+            "nudc-7mev", None, descargar, ttl=0, offline=False, base_url=srv.base_url)
+        resultados.append({"escenario": "API caída", "origen": origen, "filas": len(df),
+                           "segundos": round(time.perf_counter() - inicio, 4)})
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_modelo_estrella
+# ===================================================================
+def bench_modelo_estrella(n_filas: int = 200_000, reruns: int = 5) -> pd.DataFrame:
+    """
+    Mide `build_star_schema` en la primera llamada (pipeline completo) y en los
+    reruns siguientes con el mismo `df_raw` (memoizado por huella).
+
+    Returns:
+        pd.DataFrame: Una fila por llamada con milisegundos y si vino de cache.
+    """
+    df_raw = pd.DataFrame(registros_sinteticos(n_filas))
+    resultados = []
+    for llamada in range(1 + reruns):
+        inicio = time.perf_counter()
+        modelo_estrella.build_star_schema(df_raw)
+        resultados.append({
+            "llamada": llamada + 1,
+            "cache": modelo_estrella.ultima_ejecucion()["modelo"]["cache"],
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        })
+    # Un DataFrame nuevo con el mismo contenido también reutiliza el resultado
+    copia = df_raw.copy()
+    inicio = time.perf_counter()
+    modelo_estrella.build_star_schema(copia)
+    resultados.append({
+        "llamada": "copia",
+        "cache": modelo_estrella.ultima_ejecucion()["modelo"]["cache"],
+        "ms": round((time.perf_counter() - inicio) * 1000, 2),
+    })
+    return pd.DataFrame(resultados)
+
+
+def _hechos_con_merge(df_clean: pd.DataFrame):
+    """Construcción anterior de la tabla de hechos (a nivel municipio) con `drop_duplicates` y merges."""
+    dim_tiempo = df_clean[['a_o']].drop_duplicates().sort_values('a_o').reset_index(drop=True)
+    dim_tiempo['id_tiempo'] = dim_tiempo.index + 1
+    dim_geo = df_clean[['id_geo']].drop_duplicates().sort_values('id_geo').reset_index(drop=True)
+    df_fact = df_clean.merge(dim_tiempo, on='a_o').merge(dim_geo, on='id_geo')
+    return df_fact[['id_tiempo', 'id_geo'] + modelo_estrella.METRICAS], dim_geo, dim_tiempo
+
+
+# ===================================================================
+# Función: bench_tabla_hechos
+# ===================================================================
+def bench_tabla_hechos(n_filas: int = 1_000_000) -> pd.DataFrame:
+    """
+    Compara la construcción de dimensiones y hechos con las llaves DIVIPOLA de los
+    datos limpios contra la versión con `drop_duplicates` y `DataFrame.merge`.
+
+    Returns:
+        pd.DataFrame: Milisegundos, filas de hechos y municipios por método.
+    """
+    df_clean = modelo_estrella.limpiar_datos(pd.DataFrame(registros_sinteticos(n_filas)))
+    resultados = []
+    for metodo, construir in [("merge", _hechos_con_merge),
+                              ("llaves DIVIPOLA", modelo_estrella.modelo_desde_limpio)]:
+        inicio = time.perf_counter()
+        df_fact, dim_geo, _ = construir(df_clean)
+        resultados.append({
+            "metodo": metodo,
+            "ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "filas_hechos": len(df_fact),
+            "municipios": len(dim_geo),
+        })
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_almacen
+# ===================================================================
+def bench_almacen(n_filas: int = 1_000_000) -> pd.DataFrame:
+    """
+    Mide la bodega SQLite: escritura masiva, lectura tras reinicio y agregaciones
+    SQL (frías y desde la caché de resultados) contra un groupby de pandas.
+
+    Returns:
+        pd.DataFrame: Milisegundos por operación.
+    """
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(n_filas)))
+    vista = VistaHechos(df_fact, dim_geo, dim_tiempo)
+    resultados = []
+
+    def medir(operacion, funcion):
+        inicio = time.perf_counter()
+        funcion()
+        resultados.append({"operacion": operacion, "ms": round((time.perf_counter() - inicio) * 1000, 2)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / "educacion_dw.db"
+        version = modelo_estrella.huella(df_fact)
+        medir("guardar (executemany + índices)", lambda: almacen.guardar_modelo(df_fact, dim_geo, dim_tiempo, version, ruta))
+        medir("guardar misma versión", lambda: almacen.guardar_modelo(df_fact, dim_geo, dim_tiempo, version, ruta))
+        medir("cargar modelo desde disco", lambda: almacen.cargar_modelo(ruta))
+        medir("SQL departamento_anio (frío)", lambda: almacen.agregado('departamento_anio', ruta=ruta))
+        medir("SQL departamento_anio (caché)", lambda: almacen.agregado('departamento_anio', ruta=ruta))
+        medir("SQL un departamento (frío)", lambda: almacen.agregado('departamento_anio', departamento='Departamento 3', ruta=ruta))
+        medir("pandas groupby departamento_anio", lambda: vista.df.groupby(['departamento', 'a_o'], observed=True)[modelo_estrella.METRICAS].mean())
+        almacen.cerrar(ruta)
+    return pd.DataFrame(resultados)
+
+
+def _medir_ms(funcion, repeticiones: int = 5) -> float:
+    """Mejor tiempo de `repeticiones` llamadas, en milisegundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return round(mejor * 1000, 2)
+
+
+# ===================================================================
+# Función: bench_particiones
+# ===================================================================
+def bench_particiones(tamanos=(250_000, 1_000_000, 4_000_000)) -> pd.DataFrame:
+    """
+    Compara lecturas típicas de las vistas (un año, un departamento, ambos; 1-2 métricas)
+    sobre el dataset Parquet particionado contra un recorrido completo en memoria.
+
+    Los tamaños mayores a 1M repiten la vista de 1M filas para no generar millones de registros JSON.
+
+    Returns:
+        pd.DataFrame: Milisegundos por consulta y tamaño, y MB de la tabla en memoria.
+    """
+    base = min(max(tamanos), 1_000_000)
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(base)))
+    vista = VistaHechos(df_fact, dim_geo, dim_tiempo).df
+    anio, depto = int(vista['a_o'].iloc[0]), vista['departamento'].iloc[0]
+    consultas = {
+        "un año, 2 columnas": dict(anio=anio, columnas=['departamento', 'cobertura_neta']),
+        "un departamento, 2 columnas": dict(departamento=depto, columnas=['a_o', 'cobertura_neta']),
+        "año + departamento, todo": dict(anio=anio, departamento=depto),
+    }
+
+    resultados = []
+    for n in tamanos:
+        df = pd.concat([vista] * -(-n // len(vista)), ignore_index=True).iloc[:n]
+        for col in ('departamento', 'municipio', 'c_digo_departamento'):
+            df[col] = df[col].astype('category')
+        with tempfile.TemporaryDirectory() as tmp:
+            inicio = time.perf_counter()
+            particiones.escribir_particiones(df, f"bench{n}", tmp)
+            ms_escritura = round((time.perf_counter() - inicio) * 1000, 1)
+            for nombre, kw in consultas.items():
+                def en_memoria():
+                    mascara = pd.Series(True, index=df.index)
+                    if 'anio' in kw:
+                        mascara &= df['a_o'] == kw['anio']
+                    if 'departamento' in kw:
+                        mascara &= df['departamento'] == kw['departamento']
+                    return df.loc[mascara, kw.get('columnas', df.columns)]
+                resultados.append({
+                    "filas": n,
+                    "consulta": nombre,
+                    "memoria_ms": _medir_ms(en_memoria),
+                    "parquet_ms": _medir_ms(lambda: particiones.leer_hechos(f"bench{n}", ruta=tmp, **kw)),
+                    "escritura_ms": ms_escritura,
+                    "MB_en_memoria": round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+                })
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_mapa
+# ===================================================================
+def bench_mapa(ruta_shapes: str, n_filas: int = 200_000) -> pd.DataFrame:
+    """
+    Costo por interacción del mapa: modo estático (mapa folium completo en cada cambio)
+    contra modo animado (HTML con geometría una sola vez; los cambios no van al servidor).
+
+    Returns:
+        pd.DataFrame: Milisegundos en el servidor y KB enviados por nivel de geometría.
+    """
+    import folium
+
+    import geometria
+    from cubo_olap import CuboOLAP
+    from mapa_animado import html_mapa_animado
+
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(n_filas)))
+    cubo = CuboOLAP(VistaHechos(df_fact, dim_geo, dim_tiempo))
+    geo = geometria.obtener_geometria(ruta_shapes)
+    metricas = {'Cobertura Neta (%)': 'cobertura_neta', 'Cobertura Bruta (%)': 'cobertura_bruta'}
+    anio = cubo.tabla('anio').index.max()
+    corte = cubo.corte_anio(anio)
+    valores = pd.DataFrame({geometria.CODIGO_SHAPES: corte.index.map(cubo.codigo_departamento).astype(str),
+                            'cobertura_neta': corte['cobertura_neta'].to_numpy()})
+
+    resultados = []
+    for nivel in geometria.TOLERANCIAS:
+        inicio = time.perf_counter()
+        mapa = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+        folium.Choropleth(geo_data=geo.geojson(nivel), data=valores,
+                          columns=[geometria.CODIGO_SHAPES, 'cobertura_neta'],
+                          key_on=f"feature.properties.{geometria.CODIGO_SHAPES}").add_to(mapa)
+        html = mapa.get_root().render()
+        resultados.append({"nivel": nivel, "modo": "estático, cada cambio",
+                           "ms_servidor": round((time.perf_counter() - inicio) * 1000, 1),
+                           "KB_enviados": round(len(html.encode('utf-8')) / 1024, 1)})
+
+        animado = html_mapa_animado(cubo, modelo_estrella.huella(df_fact), geo, nivel, metricas, 'cobertura_neta')
+        resultados.append({"nivel": nivel, "modo": "animado, primera carga",
+                           "ms_servidor": round(animado['ms_construir'], 1),
+                           "KB_enviados": round(animado['KB_html'], 1)})
+        resultados.append({"nivel": nivel, "modo": "animado, cada cambio",
+                           "ms_servidor": 0.0, "KB_enviados": 0.0})
+    return pd.DataFrame(resultados)
+
+
+def _xlsx_openpyxl_completo(df_fact: pd.DataFrame, *_) -> bytes:
+    """Exportación anterior: libro openpyxl completo en memoria, solo con la tabla de hechos."""
+    salida = io.BytesIO()
+    with pd.ExcelWriter(salida, engine='openpyxl') as writer:
+        df_fact.to_excel(writer, index=False, sheet_name='TablaHechos')
+    return salida.getvalue()
+
+
+# ===================================================================
+# Función: bench_exportacion
+# ===================================================================
+def bench_exportacion(n_filas: int = 200_000) -> pd.DataFrame:
+    """
+    Tiempo, tamaño y memoria pico (tracemalloc) de cada formato de exportación.
+
+    La memoria de pyarrow (Parquet) no pasa por el asignador de Python y no se
+    refleja en `MB_pico`.
+
+    Returns:
+        pd.DataFrame: Una fila por formato, más la exportación openpyxl anterior.
+    """
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(n_filas)))
+    formatos = {f: (lambda f=f: exportacion.exportar(f, df_fact, dim_geo, dim_tiempo)) for f in exportacion.FORMATOS}
+    formatos["Excel openpyxl completo (anterior)"] = lambda: _xlsx_openpyxl_completo(df_fact)
+
+    resultados = []
+    for formato, generar in formatos.items():
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        datos = generar()
+        ms = (time.perf_counter() - inicio) * 1000
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultados.append({
+            "formato": formato,
+            "ms": round(ms, 1),
+            "MB_archivo": round(len(datos) / 1024 ** 2, 2),
+            "MB_pico": round(pico / 1024 ** 2, 1),
+        })
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_proyecciones
+# ===================================================================
+def bench_proyecciones(n_filas: int = 1_000_000) -> pd.DataFrame:
+    """
+    Carga de los libros de proyecciones: parseo en frío, copia Parquet, memoria del
+    proceso y revalidación por hash tras un `touch`; más el cruce con la tabla de hechos.
+
+    Returns:
+        pd.DataFrame: Milisegundos por escenario.
+    """
+    import os
+
+    def limpiar_memoria():
+        proyecciones._tablas.clear()
+        proyecciones._departamental.clear()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        original = proyecciones.CACHE_PROYECCIONES
+        proyecciones.CACHE_PROYECCIONES = Path(carpeta)
+        try:
+            for escenario, preparar in [
+                ("frío (parseo Excel)", limpiar_memoria),
+                ("caliente (Parquet en disco)", limpiar_memoria),
+                ("caliente (memoria del proceso)", lambda: None),
+                ("touch (revalidado por hash)",
+                 lambda: (limpiar_memoria(), [os.utime(r) for r in proyecciones.ARCHIVOS])),
+            ]:
+                preparar()
+                inicio = time.perf_counter()
+                proyecciones.poblacion_departamental()
+                ms = (time.perf_counter() - inicio) * 1000
+                origenes = ", ".join(sorted(set(proyecciones.ultima_carga()['origen'])))
+                resultados.append({"escenario": escenario, "origen": origenes, "ms": round(ms, 1)})
+        finally:
+            proyecciones.CACHE_PROYECCIONES = original
+
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(n_filas)))
+    poblacion = proyecciones.poblacion_departamental()
+    ms = _medir_ms(lambda: proyecciones.unir_poblacion(df_fact, dim_geo, dim_tiempo, poblacion))
+    resultados.append({"escenario": f"cruce con {n_filas:,} hechos", "origen": "-", "ms": round(ms, 1)})
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_geografia
+# ===================================================================
+def bench_geografia(n_filas: int = 100_000) -> pd.DataFrame:
+    """
+    Resolución de nombres de departamento a códigos DIVIPOLA: registro (texto y
+    categórico) contra la limpieza de texto anterior (`strip().title()` + merge).
+
+    Returns:
+        pd.DataFrame: Milisegundos y filas sin unir por método.
+    """
+    import numpy as np
+
+    registro = registro_geografico.obtener_registro()
+    variantes = np.array([v for nombre in registro.departamentos
+                          for v in (nombre, nombre.upper(), f" {nombre.lower()} ",
+                                    registro_geografico.normalizar(nombre).title())], dtype=object)
+    nombres = pd.Series(np.random.default_rng(0).choice(variantes, n_filas))
+    canonicos = pd.DataFrame({'departamento': registro.departamentos.to_numpy(),
+                              'cod_departamento': registro.departamentos.index})
+
+    def limpieza_texto():
+        limpio = pd.DataFrame({'departamento': nombres.str.strip().str.title()})
+        return limpio.merge(canonicos.assign(departamento=canonicos['departamento'].str.title()),
+                            on='departamento', how='left')['cod_departamento']
+
+    metodos = {
+        "registro (texto)": lambda: registro.codigo_departamento(nombres),
+        "registro (categórico)": lambda: registro.codigo_departamento(nombres.astype('category')),
+        "strip().title() + merge (anterior)": limpieza_texto,
+    }
+    resultados = []
+    for metodo, resolver in metodos.items():
+        codigos = pd.Series(resolver())
+        resultados.append({
+            "metodo": metodo,
+            "ms": _medir_ms(resolver),
+            "filas_sin_unir": int((codigos.isna() | (codigos == registro_geografico.SIN_CODIGO)).sum()),
+        })
+    return pd.DataFrame(resultados)
+
+
+# Columnas de `nudc-7mev` que el tablero no usa (el dataset real trae todas)
+COLUMNAS_SIN_USO_EDUCACION = datos_sinteticos.COLUMNAS_SIN_USO_EDUCACION
+
+
+# ===================================================================
+# Función: bench_soql
+# ===================================================================
+def bench_soql(n_filas: int = 200_000) -> pd.DataFrame:
+    """
+    Descarga completa contra consultas con `$select`, `$where` y `$group` en el
+    servidor local, con registros que incluyen las columnas sin uso del dataset real.
+
+    Returns:
+        pd.DataFrame: Filas, columnas, MB transferidos y segundos por consulta.
+    """
+    from cargar_datos import consulta_educacion
+    from soql import ConsultaSoQL
+
+    registros = registros_sinteticos(n_filas)
+    for i, r in enumerate(registros):
+        r.update({c: f"{(i * 7 + j) % 1000}.{j}" for j, c in enumerate(COLUMNAS_SIN_USO_EDUCACION)})
+
+    consultas = {
+        "completa (antes)": None,
+        "$select columnas del modelo": consulta_educacion().params(),
+        "$select + $where 2 años": consulta_educacion((2022, 2023)).params(),
+        "$select + $where 2 años, 1 depto": consulta_educacion((2022, 2023), [5]).params(),
+        "$group depto × año (sumas)": (ConsultaSoQL().seleccionar("c_digo_departamento", "a_o")
+                                       .agregar("count", alias="filas")
+                                       .agregar("sum", "poblaci_n_5_16", "poblacion")
+                                       .agrupar("c_digo_departamento", "a_o").params()),
+    }
+    resultados = []
+    with ServidorSocrataLocal({"nudc-7mev": registros}) as srv:
+        for nombre, params in consultas.items():
+            srv.bytes_enviados = 0
+            inicio = time.perf_counter()
+            df = fetch_dataset("nudc-7mev", params, base_url=srv.base_url)
+            resultados.append({
+                "consulta": nombre,
+                "filas": len(df),
+                "columnas": df.shape[1],
+                "MB_transferidos": round(srv.bytes_enviados / 1024 ** 2, 2),
+                "segundos": round(time.perf_counter() - inicio, 3),
+            })
+    return pd.DataFrame(resultados)
+
+
+# Navegación anterior: `st.tabs` sin estado ejecuta las seis pestañas en cada rerun
+_APP_TODAS_LAS_PESTANAS = """
+import streamlit as st
+from cargar_datos import show_data_tab
+from transformacion import show_transform_tab
+from visualizaciones import show_visualization_tab
+from mapa import show_map_tab
+from cargar_infraestructura import show_infraestructura_tab
+from comparacion import show_comparacion_tab
+
+tabs = st.tabs(["Carga", "Transformación", "Visualizaciones", "Mapa", "Infraestructura", "Comparación"])
+for tab, mostrar in zip(tabs, [show_data_tab, show_transform_tab, show_visualization_tab,
+                               show_map_tab, show_infraestructura_tab, show_comparacion_tab]):
+    with tab:
+        mostrar()
+"""
+
+# Lo que Streamlit vuelve a ejecutar cuando cambia el selector de un fragmento
+_APP_FRAGMENTO_GRAFICO_1 = """
+import streamlit as st
+from cubo_olap import obtener_cubo
+from modelo_estrella import huella
+from vista_hechos import obtener_vista
+from visualizaciones import grafico_serie_matricula
+
+vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
+grafico_serie_matricula(vista, obtener_cubo(vista), huella(st.session_state['df_fact']))
+"""
+
+
+# ===================================================================
+# Función: bench_rerun
+# ===================================================================
+def bench_rerun(n_filas: int = 200_000, interacciones: int = 5) -> pd.DataFrame:
+    """
+    Latencia de cambiar el departamento del "Gráfico 1" en la pestaña de visualizaciones.
+
+    Compara la navegación anterior (todas las pestañas en cada rerun), la ejecución
+    de solo la pestaña abierta y el rerun del fragmento del gráfico. Usa `AppTest`,
+    que ejecuta el script completo en el mismo proceso; el caso del fragmento
+    ejecuta solo la función del fragmento, que es lo que Streamlit repite.
+
+    Returns:
+        pd.DataFrame: Milisegundos de la primera ejecución y mediana por interacción.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    modelo = modelo_estrella.build_star_schema(pd.DataFrame(registros_sinteticos(n_filas)))
+    escenarios = {
+        "antes: seis pestañas": AppTest.from_string(_APP_TODAS_LAS_PESTANAS, default_timeout=600),
+        "solo la pestaña abierta": AppTest.from_file("app.py", default_timeout=600),
+        "fragmento del Gráfico 1": AppTest.from_string(_APP_FRAGMENTO_GRAFICO_1, default_timeout=600),
+    }
+    resultados = []
+    for nombre, at in escenarios.items():
+        for clave, valor in zip(["df_fact", "dim_geo", "dim_tiempo"], modelo):
+            at.session_state[clave] = valor
+        # Sin precarga ni descargas: solo se mide la interacción. Con el modelo marcado como
+        # construido en la sesión, `precarga.entregar` no lo reemplaza a mitad de la medición
+        at.session_state[precarga.CLAVE_SESION] = {}
+        at.session_state["origen_modelo"] = "etl"
+        at.session_state["pestana_activa"] = "📊 Visualizaciones"
+        inicio = time.perf_counter()
+        at.run()
+        ms_primera = (time.perf_counter() - inicio) * 1000
+        selector = next(s for s in at.selectbox if s.label.endswith("(Gráfico 1)"))
+        tiempos = []
+        for i in range(1, interacciones + 1):
+            inicio = time.perf_counter()
+            selector.select_index(i % len(selector.options)).run()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            selector = next(s for s in at.selectbox if s.label.endswith("(Gráfico 1)"))
+        assert not at.exception, at.exception
+        resultados.append({
+            "escenario": nombre,
+            "ms_primera_ejecucion": round(ms_primera, 1),
+            "ms_por_interaccion": round(statistics.median(tiempos), 1),
+            "graficos_enviados": len(at.get("plotly_chart")),
+        })
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_precarga
+# ===================================================================
+def bench_precarga(n_filas: int = 200_000, latencia: float = 0.05, page_size: int = 20_000) -> pd.DataFrame:
+    """
+    Tiempo hasta el primer gráfico (educación descargada + modelo estrella) y hasta tener
+    ambos datasets: flujo anterior en serie (cargar educación, construir el modelo, luego
+    cargar infraestructura) contra la precarga concurrente de `precarga.Tarea`.
+    No incluye el tiempo de reacción del usuario entre clics, que el flujo anterior también pagaba.
+
+    Returns:
+        pd.DataFrame: Segundos hasta el primer gráfico y hasta tener todo, por escenario.
+    """
+    educacion = registros_sinteticos(n_filas)
+    # Forma de `3ncw-3qwq`: una fila por sede con aulas mejoradas
+    infraestructura = [{"nombre_depto": r["departamento"], "aulas_mejoradas": str(i % 7)}
+                       for i, r in enumerate(educacion)]
+    resultados = []
+    with ServidorSocrataLocal({"nudc-7mev": educacion, "3ncw-3qwq": infraestructura}, latencia=latencia) as srv:
+        def cargar_educacion(progress=None):
+            df = fetch_dataset("nudc-7mev", page_size=page_size, base_url=srv.base_url, progress=progress)
+            modelo_estrella.build_star_schema(df)
+            return df
+
+        def cargar_infraestructura(progress=None):
+            return fetch_dataset("3ncw-3qwq", page_size=page_size, base_url=srv.base_url, progress=progress)
+
+        modelo_estrella._resultados.vaciar()
+        inicio = time.perf_counter()
+        cargar_educacion()
+        primer_grafico = time.perf_counter() - inicio
+        cargar_infraestructura()
+        resultados.append({"escenario": "antes: en serie, a pedido",
+                           "s_primer_grafico": round(primer_grafico, 2),
+                           "s_todo_listo": round(time.perf_counter() - inicio, 2)})
+
+        modelo_estrella._resultados.vaciar()
+        estado = {}
+        inicio = time.perf_counter()
+        tareas = precarga.iniciar_precarga(estado, {"educacion": cargar_educacion,
+                                                    "infraestructura": cargar_infraestructura})
+        for tarea in tareas.values():
+            tarea.esperar()
+            assert tarea.error is None, tarea.error
+        resultados.append({"escenario": "precarga concurrente",
+                           "s_primer_grafico": round(tareas["educacion"].ms / 1000, 2),
+                           "s_todo_listo": round(time.perf_counter() - inicio, 2)})
+    return pd.DataFrame(resultados)
+
+
+# Resultados de referencia de `bench_etapas` (se actualizan con --guardar-linea-base)
+LINEA_BASE = Path(__file__).with_name("benchmarks_linea_base.json")
+
+
+def _medir_etapa(funcion):
+    """
+    Ejecuta `funcion` dos veces: una para el tiempo y otra con tracemalloc para la
+    memoria pico (tracemalloc hace lento el código, así que no se mezclan).
+
+    Returns:
+        tuple: (resultado, ms, MB_pico).
+    """
+    inicio = time.perf_counter()
+    resultado = funcion()
+    ms = (time.perf_counter() - inicio) * 1000
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, ms, pico / 1024 ** 2
+
+
+def _ingerir_paginas(df_raw: pd.DataFrame, page_size: int = 50_000) -> tuple:
+    """
+    JSON → DataFrame página por página, sin acumular (a 5 M filas el texto JSON y los
+    DataFrame de todas las páginas no caben juntos). Solo se cronometra el parseo.
+
+    Returns:
+        tuple: (ms en total, MB pico de una página).
+    """
+    ms, pico = 0.0, 0.0
+    for i, pagina in enumerate(datos_sinteticos.paginas_json(df_raw, page_size)):
+        inicio = time.perf_counter()
+        pd.DataFrame(json.loads(pagina))
+        ms += (time.perf_counter() - inicio) * 1000
+        if i == 0:
+            tracemalloc.start()
+            pd.DataFrame(json.loads(pagina))
+            pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+    return ms, pico
+
+
+def _etapas(n_filas: int) -> list:
+    """Mide cada etapa del tablero, de la ingesta a la exportación, con `n_filas` sintéticas."""
+    from cubo_olap import CuboOLAP
+    from exportacion import exportar
+
+    df_raw = datos_sinteticos.educacion(n_filas)
+    filas = []
+
+    def anotar(etapa, ms, mb):
+        filas.append({"filas": n_filas, "etapa": etapa, "ms": round(ms, 1), "MB_pico": round(mb, 1)})
+
+    anotar("ingesta JSON (por página)", *_ingerir_paginas(df_raw))
+    # Sin la memoria por huella de `build_star_schema`: cada llamada repite el trabajo
+    df_clean, ms, mb = _medir_etapa(lambda: modelo_estrella._limpiar(df_raw))
+    anotar("limpieza", ms, mb)
+    del df_raw
+    (df_fact, dim_geo, dim_tiempo), ms, mb = _medir_etapa(lambda: modelo_estrella.modelo_desde_limpio(df_clean))
+    anotar("dimensiones y hechos", ms, mb)
+    del df_clean
+    vista, ms, mb = _medir_etapa(lambda: VistaHechos(df_fact, dim_geo, dim_tiempo))
+    anotar("vista desnormalizada", ms, mb)
+    cubo, ms, mb = _medir_etapa(lambda: CuboOLAP(vista))
+    anotar("cubo OLAP", ms, mb)
+
+    depto = vista.departamentos()[0]
+    anio = vista.anios()[-1]
+    registro = registro_geografico.obtener_registro()
+
+    def burbujas():
+        corte = cubo.corte_anio(anio)
+        corte['poblaci_n_5_16'] = cubo.corte_anio(anio, 'suma')['poblaci_n_5_16']
+        return corte.reset_index().dropna()
+
+    def grafico_3d():
+        tabla = cubo.tabla('departamento_anio')
+        tabla['poblaci_n_5_16'] = cubo.tabla('departamento_anio', 'suma')['poblaci_n_5_16']
+        tabla = tabla.reset_index().dropna()
+        return tabla[tabla['poblaci_n_5_16'] > 500]
+
+    def mapa():
+        corte = cubo.corte_anio(anio)
+        return registro.codigo_dos_digitos(corte.index.map(cubo.codigo_departamento))
+
+    # Preparación de datos detrás de cada gráfico de visualizaciones.py y de mapa.py
+    graficos = {
+        "gráfico: series por departamento": lambda: cubo.serie_departamento(depto).reset_index(),
+        "gráfico: burbujas por año": burbujas,
+        "gráfico: mapa de calor": lambda: cubo.matriz('cobertura_neta').round(1).reset_index().melt(
+            id_vars='departamento', var_name='a_o', value_name='cobertura_neta'),
+        "gráfico: boxplot (filas del depto)": lambda: vista.filtrar(
+            departamento=depto, columnas=['departamento', 'cobertura_neta']),
+        "gráfico: 3D animado": grafico_3d,
+        "mapa: corte del año con código DIVIPOLA": mapa,
+    }
+    for etapa, funcion in graficos.items():
+        anotar(etapa, *_medir_etapa(funcion)[1:])
+
+    for formato in ["CSV comprimido (.csv.gz en .zip)", "Parquet (.zip)"]:
+        anotar(f"exportación {formato.split(' (')[0]}",
+               *_medir_etapa(lambda: exportar(formato, df_fact, dim_geo, dim_tiempo))[1:])
+    return filas
+
+
+# ===================================================================
+# Función: bench_etapas
+# ===================================================================
+def bench_etapas(tamanos=(50_000, 500_000, 5_000_000), guardar_linea_base: bool = False,
+                 linea_base: Path = LINEA_BASE) -> pd.DataFrame:
+    """
+    Tiempo y memoria pico de cada etapa del tablero con datos de `datos_sinteticos`
+    (nombres desordenados, filas nacionales y valores no numéricos), comparados
+    contra la línea base guardada.
+
+    Args:
+        tamanos (tuple): Filas del dataset crudo en cada corrida.
+        guardar_linea_base (bool): Reemplazar la línea base con estos resultados.
+        linea_base (Path): Archivo JSON de referencia.
+
+    Returns:
+        pd.DataFrame: Una fila por tamaño y etapa, con la variación frente a la línea base.
+    """
+    resultados = pd.DataFrame([fila for n in tamanos for fila in _etapas(n)])
+
+    if linea_base.exists():
+        base = pd.DataFrame(json.loads(linea_base.read_text(encoding="utf-8"))["resultados"])
+        resultados = resultados.merge(base.rename(columns={"ms": "ms_base", "MB_pico": "MB_base"}),
+                                      on=["filas", "etapa"], how="left")
+        resultados["Δms_%"] = ((resultados["ms"] / resultados["ms_base"] - 1) * 100).round(1)
+        resultados["ΔMB_%"] = ((resultados["MB_pico"] / resultados["MB_base"] - 1) * 100).round(1)
+
+    if guardar_linea_base:
+        # Se conservan los tamaños que no se midieron en esta corrida
+        anteriores = (json.loads(linea_base.read_text(encoding="utf-8"))["resultados"]
+                      if linea_base.exists() else [])
+        nuevos = resultados[["filas", "etapa", "ms", "MB_pico"]].to_dict("records")
+        medidos = {(f["filas"], f["etapa"]) for f in nuevos}
+        linea_base.write_text(json.dumps({
+            "entorno": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "procesador": platform.processor() or platform.machine()},
+            "resultados": [f for f in anteriores if (f["filas"], f["etapa"]) not in medidos] + nuevos,
+        }, ensure_ascii=False, indent=1), encoding="utf-8")
+    return resultados
+
+
+# ===================================================================
+# Función: bench_graficos
+# ===================================================================
+def bench_graficos(n_filas: int = 1_000_000, repeticiones: int = 3) -> pd.DataFrame:
+    """
+    Costo de cada figura de la pestaña de visualizaciones en modo completo y ligero:
+    construirla y enviarla (dict + JSON, como `st.plotly_chart`) en cada rerun,
+    frente a tomarla de la memoria de figuras. El boxplot usa el departamento con
+    más filas.
+
+    Returns:
+        pd.DataFrame: Una fila por gráfico y modo con puntos, trazas, KB enviados,
+            ms de construcción y ms por rerun sin y con la figura memorizada.
+    """
+    import plotly.io as pio
+
+    import figuras
+    import visualizaciones
+    from cubo_olap import obtener_cubo
+    from vista_hechos import obtener_vista
+
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(datos_sinteticos.educacion(n_filas))[:3]
+    vista = obtener_vista(df_fact, dim_geo, dim_tiempo)
+    cubo = obtener_cubo(vista)
+    version = modelo_estrella.huella(df_fact)
+    depto = max(vista.departamentos(), key=vista.contar)
+    anio = vista.anios()[-1]
+    df_depto = visualizaciones.cobertura_departamento(vista, version, depto)
+
+    # {gráfico: (construir(ligero), puntos, tiene modo ligero)}
+    graficos = {
+        "serie matrícula": (lambda l: visualizaciones.figura_serie_matricula(cubo, depto, l),
+                            2 * len(vista.anios()), True),
+        "burbujas": (lambda l: visualizaciones.figura_burbujas(cubo, anio, l), len(vista.departamentos()), True),
+        "mapa de calor": (lambda l: visualizaciones.figura_mapa_de_calor(cubo, l),
+                          cubo.matriz('cobertura_neta').size, True),
+        "boxplot": (lambda l: visualizaciones.figura_boxplot(df_depto, depto, l), len(df_depto), True),
+        "3D animado": (lambda l: visualizaciones.figura_3d(cubo), len(cubo.niveles['departamento_anio']), False),
+    }
+    resultados = []
+    for nombre, (construir, puntos, con_ligero) in graficos.items():
+        for ligero in ((False, True) if con_ligero else (False,)):
+            ms_construir = _medir_ms(lambda: construir(ligero), repeticiones)
+            fig = construir(ligero)
+            # st.plotly_chart convierte la figura a dict y la serializa en cada rerun
+            ms_enviar = _medir_ms(lambda: pio.to_json(fig.to_dict(), validate=False), repeticiones)
+            figuras.vaciar()
+            memorizada = figuras.figura(nombre, version, (), lambda _: construir(ligero))["figura"]
+            ms_memorizada = _medir_ms(lambda: pio.to_json(figuras.FiguraSerializada(
+                figuras.figura(nombre, version, (), construir)["spec"]).to_dict(), validate=False), repeticiones)
+            resultados.append({
+                "grafico": nombre,
+                "modo": "ligero" if ligero else "completo",
+                "puntos": puntos,
+                "trazas": len(memorizada.data) + sum(len(c.data) for c in memorizada.frames),
+                "KB": round(len(pio.to_json(fig, validate=False).encode("utf-8")) / 1024, 1),
+                "ms_construir": round(ms_construir, 1),
+                "ms_rerun_sin_cache": round(ms_construir + ms_enviar, 1),
+                "ms_rerun_memorizada": round(ms_memorizada, 1),
+            })
+    figuras.vaciar()
+    return pd.DataFrame(resultados)
+
+
+# Datasets que cada sesión guarda en su estado
+_CLAVES_DATOS_SESION = ["df_raw", "df_infraestructura", "df_fact", "dim_geo", "dim_tiempo"]
+
+
+def _sesiones_concurrentes(n_sesiones: int, reruns: int, pestana: str, cola):
+    """
+    Proceso hijo de `bench_sesiones`: abre `n_sesiones` sesiones de la app a la vez,
+    espera su precarga (desde los snapshots ya en disco) y luego reejecuta todas,
+    al mismo tiempo, `reruns` veces.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from memoria import bytes_objeto
+    from streamlit.testing.v1 import AppTest
+
+    def abrir(_):
+        at = AppTest.from_file(str(Path(__file__).with_name("app.py")), default_timeout=600)
+        at.session_state["pestana_activa"] = pestana
+        inicio = time.perf_counter()
+        at.run()
+        for tarea in at.session_state[precarga.CLAVE_SESION].values():
+            tarea.esperar()
+        at.run()  # Entrega de la precarga y modelo estrella
+        assert not at.exception, at.exception
+        return at, time.perf_counter() - inicio
+
+    def reejecutar(at):
+        tiempos = []
+        for _ in range(reruns):
+            inicio = time.perf_counter()
+            at.run()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert not at.exception, at.exception
+        return tiempos
+
+    gc.collect()
+    rss_inicial = rss_mb()
+    with ThreadPoolExecutor(n_sesiones) as pool:
+        abiertas = list(pool.map(abrir, range(n_sesiones)))
+    gc.collect()
+    rss_abiertas = rss_mb()
+
+    # Datos distintos en memoria entre todas las sesiones: una referencia cuenta como su original
+    distintos = {}
+    for at, _ in abiertas:
+        for clave in _CLAVES_DATOS_SESION:
+            if clave in at.session_state:
+                df = at.session_state[clave]
+                base = datos_compartidos.original(df)
+                distintos[id(df if base is None else base)] = df if base is None else base
+
+    with ThreadPoolExecutor(n_sesiones) as pool:
+        tiempos = [t for lista in pool.map(reejecutar, [at for at, _ in abiertas]) for t in lista]
+    segundos_abrir = sorted(s for _, s in abiertas)
+    cola.put({
+        "MB_datos": round(bytes_objeto(list(distintos.values())) / 1024 ** 2, 1),
+        "MB_RSS_inicial": round(rss_inicial),
+        "MB_RSS_sesiones": round(rss_abiertas),
+        "MB_por_sesion": round((rss_abiertas - rss_inicial) / n_sesiones, 1),
+        "s_abrir_p95": round(segundos_abrir[max(0, round(0.95 * n_sesiones) - 1)], 2),
+        "ms_rerun_p50": round(statistics.median(tiempos), 1),
+        "ms_rerun_p95": round(statistics.quantiles(tiempos, n=20)[-1], 1),
+    })
+
+
+# ===================================================================
+# Función: bench_sesiones
+# ===================================================================
+def bench_sesiones(sesiones=(1, 10, 25), n_filas: int = 200_000, reruns: int = 10,
+                   pestana: str = "🧩 Comparación") -> pd.DataFrame:
+    """
+    Prueba de carga con N sesiones concurrentes de la app completa (`AppTest`): memoria
+    residente del proceso y latencia p95 de un rerun, con los datasets compartidos
+    entre sesiones (`datos_compartidos`) y con una copia por sesión (DASHBOARD_COMPARTIR=0).
+
+    Cada medición corre en un proceso nuevo, así el RSS de una no arrastra la anterior.
+    Los snapshots de educación e infraestructura (`n_filas` cada uno) y el de DIVIPOLA
+    se escriben antes en una carpeta temporal y las sesiones corren con DASHBOARD_OFFLINE=1:
+    cargan del disco sin consultar el portal, como en un servidor ya en marcha. La pestaña por defecto usa ambos datasets y no tiene gráficos pesados, así
+    el RSS refleja los datos y no las figuras.
+
+    Returns:
+        pd.DataFrame: Una fila por modo y número de sesiones. `MB_datos` suma una sola vez
+            cada DataFrame distinto que guardan las sesiones; el RSS incluye además lo que
+            el asignador de memoria retiene de los picos de cada carga.
+    """
+    from cargar_datos import EDUCACION_DATASET, consulta_educacion
+    from cargar_infraestructura import INFRAESTRUCTURA_DATASET, consulta_infraestructura
+
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir, cache_snapshots.CACHE_DIR = cache_snapshots.CACHE_DIR, Path(tmp) / "cache"
+        try:
+            cache_snapshots.guardar_snapshot(EDUCACION_DATASET, consulta_educacion().params(),
+                                             datos_sinteticos.educacion(n_filas))
+            cache_snapshots.guardar_snapshot(INFRAESTRUCTURA_DATASET, consulta_infraestructura().params(),
+                                             datos_sinteticos.infraestructura(n_filas))
+            cache_snapshots.guardar_snapshot(registro_geografico.DIVIPOLA_DATASET, None,
+                                             registro_geografico.tabla_proyecciones())
+        finally:
+            cache_snapshots.CACHE_DIR = cache_dir
+        datos_compartidos._versiones.vaciar()
+
+        entorno = dict(os.environ)
+        for compartir in (False, True):
+            for n in sesiones:
+                # El proceso hijo lee la configuración del entorno al importar los módulos
+                os.environ.update({
+                    "DASHBOARD_CACHE_DIR": str(Path(tmp) / "cache"),
+                    "DASHBOARD_DW_PATH": str(Path(tmp) / f"dw-{compartir}-{n}.db"),
+                    "DASHBOARD_PARQUET_DIR": str(Path(tmp) / f"particiones-{compartir}-{n}"),
+                    "DASHBOARD_COMPARTIR": "1" if compartir else "0",
+                    "DASHBOARD_OFFLINE": "1",
+                })
+                cola = contexto.Queue()
+                proceso = contexto.Process(target=_sesiones_concurrentes, args=(n, reruns, pestana, cola))
+                proceso.start()
+                try:
+                    resultado = None
+                    while resultado is None:
+                        try:
+                            resultado = cola.get(timeout=5)
+                        except queue.Empty:
+                            if not proceso.is_alive():
+                                raise RuntimeError(f"La prueba con {n} sesiones terminó con código {proceso.exitcode}")
+                finally:
+                    proceso.join()
+                    os.environ.clear()
+                    os.environ.update(entorno)
+                resultados.append({"modo": "compartido" if compartir else "copia por sesión",
+                                   "sesiones": n, **resultado})
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_etl
+# ===================================================================
+def bench_etl(tamanos=(1_000_000, 4_000_000), procesos=(1, 2, os.cpu_count() or 1)) -> pd.DataFrame:
+    """
+    ETL sin Streamlit (`etl.py`) con datos sintéticos y bodega/Parquet temporales,
+    según el número de procesos de la limpieza por año. La aceleración se mide
+    contra un proceso; con un solo núcleo disponible no puede superar 1×.
+
+    Returns:
+        pd.DataFrame: Una fila por tamaño y procesos con ms por etapa, aceleración
+            de la limpieza y memoria residente máxima.
+    """
+    import etl
+
+    resultados = []
+    for n in tamanos:
+        base = None
+        for p in sorted(set(procesos)):
+            with tempfile.TemporaryDirectory() as tmp:
+                reporte = etl.ejecutar(p, sintetico=n, ruta_dw=Path(tmp) / "dw.db", ruta_parquet=Path(tmp) / "parquet")
+            ms = dict(zip(reporte["etapa"], reporte["ms"]))
+            limpieza = ms["limpieza por año + modelo estrella"]
+            base = limpieza if base is None else base
+            resultados.append({
+                "filas": n,
+                "procesos": p,
+                "nucleos": os.cpu_count(),
+                "ms_extraccion": ms["extracción (educación + infraestructura)"],
+                "ms_limpieza": limpieza,
+                "aceleracion_limpieza": round(base / limpieza, 2),
+                "ms_publicar": ms["bodega SQLite + Parquet por año"],
+                "ms_total": ms["total"],
+                "MB_rss_max": round(reporte["MB_rss"].max(), 1),
+            })
+            gc.collect()
+    return pd.DataFrame(resultados)
+
+
+# ===================================================================
+# Función: bench_ingesta
+# ===================================================================
+def bench_ingesta(n_filas: int = 1_000_000, page_size: int = 50_000) -> pd.DataFrame:
+    """
+    Ingesta JSON (lista de diccionarios → columnas de objetos) frente a CSV tipado
+    (`socrata.fetch_dataset(tipos=...)`), con datos sintéticos con un valor mal
+    formado por cada 10.000 filas.
+
+    Se mide por separado el parseo de las páginas ya descargadas (tiempo, memoria
+    pico con tracemalloc, memoria final y limpieza posterior) y la descarga
+    completa desde el servidor local. El lector CSV de pandas reserva sus buffers
+    fuera del asignador de Python, así que `MB_pico` no los incluye.
+
+    Returns:
+        pd.DataFrame: Una fila por formato y medición.
+    """
+    from servidor_local import _a_csv
+    from socrata import _leer_csv, concatenar
+
+    registros = registros_sinteticos(n_filas)
+    for i in range(0, n_filas, 10_000):
+        registros[i]["cobertura_neta"] = "s.d."
+    params = {"$select": ",".join(modelo_estrella.COLUMNAS_RELEVANTES)}
+    tipos = modelo_estrella.TIPOS_CRUDO
+    paginas = [registros[i:i + page_size] for i in range(0, n_filas, page_size)]
+    cuerpos = {
+        "json": [json.dumps(p).encode("utf-8") for p in paginas],
+        "csv": [_a_csv(p, params["$select"]) for p in paginas],
+    }
+    del paginas
+
+    def leer_csv() -> pd.DataFrame:
+        partes = [_leer_csv(io.BytesIO(c), tipos) for c in cuerpos["csv"]]
+        df = concatenar([df for df, _ in partes])
+        df.attrs["malformados"] = sum(sum(conteo.values()) for _, conteo in partes)
+        return df
+
+    lectores = {
+        "json": lambda: pd.DataFrame([fila for c in cuerpos["json"] for fila in json.loads(c)]),
+        "csv": leer_csv,
+    }
+
+    resultados = []
+    for formato, leer in lectores.items():
+        gc.collect()
+        ms = _medir_ms(leer, 3)
+        tracemalloc.start()
+        df = leer()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultados.append({
+            "formato": formato,
+            "medicion": "parseo de páginas descargadas",
+            "MB_respuesta": round(sum(map(len, cuerpos[formato])) / 1024 ** 2, 1),
+            "ms": ms,
+            "MB_pico": round(pico / 1024 ** 2, 1),
+            "MB_final": round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+            "ms_limpiar": _medir_ms(lambda: modelo_estrella._limpiar(df), 3),
+            # Por JSON los textos mal formados se vuelven nulos en la limpieza sin contarse
+            "malformados": df.attrs.get("malformados"),
+        })
+        del df
+    del cuerpos
+
+    with ServidorSocrataLocal({"nudc-7mev": registros}) as srv:
+        for formato, kwargs in (("json", {}), ("csv", {"tipos": tipos})):
+            gc.collect()
+            enviados = srv.bytes_enviados
+            inicio = time.perf_counter()
+            df = fetch_dataset("nudc-7mev", params, page_size=page_size, base_url=srv.base_url, **kwargs)
+            resultados.append({
+                "formato": formato,
+                "medicion": "descarga desde el servidor local",
+                "MB_respuesta": round((srv.bytes_enviados - enviados) / 1024 ** 2, 1),
+                "ms": round((time.perf_counter() - inicio) * 1000, 1),
+                "MB_final": round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+            })
+            del df
+    return pd.DataFrame(resultados)
+
+
+def _ajustar_por_serie(Y, X):
+    """Mismo modelo que `pronosticos.ajustar`, resolviendo una serie a la vez."""
+    import numpy as np
+
+    import pronosticos
+
+    penalizacion, previa = pronosticos.previa(Y, X)
+    beta = np.full(Y.shape[:2] + (X.shape[-1],), np.nan)
+    for m in range(Y.shape[0]):
+        for s in range(Y.shape[1]):
+            observado = np.isfinite(Y[m, s])
+            if observado.sum() < pronosticos.MIN_ANIOS:
+                continue
+            Xs = X[s, observado]
+            beta[m, s] = np.linalg.solve(Xs.T @ Xs + penalizacion[m],
+                                         Xs.T @ Y[m, s, observado] + penalizacion[m] @ previa[m])
+    return beta
+
+
+# ===================================================================
+# Función: bench_pronosticos
+# ===================================================================
+def bench_pronosticos(n_filas: int = 1_000_000, repeticiones: int = 5) -> pd.DataFrame:
+    """
+    Ajuste y predicción de todas las series de municipios y departamentos: por lotes
+    (`pronosticos.ajustar`) frente a un bucle de Python con una serie a la vez, y el
+    costo de pedir los pronósticos ya memorizados.
+
+    Returns:
+        pd.DataFrame: Una fila por modo con series, métricas, ms de ajuste y predicción,
+            aceleración y diferencia máxima de coeficientes contra el ajuste por lotes.
+    """
+    import numpy as np
+
+    import pronosticos
+    from cubo_olap import obtener_cubo
+    from vista_hechos import obtener_vista
+
+    df_fact, dim_geo, dim_tiempo = modelo_estrella.build_star_schema(datos_sinteticos.educacion(n_filas))[:3]
+    cubo = obtener_cubo(obtener_vista(df_fact, dim_geo, dim_tiempo))
+    poblacion = pronosticos._poblacion()
+    inicio = time.perf_counter()
+    series = pronosticos.armar_series(cubo, poblacion)
+    ms_preparar = round((time.perf_counter() - inicio) * 1000, 1)
+    Y, X = series["Y"], series["X"]
+
+    beta = pronosticos.ajustar(Y, X)
+    ms_lotes = _medir_ms(lambda: pronosticos.ajustar(Y, X), repeticiones)
+    ms_bucle = _medir_ms(lambda: _ajustar_por_serie(Y, X), max(1, repeticiones // 2))
+    ms_prediccion = _medir_ms(lambda: pronosticos.predecir(beta, series["X_futuro"]), repeticiones)
+
+    version = modelo_estrella.huella(df_fact)
+    pronosticos.obtener_pronosticos(cubo, version)
+    ms_memorizado = _medir_ms(lambda: pronosticos.obtener_pronosticos(cubo, version), repeticiones)
+
+    comun = {"series": Y.shape[1], "metricas": Y.shape[0], "anios_historia": Y.shape[2],
+             "anios_futuro": len(series["futuro"]), "covariable_poblacion": poblacion is not None,
+             "ms_preparar": ms_preparar}
+    return pd.DataFrame([
+        {"modo": "por lotes (einsum + solve)", **comun, "ms_ajuste": ms_lotes, "ms_prediccion": ms_prediccion,
+         "aceleracion": round(ms_bucle / ms_lotes, 1), "max_dif_coef": 0.0},
+        {"modo": "una serie a la vez (bucle)", **comun, "ms_ajuste": ms_bucle, "aceleracion": 1.0,
+         "max_dif_coef": float(np.nanmax(np.abs(_ajustar_por_serie(Y, X) - beta)))},
+        {"modo": "memorizado (obtener_pronosticos)", **comun, "ms_ajuste": ms_memorizado},
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p_socrata = sub.add_parser("socrata", help="Descarga paginada vs tamaño de página y hilos")
+    p_socrata.add_argument("--filas", type=int, default=200_000)
+    p_socrata.add_argument("--latencia", type=float, default=0.05)
+
+    p_cache = sub.add_parser("cache", help="Snapshot en disco: frío, caliente, revalidado y offline")
+    p_cache.add_argument("--filas", type=int, default=200_000)
+    p_cache.add_argument("--latencia", type=float, default=0.05)
+
+    p_modelo = sub.add_parser("modelo", help="Modelo estrella: primera llamada vs reruns memoizados")
+    p_modelo.add_argument("--filas", type=int, default=200_000)
+
+    p_hechos = sub.add_parser("hechos", help="Tabla de hechos: factorización vs merge")
+    p_hechos.add_argument("--filas", type=int, default=1_000_000)
+
+    p_almacen = sub.add_parser("almacen", help="Bodega SQLite: escritura, lectura y agregaciones SQL")
+    p_almacen.add_argument("--filas", type=int, default=1_000_000)
+
+    p_particiones = sub.add_parser("particiones", help="Parquet particionado por año vs recorrido en memoria")
+    p_particiones.add_argument("--filas", type=int, nargs="+", default=[250_000, 1_000_000, 4_000_000])
+
+    p_mapa = sub.add_parser("mapa", help="Mapa estático vs animado: costo por interacción")
+    p_mapa.add_argument("--shapes", default="data/shapes/MGN_ANM_DPTOS.shp")
+    p_mapa.add_argument("--filas", type=int, default=200_000)
+
+    p_exportacion = sub.add_parser("exportacion", help="Exportaciones: tiempo, tamaño y memoria pico por formato")
+    p_exportacion.add_argument("--filas", type=int, default=200_000)
+
+    p_proyecciones = sub.add_parser("proyecciones", help="Libros de proyecciones: frío, caliente y cruce con hechos")
+    p_proyecciones.add_argument("--filas", type=int, default=1_000_000)
+
+    p_geografia = sub.add_parser("geografia", help="Nombres de departamento → códigos DIVIPOLA")
+    p_geografia.add_argument("--filas", type=int, default=100_000)
+
+    p_soql = sub.add_parser("soql", help="Proyección, filtros y agregados en el servidor vs descarga completa")
+    p_soql.add_argument("--filas", type=int, default=200_000)
+
+    p_rerun = sub.add_parser("rerun", help="Latencia de una interacción: todas las pestañas vs pestaña abierta vs fragmento")
+    p_rerun.add_argument("--filas", type=int, default=200_000)
+
+    p_precarga = sub.add_parser("precarga", help="Tiempo hasta el primer gráfico: carga en serie vs precarga concurrente")
+    p_precarga.add_argument("--filas", type=int, default=200_000)
+    p_precarga.add_argument("--latencia", type=float, default=0.05)
+
+    p_etapas = sub.add_parser("etapas", help="Tiempo y memoria por etapa con datos sintéticos, contra la línea base")
+    p_etapas.add_argument("--filas", type=int, nargs="+", default=[50_000, 500_000, 5_000_000])
+    p_etapas.add_argument("--guardar-linea-base", action="store_true")
+
+    p_sesiones = sub.add_parser("sesiones", help="N sesiones concurrentes: RSS y p95 del rerun, compartido vs copia por sesión")
+    p_sesiones.add_argument("--sesiones", type=int, nargs="+", default=[1, 10, 25])
+    p_sesiones.add_argument("--filas", type=int, default=200_000)
+
+    p_graficos = sub.add_parser("graficos", help="Figuras: construcción, KB enviados y rerun memorizado, completo vs ligero")
+    p_graficos.add_argument("--filas", type=int, default=1_000_000)
+
+    p_etl = sub.add_parser("etl", help="ETL sin Streamlit: tiempo por etapa según procesos de limpieza")
+    p_etl.add_argument("--filas", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    p_etl.add_argument("--procesos", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+
+    p_ingesta = sub.add_parser("ingesta", help="JSON a objetos vs CSV tipado: tiempo, memoria pico y final")
+    p_ingesta.add_argument("--filas", type=int, default=1_000_000)
+
+    p_pronosticos = sub.add_parser("pronosticos", help="Pronósticos: ajuste por lotes vs una serie a la vez")
+    p_pronosticos.add_argument("--filas", type=int, default=1_000_000)
+
+    args = parser.parse_args()
+    datos_compartidos.activar_copy_on_write()
+    if args.benchmark == "socrata":
+        print(bench_socrata(args.filas, latencia=args.latencia).to_string(index=False))
+    elif args.benchmark == "cache":
+        print(bench_cache(args.filas, latencia=args.latencia).to_string(index=False))
+    elif args.benchmark == "modelo":
+        print(bench_modelo_estrella(args.filas).to_string(index=False))
+    elif args.benchmark == "hechos":
+        print(bench_tabla_hechos(args.filas).to_string(index=False))
+    elif args.benchmark == "almacen":
+        print(bench_almacen(args.filas).to_string(index=False))
+    elif args.benchmark == "particiones":
+        print(bench_particiones(args.filas).to_string(index=False))
+    elif args.benchmark == "mapa":
+        print(bench_mapa(args.shapes, args.filas).to_string(index=False))
+    elif args.benchmark == "exportacion":
+        print(bench_exportacion(args.filas).to_string(index=False))
+    elif args.benchmark == "proyecciones":
+        print(bench_proyecciones(args.filas).to_string(index=False))
+    elif args.benchmark == "geografia":
+        print(bench_geografia(args.filas).to_string(index=False))
+    elif args.benchmark == "soql":
+        print(bench_soql(args.filas).to_string(index=False))
+    elif args.benchmark == "rerun":
+        print(bench_rerun(args.filas).to_string(index=False))
+    elif args.benchmark == "precarga":
+        print(bench_precarga(args.filas, latencia=args.latencia).to_string(index=False))
+    elif args.benchmark == "etapas":
+        print(bench_etapas(args.filas, args.guardar_linea_base).to_string(index=False))
+    elif args.benchmark == "sesiones":
+        print(bench_sesiones(args.sesiones, args.filas).to_string(index=False))
+    elif args.benchmark == "graficos":
+        print(bench_graficos(args.filas).to_string(index=False))
+    elif args.benchmark == "etl":
+        print(bench_etl(args.filas, args.procesos).to_string(index=False))
+    elif args.benchmark == "ingesta":
+        print(bench_ingesta(args.filas).to_string(index=False))
+    elif args.benchmark == "pronosticos":
+        print(bench_pronosticos(args.filas).to_string(index=False))
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+import requests
+
+import datos_compartidos
+from memo_compartido import MemoCompartido
+from socrata import revalidar
+
+# Carpeta compartida por todas las sesiones del mismo servidor
+CACHE_DIR = Path(os.environ.get("DASHBOARD_CACHE_DIR", "Datos/cache"))
+
+# Tiempo durante el cual un snapshot se sirve sin preguntar al portal
+TTL_SEGUNDOS = int(os.environ.get("DASHBOARD_CACHE_TTL", 6 * 3600))
+
+# Tamaño máximo de la carpeta de snapshots antes de desalojar los menos usados
+MAX_BYTES = int(os.environ.get("DASHBOARD_CACHE_MAX_BYTES", 500 * 1024 ** 2))
+
+# Con DASHBOARD_OFFLINE=1 nunca se consulta la API si hay un snapshot guardado
+OFFLINE = os.environ.get("DASHBOARD_OFFLINE", "0") == "1"
+
+# Mensajes para mostrar en las pestañas según de dónde salieron los datos
+ORIGENES = {
+    "cache": "⚡ Datos servidos desde el snapshot local.",
+    "revalidado": "✅ Snapshot local vigente: el portal confirmó que no hubo cambios.",
+    "api": "📡 Datos descargados desde la API y guardados en el snapshot local.",
+    "offline": "⚠️ API no disponible: se muestra el último snapshot guardado.",
+}
+
+# Un candado por snapshot evita que dos sesiones descarguen lo mismo a la vez
+_snapshots = MemoCompartido()
+
+
+def candado_snapshot(dataset_id: str, params: Optional[dict] = None) -> threading.Lock:
+    """Candado del snapshot, para quien lo lea y reescriba fuera de `cargar_con_cache`."""
+    return _snapshots.candado(clave_snapshot(dataset_id, params))
+
+
+# ===================================================================
+# Función: clave_snapshot
+# ===================================================================
+def clave_snapshot(dataset_id: str, params: Optional[dict] = None) -> str:
+    """
+    Construye el nombre del snapshot a partir del dataset y los parámetros de consulta.
+
+    Returns:
+        str: Clave estable, ej. "nudc-7mev-3f2a9c1b0d4e".
+    """
+    firma = json.dumps(params or {}, sort_keys=True, default=str)
+    return f"{dataset_id}-{hashlib.sha1(firma.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _rutas(clave: str):
+    return CACHE_DIR / f"{clave}.parquet", CACHE_DIR / f"{clave}.json"
+
+
+# ===================================================================
+# Función: info_snapshot
+# ===================================================================
+def info_snapshot(dataset_id: str, params: Optional[dict] = None) -> Optional[dict]:
+    """
+    Devuelve los metadatos del snapshot (fecha, ETag, filas, bytes) o None si no existe.
+    """
+    ruta_datos, ruta_meta = _rutas(clave_snapshot(dataset_id, params))
+    if not (ruta_datos.exists() and ruta_meta.exists()):
+        return None
+    return json.loads(ruta_meta.read_text(encoding="utf-8"))
+
+
+def _version(meta: dict) -> str:
+    # Los snapshots guardados antes de existir el campo se identifican por su fecha
+    return meta.get("version", str(meta["guardado"]))
+
+
+def _leer(clave: str) -> pd.DataFrame:
+    ruta_datos, ruta_meta = _rutas(clave)
+    meta = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    # La fecha de modificación del archivo sirve como "último uso" para el desalojo
+    os.utime(ruta_datos)
+    # Todas las sesiones reciben el mismo DataFrame mientras el snapshot no cambie
+    return datos_compartidos.compartir(clave, _version(meta), lambda: pd.read_parquet(ruta_datos))
+
+
+def _escribir_json(ruta: Path, contenido: dict):
+    temporal = ruta.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    temporal.write_text(json.dumps(contenido), encoding="utf-8")
+    os.replace(temporal, ruta)
+
+
+def _normalizar_para_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """Serializa como JSON las columnas con objetos anidados (ej. puntos geográficos)."""
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        anidados = df[col].map(lambda v: isinstance(v, (dict, list)))
+        if anidados.any():
+            df[col] = df[col].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+    return df
+
+
+def _guardar(clave: str, df: pd.DataFrame, meta: dict):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    ruta_datos, ruta_meta = _rutas(clave)
+    # Escritura atómica: otras sesiones nunca ven un archivo a medio escribir
+    temporal = ruta_datos.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    _normalizar_para_parquet(df).to_parquet(temporal, index=False)
+    os.replace(temporal, ruta_datos)
+    meta["bytes"] = ruta_datos.stat().st_size
+    # Cambia solo cuando cambian los datos (la revalidación conserva la versión)
+    meta["version"] = f"{time.time_ns():x}"
+    _escribir_json(ruta_meta, meta)
+    return meta["version"]
+
+
+# ===================================================================
+# Función: leer_snapshot
+# ===================================================================
+def leer_snapshot(dataset_id: str, params: Optional[dict] = None) -> Optional[pd.DataFrame]:
+    """
+    Lee el snapshot guardado sin revisar su vigencia.
+
+    Returns:
+        pd.DataFrame | None: Datos del snapshot o None si no existe.
+    """
+    if info_snapshot(dataset_id, params) is None:
+        return None
+    return _leer(clave_snapshot(dataset_id, params))
+
+
+# ===================================================================
+# Función: guardar_snapshot
+# ===================================================================
+def guardar_snapshot(dataset_id: str, params: Optional[dict], df: pd.DataFrame,
+                     etag: Optional[str] = None, last_modified: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reemplaza el snapshot de `dataset_id`/`params` y aplica el límite de tamaño de la carpeta.
+
+    Returns:
+        pd.DataFrame: Referencia a `df` ya compartida con las demás sesiones (ver `datos_compartidos`).
+    """
+    clave = clave_snapshot(dataset_id, params)
+    version = _guardar(clave, df, {
+        "dataset_id": dataset_id,
+        "params": params or {},
+        "guardado": time.time(),
+        "etag": etag,
+        "last_modified": last_modified,
+        "filas": len(df),
+    })
+    desalojar()
+    return datos_compartidos.publicar(clave, version, df)
+
+
+# ===================================================================
+# Función: desalojar
+# ===================================================================
+def desalojar(max_bytes: int = MAX_BYTES) -> list:
+    """
+    Elimina los snapshots usados hace más tiempo hasta quedar bajo `max_bytes`.
+
+    Returns:
+        list: Claves eliminadas.
+    """
+    if not CACHE_DIR.exists():
+        return []
+    archivos = sorted(CACHE_DIR.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in archivos)
+    eliminados = []
+    for ruta in archivos:
+        if total <= max_bytes:
+            break
+        total -= ruta.stat().st_size
+        ruta.unlink(missing_ok=True)
+        ruta.with_suffix(".json").unlink(missing_ok=True)
+        eliminados.append(ruta.stem)
+    return eliminados
+
+
+# ===================================================================
+# Función: cargar_con_cache
+# ===================================================================
+def cargar_con_cache(dataset_id: str, params: Optional[dict],
+                     descargar: Callable[[], pd.DataFrame],
+                     ttl: int = TTL_SEGUNDOS, offline: bool = OFFLINE,
+                     base_url: Optional[str] = None):
+    """
+    Devuelve el dataset desde el snapshot en disco si sigue vigente; si no, lo revalida o descarga.
+
+    Orden de decisión:
+        1. Snapshot con menos de `ttl` segundos (o modo offline) → se lee del disco.
+        2. Snapshot vencido → petición condicional con ETag/Last-Modified;
+           si el portal responde 304 se renueva el TTL sin descargar.
+        3. Sin snapshot o dataset modificado → `descargar()` y se guarda.
+        4. Si la API falla y existe un snapshot, se sirve el último bueno.
+
+    Args:
+        dataset_id (str): Identificador Socrata (ej. "nudc-7mev").
+        params (dict): Parámetros de la consulta; forman parte de la clave.
+        descargar (callable): Función que trae el dataset completo desde la API.
+        ttl (int): Vigencia del snapshot en segundos.
+        offline (bool): Nunca consultar la API si hay snapshot.
+        base_url (str): Raíz de la API para la revalidación (None = portal real).
+
+    Returns:
+        tuple: (DataFrame, origen) con origen en {"cache", "revalidado", "api", "offline"}.
+    """
+    clave = clave_snapshot(dataset_id, params)
+    with _snapshots.candado(clave):
+        meta = info_snapshot(dataset_id, params)
+        if meta and (offline or time.time() - meta["guardado"] < ttl):
+            return _leer(clave), "cache"
+
+        kwargs = {"base_url": base_url} if base_url else {}
+        try:
+            estado = revalidar(dataset_id, meta.get("etag") if meta else None,
+                               meta.get("last_modified") if meta else None, **kwargs)
+            if meta and not estado["modificado"]:
+                meta["guardado"] = time.time()
+                _escribir_json(_rutas(clave)[1], meta)
+                return _leer(clave), "revalidado"
+
+            df = descargar()
+        except requests.exceptions.RequestException:
+            if meta:
+                return _leer(clave), "offline"
+            raise
+
+        if not df.empty:
+            df = guardar_snapshot(dataset_id, params, df, estado["etag"], estado["last_modified"])
+        return df, "api"
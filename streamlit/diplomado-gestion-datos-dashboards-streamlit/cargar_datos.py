@@ -2,15 +2,99 @@ import streamlit as st
 import pandas as pd
 import requests
 
+from cache_snapshots import ORIGENES, cargar_con_cache
+from instrumentacion import etapa
+from modelo_estrella import COLUMNAS_RELEVANTES, TIPOS_CRUDO, build_star_schema
+from precarga import estado_tarea
+from registro_geografico import obtener_registro
+from sincronizacion import sincronizar_incremental
+from socrata import fetch_dataset
+from soql import ConsultaSoQL
+
+# Dataset MEN de estadísticas en educación preescolar, básica y media
+EDUCACION_DATASET = "nudc-7mev"
+
+# ===================================================================
+# Función: consulta_educacion
+# ===================================================================
+def consulta_educacion(anios: tuple = None, departamentos: list = None) -> ConsultaSoQL:
+    """
+    Consulta SoQL con solo las columnas que usa el modelo estrella y, opcionalmente,
+    los años y departamentos pedidos (el portal filtra antes de enviar).
+
+    Args:
+        anios (tuple): (desde, hasta), ambos inclusive. None = todos.
+        departamentos (list): Códigos DIVIPOLA enteros. None = todos.
+
+    Returns:
+        ConsultaSoQL: Consulta lista para `.params()`.
+    """
+    consulta = ConsultaSoQL().seleccionar(*COLUMNAS_RELEVANTES)
+    if anios:
+        consulta.entre('a_o', *anios)
+    if departamentos:
+        # El código puede venir con o sin cero a la izquierda ("05" / "5")
+        consulta.en('c_digo_departamento', sorted({f(c) for c in departamentos for f in (str, '{:02d}'.format)}))
+    return consulta
+
+# ===================================================================
+# Función: descargar_educacion
+# ===================================================================
+def descargar_educacion(consulta: ConsultaSoQL = None, page_size: int = 50000,
+                        max_workers: int = 4, progress=None) -> pd.DataFrame:
+    """
+    Trae el dataset pasando por el snapshot local, sin tocar la interfaz de Streamlit:
+    los errores se propagan, así que sirve también desde hilos en segundo plano (ver `precarga`).
+
+    Las páginas llegan por el endpoint CSV y se leen ya tipadas (`TIPOS_CRUDO`).
+
+    Returns:
+        pd.DataFrame: Registros de `consulta`, con el origen en `df.attrs["origen"]` y los
+            valores mal formados por columna en `df.attrs["malformados"]` (si se descargó).
+
+    Raises:
+        requests.exceptions.RequestException: Si la API falla y no hay snapshot.
+    """
+    params = (consulta or consulta_educacion()).params()
+    with etapa(f"API {EDUCACION_DATASET}") as e:
+        df, origen = cargar_con_cache(EDUCACION_DATASET, params, lambda: fetch_dataset(
+            EDUCACION_DATASET, params, page_size=page_size, max_workers=max_workers, progress=progress,
+            tipos=TIPOS_CRUDO))
+        e.filas(len(df)).cache(origen != "api")
+    df.attrs["origen"] = origen
+    return df
+
+# ===================================================================
+# Función: precargar_educacion
+# ===================================================================
+def precargar_educacion(progress=None) -> pd.DataFrame:
+    """
+    Tarea de precarga: descarga el dataset y deja el modelo estrella memorizado,
+    así la sesión lo recibe sin repetir el pipeline.
+    """
+    df = descargar_educacion(progress=progress)
+    if not df.empty:
+        try:
+            build_star_schema(df)
+        except ValueError:
+            pass  # La pestaña de transformación muestra el error
+    return df
+
 # ===================================================================
 # Función: load_data_from_api
 # ===================================================================
-def load_data_from_api(limit: int = 50000) -> pd.DataFrame:
+def load_data_from_api(page_size: int = 50000, max_workers: int = 4, progress=None,
+                       consulta: ConsultaSoQL = None) -> pd.DataFrame:
     """
-    Carga datos desde la API de Socrata en formato JSON y los convierte en un DataFrame de pandas.
+    Carga el dataset desde la API de Socrata, paginando en paralelo, y lo convierte en un DataFrame de pandas.
+    Solo se piden las columnas y filas de `consulta` (por defecto, las columnas del modelo estrella).
+    Si existe un snapshot local vigente (ver `cache_snapshots`), lo sirve sin descargar.
 
     Args:
-        limit (int): Número máximo de registros a solicitar. Por defecto es 50,000.
+        page_size (int): Registros por página solicitada. Por defecto es 50,000.
+        max_workers (int): Páginas descargadas en paralelo.
+        progress (callable): Función `progress(paginas_listas, total_paginas)` para reportar avance.
+        consulta (ConsultaSoQL): Proyección y filtros a aplicar en el servidor.
 
     Returns:
         pd.DataFrame: DataFrame con los datos cargados. Si ocurre un error, devuelve un DataFrame vacío.
@@ -18,13 +102,8 @@ def load_data_from_api(limit: int = 50000) -> pd.DataFrame:
     Raises:
         requests.exceptions.RequestException: Si hay un problema de conexión o respuesta HTTP.
     """
-    api_url = f"https://www.datos.gov.co/resource/nudc-7mev.json?$limit={limit}"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()  # Verifica si la respuesta fue exitosa
-        data = response.json()
-        df = pd.DataFrame(data)
-        return df
+        return descargar_educacion(consulta, page_size, max_workers, progress)
     except requests.exceptions.RequestException as e:
         # Muestra un mensaje de error en la interfaz de Streamlit si hay un problema de conexión
         st.error(f"Error de conexión: {e}")
@@ -34,6 +113,34 @@ def load_data_from_api(limit: int = 50000) -> pd.DataFrame:
     # Retorna un DataFrame vacío en caso de error
     return pd.DataFrame()
 
+# ===================================================================
+# Función: sync_data_from_api
+# ===================================================================
+def sync_data_from_api(progress=None, consulta: ConsultaSoQL = None) -> pd.DataFrame:
+    """
+    Sincroniza el snapshot local del dataset trayendo solo los años nuevos
+    y los años que el portal haya corregido (ver `sincronizacion`).
+
+    Args:
+        progress (callable): Función `progress(paginas_listas, total_paginas)` para reportar avance.
+        consulta (ConsultaSoQL): Misma consulta de `load_data_from_api` (comparten el snapshot).
+
+    Returns:
+        pd.DataFrame: Dataset completo actualizado, con el resumen en `df.attrs["sincronizacion"]`.
+            Si ocurre un error, devuelve un DataFrame vacío.
+    """
+    try:
+        df, resumen = sincronizar_incremental(EDUCACION_DATASET, progress=progress,
+                                              params=(consulta or consulta_educacion()).params(),
+                                              tipos=TIPOS_CRUDO)
+        df.attrs["sincronizacion"] = resumen
+        return df
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error de conexión: {e}")
+    except Exception as e:
+        st.error(f"Error inesperado: {e}")
+    return pd.DataFrame()
+
 # ===================================================================
 # Función: show_data_tab
 # ===================================================================
@@ -48,13 +155,47 @@ def show_data_tab():
     st.markdown("""
     Este conjunto de datos proviene del portal [datos.gov.co](https://www.datos.gov.co/Educaci-n/MEN_ESTADISTICAS_EN_EDUCACION_EN_PREESCOLAR-B-SICA/nudc-7mev).
     
-    Presiona el botón para cargar los datos directamente desde la API.
+    La carga completa arranca sola en segundo plano al abrir la aplicación. Presiona el
+    botón para volver a cargar con otros filtros, o sincroniza para traer solo los años
+    nuevos o corregidos desde la última carga.
     """)
 
-    # Botón para cargar los datos
-    if st.button("🔄 Cargar datos"):
+    # Filtros que se aplican en el portal: solo viajan las filas y columnas necesarias
+    with st.expander("⚙️ Filtros en el servidor (SoQL)"):
+        anios = None
+        if st.checkbox("Filtrar por años"):
+            anios = st.slider("Años", 2011, 2035, (2011, 2035))
+        registro = obtener_registro()
+        nombres = st.multiselect("Departamentos (vacío = todos)", registro.departamentos.tolist())
+        departamentos = registro.codigo_departamento(nombres).tolist() if nombres else None
+        consulta = consulta_educacion(anios, departamentos)
+        st.code("\n".join(f"{k}={v}" for k, v in consulta.params().items()), language="sql")
+
+    # Botones para cargar o sincronizar los datos
+    col_cargar, col_sincronizar = st.columns(2)
+    cargar = col_cargar.button("🔄 Cargar datos")
+    sincronizar = col_sincronizar.button("⏩ Sincronizar años nuevos")
+
+    if cargar or sincronizar:
         with st.spinner("Cargando datos desde la API..."):
-            df_raw = load_data_from_api()
+            barra = st.progress(0.0)
+            progreso = lambda hechas, total: barra.progress(
+                hechas / total, text=f"Páginas descargadas: {hechas}/{total}")
+            df_raw = (sync_data_from_api(progreso, consulta) if sincronizar
+                      else load_data_from_api(progress=progreso, consulta=consulta))
+            barra.empty()
+            if sincronizar and "sincronizacion" in df_raw.attrs:
+                resumen = df_raw.attrs["sincronizacion"]
+                st.caption(
+                    f"Sincronización {resumen['modo']}: {resumen['filas_descargadas']:,} filas descargadas · "
+                    f"años nuevos {resumen['anios_nuevos'] or '—'} · "
+                    f"años corregidos {resumen['anios_corregidos'] or '—'}")
+            else:
+                st.caption(ORIGENES.get(df_raw.attrs.get("origen"), ""))
+            malformados = {col: n for col, n in df_raw.attrs.get("malformados", {}).items() if n}
+            if malformados:
+                st.caption("⚠️ Valores mal formados (quedan nulos): " +
+                           " · ".join(f"{col}: {n:,}" for col, n in malformados.items()))
 
         # Verifica si se cargaron datos correctamente
         if not df_raw.empty:
@@ -65,6 +206,6 @@ def show_data_tab():
             st.dataframe(df_raw.head(10))
         else:
             st.warning("No se encontraron datos o hubo un error en la carga.")
-    else:
+    elif estado_tarea('educacion') is None:
         # Mensaje informativo si aún no se ha presionado el botón
         st.info("Presiona el botón para iniciar la carga.")
\ No newline at end of file
@@ -2,26 +2,60 @@ import streamlit as st
 import pandas as pd
 import requests
 
+from cache_snapshots import ORIGENES, cargar_con_cache
+from instrumentacion import etapa
+from precarga import estado_tarea
+from socrata import fetch_dataset
+from soql import ConsultaSoQL
+
 # API Socrata de Infraestructura MEN
-INFRAESTRUCTURA_URL = "https://www.datos.gov.co/resource/3ncw-3qwq.json"
+INFRAESTRUCTURA_DATASET = "3ncw-3qwq"
+
+# Columnas que usa la pestaña de comparación
+COLUMNAS_INFRAESTRUCTURA = ['nombre_depto', 'aulas_mejoradas']
 
-def load_infraestructura_from_api(limit: int = 50000) -> pd.DataFrame:
+def consulta_infraestructura(por_departamento: bool = False) -> ConsultaSoQL:
+    """
+    Consulta SoQL con solo las columnas de la comparación; con `por_departamento`
+    el portal devuelve directamente la suma de aulas mejoradas por departamento.
     """
-    Carga datos de infraestructura educativa desde la API Socrata del MEN.
+    if por_departamento:
+        return (ConsultaSoQL().seleccionar('nombre_depto')
+                .agregar('sum', 'aulas_mejoradas', 'aulas_mejoradas')
+                .agrupar('nombre_depto'))
+    return ConsultaSoQL().seleccionar(*COLUMNAS_INFRAESTRUCTURA)
+
+def descargar_infraestructura(por_departamento: bool = False, page_size: int = 50000,
+                              max_workers: int = 4, progress=None) -> pd.DataFrame:
+    """
+    Igual que `load_infraestructura_from_api`, pero propaga los errores en vez de
+    mostrarlos: es la versión que usa la precarga en segundo plano.
+    """
+    params = consulta_infraestructura(por_departamento).params()
+    with etapa(f"API {INFRAESTRUCTURA_DATASET}") as e:
+        df, origen = cargar_con_cache(INFRAESTRUCTURA_DATASET, params, lambda: fetch_dataset(
+            INFRAESTRUCTURA_DATASET, params, page_size=page_size, max_workers=max_workers, progress=progress))
+        e.filas(len(df)).cache(origen != "api")
+    df.attrs["origen"] = origen
+    return df
+
+def load_infraestructura_from_api(page_size: int = 50000, max_workers: int = 4, progress=None,
+                                  por_departamento: bool = False) -> pd.DataFrame:
+    """
+    Carga datos de infraestructura educativa desde la API Socrata del MEN,
+    pasando por el snapshot local en disco.
 
     Args:
-        limit (int): Límite de registros a consultar.
+        page_size (int): Registros por página solicitada.
+        max_workers (int): Páginas descargadas en paralelo.
+        progress (callable): Función `progress(paginas_listas, total_paginas)` para reportar avance.
+        por_departamento (bool): Traer solo los totales por departamento (`$group` en el portal).
 
     Returns:
         pd.DataFrame: Datos en DataFrame o vacío si hay error.
     """
-    url = f"{INFRAESTRUCTURA_URL}?$limit={limit}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data)
-        return df
+        return descargar_infraestructura(por_departamento, page_size, max_workers, progress)
     except requests.exceptions.RequestException as e:
         st.error(f"Error de conexión: {e}")
     except Exception as e:
@@ -34,12 +68,19 @@ def show_infraestructura_tab():
     st.markdown("""
     Este conjunto de datos proviene de [datos.gov.co](https://www.datos.gov.co/Educaci-n/MEN_INDICADORES_INFRAESTRUCTURA/3ncw-3qwq).
     
-    Presiona el botón para cargar directamente los datos de infraestructura educativa.
+    Los datos se cargan solos en segundo plano al abrir la aplicación; presiona el botón
+    para volver a cargarlos (por ejemplo, solo con los totales por departamento).
     """)
 
+    por_departamento = st.checkbox("Traer solo totales por departamento (agregado en el servidor)")
+
     if st.button("📡 Cargar Infraestructura"):
         with st.spinner("Cargando datos desde la API..."):
-            df_infra = load_infraestructura_from_api()
+            barra = st.progress(0.0)
+            df_infra = load_infraestructura_from_api(progress=lambda hechas, total: barra.progress(
+                hechas / total, text=f"Páginas descargadas: {hechas}/{total}"), por_departamento=por_departamento)
+            barra.empty()
+            st.caption(ORIGENES.get(df_infra.attrs.get("origen"), ""))
 
         if not df_infra.empty:
             st.session_state['df_infraestructura'] = df_infra
@@ -47,5 +88,5 @@ def show_infraestructura_tab():
             st.dataframe(df_infra.head(20))
         else:
             st.warning("No se pudieron cargar los datos.")
-    else:
+    elif estado_tarea('infraestructura') is None:
         st.info("Presiona el botón para iniciar la carga.")
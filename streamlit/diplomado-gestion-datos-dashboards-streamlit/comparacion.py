@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from cubo_olap import obtener_cubo
+from instrumentacion import etapa, graficar
+from registro_geografico import SIN_CODIGO, obtener_registro
+from vista_hechos import obtener_vista
+
 def show_comparacion_tab():
     st.header("🏫 Comparación: Infraestructura vs Cobertura Educativa")
 
@@ -9,24 +14,35 @@ def show_comparacion_tab():
         st.warning("Primero debes cargar tanto los datos educativos como los datos de infraestructura.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    df_infra = st.session_state['df_infraestructura'].copy()
+    vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
+    cubo = obtener_cubo(vista)
+    # Copia superficial: las columnas nuevas quedan en esta ejecución y no en el dataset compartido
+    df_infra = st.session_state['df_infraestructura'].copy(deep=False)
 
     # =============== Preprocesamiento ===============
-    df_geo = dim_geo[['id_geo', 'departamento']].drop_duplicates()
+    # Obtener cobertura neta promedio (ponderada por población) por departamento
+    df_cobertura = cubo.tabla('departamento')['cobertura_neta'].reset_index()
 
-    # Obtener cobertura neta promedio por departamento
-    df_cobertura = df_fact.merge(df_geo, on='id_geo')
-    df_cobertura = df_cobertura.groupby('departamento')['cobertura_neta'].mean().reset_index()
+    # Llave entera DIVIPOLA en ambos lados: tildes y variantes de nombre no pierden filas
+    registro = obtener_registro()
+    df_cobertura['cod_departamento'] = registro.codigo_departamento(
+        df_cobertura['departamento'].map(cubo.codigo_departamento))
 
     # Procesar datos de infraestructura
-    df_infra['aulas_mejoradas'] = pd.to_numeric(df_infra.get('aulas_mejoradas', 0), errors='coerce').fillna(0)
-    df_infra['nombre_depto'] = df_infra['nombre_depto'].str.strip().str.title()
-    df_infra_agg = df_infra.groupby('nombre_depto')['aulas_mejoradas'].sum().reset_index()
+    with etapa("comparación: infraestructura × cobertura", filas_entrada=len(df_infra)) as e:
+        df_infra['aulas_mejoradas'] = pd.to_numeric(df_infra.get('aulas_mejoradas', 0), errors='coerce').fillna(0)
+        df_infra['cod_departamento'] = registro.codigo_departamento(df_infra['nombre_depto'])
+        df_infra_agg = df_infra.groupby('cod_departamento')['aulas_mejoradas'].sum().reset_index()
+
+        # Unión por código de departamento
+        df_comparado = df_cobertura.merge(df_infra_agg, on='cod_departamento', how='inner')
+        df_comparado = df_comparado[df_comparado['cod_departamento'] != SIN_CODIGO]
+        e.filas(len(df_comparado))
 
-    # Unión por nombre de departamento
-    df_comparado = df_cobertura.merge(df_infra_agg, left_on='departamento', right_on='nombre_depto', how='inner')
+    no_encontrados = registro.no_encontrados(df_infra['nombre_depto'])
+    if not no_encontrados.empty:
+        with st.expander(f"⚠️ {len(no_encontrados)} nombres de departamento sin código DIVIPOLA"):
+            st.dataframe(no_encontrados)
 
     # =================== GRÁFICO ===================
     st.subheader("📊 Relación entre Aulas Mejoradas y Cobertura Neta Promedio")
@@ -48,4 +64,4 @@ def show_comparacion_tab():
     fig.update_traces(textposition='top center')
     fig.update_layout(height=600)
 
-    st.plotly_chart(fig, use_container_width=True)
+    graficar(fig, "aulas vs cobertura", use_container_width=True)
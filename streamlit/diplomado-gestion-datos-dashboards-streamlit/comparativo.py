@@ -2,6 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from cubo_olap import obtener_cubo
+from instrumentacion import graficar
+from proyecciones import poblacion_de_hechos, ultima_carga
+from registro_geografico import SIN_CODIGO, obtener_registro
+from vista_hechos import obtener_vista
+
 def show_comparativo_tab():
     st.header("📉 Comparativo de Indicadores Educativos")
 
@@ -10,7 +16,43 @@ def show_comparativo_tab():
         st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
         return
 
-    df = st.session_state['df_fact'].merge(st.session_state['dim_geo'], on='id_geo')
+    vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
+    df = vista.df
+
+    st.subheader("👥 Población Proyectada (DANE)")
+
+    # Los libros se parsean una vez; los reruns leen la copia en memoria o en Parquet
+    try:
+        with st.spinner("Cargando proyecciones de población..."):
+            poblacion = poblacion_de_hechos(st.session_state['df_fact'], st.session_state['dim_geo'],
+                                            st.session_state['dim_tiempo'])
+    except Exception as e:
+        st.error(f"No se pudieron leer las proyecciones de población: {e}")
+    else:
+        cargas = ultima_carga()
+        st.caption(" · ".join(f"{c.archivo}: {c.origen}, {c.ms:.0f} ms" for c in cargas.itertuples()))
+        st.metric("Filas de hechos con población proyectada", f"{poblacion.notna().mean():.0%}")
+
+        anio_pob = st.selectbox("Año", vista.anios(), index=len(vista.anios()) - 1, key='anio_poblacion')
+        filas = vista.filtrar(anio=anio_pob, columnas=['departamento', 'tasa_matriculaci_n_5_16'])
+        filas = filas.assign(poblacion_proyectada=poblacion.to_numpy()[filas.index])
+        por_depto = (filas.groupby('departamento', observed=True)
+                          .agg(poblacion_proyectada=('poblacion_proyectada', 'first'),
+                               tasa_matriculaci_n_5_16=('tasa_matriculaci_n_5_16', 'mean'))
+                          .dropna()
+                          .reset_index())
+        if not por_depto.empty:
+            fig = px.scatter(
+                por_depto,
+                x='poblacion_proyectada',
+                y='tasa_matriculaci_n_5_16',
+                hover_name='departamento',
+                log_x=True,
+                labels={'poblacion_proyectada': 'Población Proyectada',
+                        'tasa_matriculaci_n_5_16': 'Tasa de Matrícula (%)'},
+                title=f"Población Proyectada vs Tasa de Matrícula ({anio_pob})"
+            )
+            graficar(fig, "población proyectada", use_container_width=True)
 
     st.subheader("🔄 Cargar Datos Externos")
 
@@ -22,11 +64,18 @@ def show_comparativo_tab():
         st.write("Vista previa de los datos externos:")
         st.dataframe(df_ext.head())
 
-        # Opcional: intentar unir con df por departamento
+        # Opcional: intentar unir con df por código DIVIPOLA del departamento
         if 'departamento' in df_ext.columns:
-            df_ext['departamento'] = df_ext['departamento'].str.strip().str.title()
-            df_merge = df.merge(df_ext, on='departamento', how='inner')
+            registro = obtener_registro()
+            no_encontrados = registro.no_encontrados(df_ext['departamento'])
+            df_ext['cod_departamento'] = registro.codigo_departamento(df_ext['departamento'])
+            df_ext = df_ext[df_ext['cod_departamento'] != SIN_CODIGO].drop(columns='departamento')
+            df_merge = df.assign(cod_departamento=registro.codigo_departamento(df['c_digo_departamento']))
+            df_merge = df_merge.merge(df_ext, on='cod_departamento', how='inner')
             st.success("✅ Se integró exitosamente con los datos principales.")
+            if not no_encontrados.empty:
+                st.warning(f"⚠️ {len(no_encontrados)} nombres de departamento del archivo no tienen código DIVIPOLA.")
+                st.dataframe(no_encontrados)
 
             # Mostrar tabla cruzada
             st.dataframe(df_merge.head(20))
@@ -42,7 +91,7 @@ def show_comparativo_tab():
                     hover_name='departamento',
                     title=f"Relación entre {col_eje_x} y Tasa de Matrícula"
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                graficar(fig, "archivo externo", use_container_width=True)
 
 ## grafico 
 st.subheader("🏫 Comparación: Aulas Mejoradas vs Cobertura Neta Promedio")
@@ -50,23 +99,26 @@ st.subheader("🏫 Comparación: Aulas Mejoradas vs Cobertura Neta Promedio")
 # Verifica si los datos externos están cargados
 if 'df_externo' in st.session_state and 'df_fact' in st.session_state:
     df_ext = st.session_state['df_externo']
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
+    vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
 
     # Asegurarse de que existan columnas necesarias
     if 'AULAS_MEJORADAS' in df_ext.columns and 'departamento' in df_ext.columns:
         df_ext['AULAS_MEJORADAS'] = pd.to_numeric(df_ext['AULAS_MEJORADAS'], errors='coerce')
         df_ext = df_ext.dropna(subset=['AULAS_MEJORADAS', 'departamento'])
 
-        # Agrupar por departamento
-        aulas_por_depto = df_ext.groupby('departamento')['AULAS_MEJORADAS'].sum().reset_index()
+        # Agrupar por código DIVIPOLA del departamento
+        registro = obtener_registro()
+        df_ext = df_ext.assign(cod_departamento=registro.codigo_departamento(df_ext['departamento']))
+        aulas_por_depto = df_ext.groupby('cod_departamento')['AULAS_MEJORADAS'].sum().reset_index()
 
         # Promedio de cobertura por departamento
-        df = df_fact.merge(dim_geo, on='id_geo')
-        cobertura = df.groupby('departamento')['cobertura_neta'].mean().reset_index()
+        cubo = obtener_cubo(vista)
+        cobertura = cubo.tabla('departamento')['cobertura_neta'].reset_index()
+        cobertura['cod_departamento'] = registro.codigo_departamento(cobertura['departamento'].map(cubo.codigo_departamento))
 
         # Combinar
-        comparativo = aulas_por_depto.merge(cobertura, on='departamento', how='inner')
+        comparativo = aulas_por_depto.merge(cobertura, on='cod_departamento', how='inner')
+        comparativo = comparativo[comparativo['cod_departamento'] != SIN_CODIGO]
 
         # Graficar
         fig = px.scatter(
@@ -82,7 +134,7 @@ if 'df_externo' in st.session_state and 'df_fact' in st.session_state:
             },
             title='Relación entre Infraestructura y Cobertura Neta por Departamento'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        graficar(fig, "infraestructura externa", use_container_width=True)
     else:
         st.warning("⚠️ El archivo externo no contiene las columnas esperadas ('AULAS_MEJORADAS' y 'departamento').")
 else:
@@ -0,0 +1,204 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import etapa
+from modelo_estrella import METRICAS
+from vista_hechos import VistaHechos
+
+# Métrica usada como peso para los promedios ponderados
+PESO = 'poblaci_n_5_16'
+
+# Estadísticos calculados para cada métrica
+ESTADISTICOS = ['media', 'suma', 'conteo', 'media_pond']
+
+# Un cubo por vista (es decir, por versión del modelo estrella)
+_cubos: dict = {}
+_lock = threading.Lock()
+# Las sesiones que piden el mismo cubo a la vez esperan a la primera en vez de repetirlo
+_construccion = threading.Lock()
+
+
+def _sumar_por(codigos: np.ndarray, valores: np.ndarray, n: int) -> np.ndarray:
+    """Suma cada columna de `valores` agrupando por `codigos` (0..n-1)."""
+    return np.column_stack([np.bincount(codigos, weights=valores[:, j], minlength=n)
+                            for j in range(valores.shape[1])])
+
+
+def _a_estadisticos(acumulados: np.ndarray, filas: np.ndarray, indice) -> pd.DataFrame:
+    """Convierte sumas acumuladas (suma, conteo, suma ponderada, peso) en estadísticos."""
+    n = len(METRICAS)
+    suma, conteo, suma_pond, peso = (acumulados[:, i * n:(i + 1) * n] for i in range(4))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bloques = {
+            'media': suma / conteo,
+            'suma': suma,
+            'conteo': conteo,
+            'media_pond': suma_pond / peso,
+        }
+    columnas = pd.MultiIndex.from_product([ESTADISTICOS, METRICAS], names=['estadistico', 'metrica'])
+    datos = np.hstack([bloques[e] for e in ESTADISTICOS])
+    df = pd.DataFrame(datos, index=indice, columns=columnas)
+    df[('filas', '')] = filas
+    return df
+
+
+# ===================================================================
+# Clase: CuboOLAP
+# ===================================================================
+class CuboOLAP:
+    """
+    Cubo precalculado con media, suma, conteo y media ponderada por población
+    de cada métrica a nivel (departamento, año), (municipio, año), departamento,
+    municipio y año.
+
+    Todo sale de una sola pasada vectorizada sobre la tabla de hechos; los
+    gráficos leen cortes ya calculados (búsquedas en diccionario) en lugar de
+    hacer su propio groupby en cada interacción.
+    """
+
+    def __init__(self, vista: VistaHechos):
+        df = vista.df
+        cod_geo, geos = pd.factorize(df['id_geo'], sort=True)
+        cod_anio, anios = pd.factorize(df['a_o'], sort=True)
+        cod_depto = df['departamento'].cat.codes.to_numpy()
+        deptos = df['departamento'].cat.categories
+        n_geo, n_anio, n_depto = len(geos), len(anios), len(deptos)
+
+        # Departamento, nombre y código de cada municipio
+        depto_de_geo = np.zeros(n_geo, dtype=np.int64)
+        depto_de_geo[cod_geo] = cod_depto
+        nombre_mpio = np.empty(n_geo, dtype=object)
+        nombre_mpio[cod_geo] = df['municipio'].astype(object).to_numpy()
+        codigo_depto = np.empty(n_depto, dtype=object)
+        codigo_depto[cod_depto] = df['c_digo_departamento'].astype(object).to_numpy()
+
+        # Una sola pasada: sumas, conteos y sumas ponderadas por celda (municipio, año)
+        valores = df[METRICAS].to_numpy(dtype=np.float64)
+        validos = ~np.isnan(valores)
+        peso = df[PESO].to_numpy(dtype=np.float64)
+        con_peso = validos & ~np.isnan(peso)[:, None]
+        limpios = np.where(validos, valores, 0.0)
+        entradas = np.hstack([
+            limpios,
+            validos.astype(np.float64),
+            np.where(con_peso, limpios * np.nan_to_num(peso)[:, None], 0.0),
+            np.where(con_peso, np.nan_to_num(peso)[:, None], 0.0),
+        ])
+        celda = cod_geo.astype(np.int64) * n_anio + cod_anio
+        n_celdas = n_geo * n_anio
+        acumulado = _sumar_por(celda, entradas, n_celdas)
+        filas = np.bincount(celda, minlength=n_celdas)
+
+        # Los demás niveles se agregan desde las celdas (pocos miles de filas)
+        geo_celda = np.repeat(np.arange(n_geo), n_anio)
+        anio_celda = np.tile(np.arange(n_anio), n_geo)
+        depto_celda = depto_de_geo[geo_celda]
+        niveles = {
+            'municipio_anio': (np.arange(n_celdas), n_celdas),
+            'departamento_anio': (depto_celda * n_anio + anio_celda, n_depto * n_anio),
+            'municipio': (geo_celda, n_geo),
+            'departamento': (depto_celda, n_depto),
+            'anio': (anio_celda, n_anio),
+        }
+        indices = {
+            'municipio_anio': pd.MultiIndex.from_product([geos, anios], names=['id_geo', 'a_o']),
+            'departamento_anio': pd.MultiIndex.from_product([deptos, anios], names=['departamento', 'a_o']),
+            'municipio': pd.Index(geos, name='id_geo'),
+            'departamento': pd.Index(deptos, name='departamento'),
+            'anio': pd.Index(anios, name='a_o'),
+        }
+        self.niveles = {}
+        for nivel, (codigos, n) in niveles.items():
+            tabla = _a_estadisticos(_sumar_por(codigos, acumulado, n),
+                                    np.bincount(codigos, weights=filas, minlength=n), indices[nivel])
+            self.niveles[nivel] = tabla[tabla[('filas', '')] > 0].copy()
+
+        # Atributos descriptivos para los niveles de municipio y departamento
+        for nivel in ('municipio', 'municipio_anio'):
+            pos = self.niveles[nivel].index.get_level_values('id_geo')
+            pos = geos.get_indexer(pos)
+            self.niveles[nivel][('municipio', '')] = nombre_mpio[pos]
+            self.niveles[nivel][('departamento', '')] = deptos.to_numpy()[depto_de_geo[pos]]
+        self.niveles['departamento'][('c_digo_departamento', '')] = codigo_depto[
+            deptos.get_indexer(self.niveles['departamento'].index)]
+
+        # Cortes frecuentes listos para lectura directa
+        por_depto = self.niveles['departamento_anio']
+        self._series = {d: g.droplevel('departamento') for d, g in por_depto.groupby(level='departamento', observed=True)}
+        self._cortes = {a: g.droplevel('a_o') for a, g in por_depto.groupby(level='a_o')}
+        self._matrices: dict = {}
+        self.codigo_departamento = dict(zip(deptos, codigo_depto))
+
+    def tabla(self, nivel: str, estadistico: str = 'media_pond') -> pd.DataFrame:
+        """
+        Devuelve un nivel completo con una columna por métrica para el estadístico pedido.
+
+        Args:
+            nivel (str): 'departamento_anio', 'municipio_anio', 'departamento', 'municipio' o 'anio'.
+            estadistico (str): 'media', 'suma', 'conteo' o 'media_pond'.
+        """
+        return self._plano(self.niveles[nivel], estadistico)
+
+    def serie_departamento(self, departamento: str, estadistico: str = 'media_pond') -> pd.DataFrame:
+        """Serie anual de un departamento (índice = año)."""
+        return self._plano(self._series[departamento], estadistico)
+
+    def corte_anio(self, anio, estadistico: str = 'media_pond') -> pd.DataFrame:
+        """Todos los departamentos en un año (índice = departamento)."""
+        return self._plano(self._cortes[anio], estadistico)
+
+    def matriz(self, metrica: str, estadistico: str = 'media_pond') -> pd.DataFrame:
+        """Matriz departamento × año de una métrica (se calcula una vez y se reutiliza)."""
+        clave = (metrica, estadistico)
+        if clave not in self._matrices:
+            self._matrices[clave] = self.niveles['departamento_anio'][(estadistico, metrica)].unstack('a_o')
+        return self._matrices[clave]
+
+    @staticmethod
+    def _plano(tabla: pd.DataFrame, estadistico: str) -> pd.DataFrame:
+        # Selección por posición: buscar etiquetas en columnas MultiIndex sin ordenar
+        # no es seguro cuando varias sesiones leen el mismo cubo a la vez
+        nombre = tabla.columns.get_level_values(0).to_numpy()
+        metrica = tabla.columns.get_level_values(1).to_numpy()
+        columnas = np.flatnonzero(nombre == estadistico)
+        plano = tabla.iloc[:, columnas].copy()
+        plano.columns = pd.Index(metrica[columnas])
+        for extra in ('filas', 'municipio', 'departamento', 'c_digo_departamento'):
+            posicion = np.flatnonzero((nombre == extra) & (metrica == ''))
+            if len(posicion):
+                plano[extra] = tabla.iloc[:, posicion[0]].to_numpy()
+        return plano
+
+
+# ===================================================================
+# Función: obtener_cubo
+# ===================================================================
+def obtener_cubo(vista: VistaHechos) -> CuboOLAP:
+    """
+    Devuelve el cubo de la vista, calculándolo solo la primera vez.
+
+    Returns:
+        CuboOLAP: Cubo compartido por todas las pestañas.
+    """
+    clave = id(vista)
+    with etapa("cubo OLAP", filas_entrada=len(vista.df)) as e:
+        with _lock:
+            conocido = _cubos.get(clave)
+        if conocido and conocido[0]() is vista:
+            e.cache(True)
+            return conocido[1]
+
+        with _construccion:
+            with _lock:
+                conocido = _cubos.get(clave)
+            if conocido and conocido[0]() is vista:
+                e.cache(True)
+                return conocido[1]
+            cubo = CuboOLAP(vista)
+            e.cache(False)
+            with _lock:
+                _cubos[clave] = (weakref.ref(vista, lambda _, k=clave: _cubos.pop(k, None)), cubo)
+    return cubo
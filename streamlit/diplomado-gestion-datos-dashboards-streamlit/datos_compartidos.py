@@ -0,0 +1,143 @@
+"""
+Datasets compartidos por todas las sesiones del proceso, de solo lectura y por versión.
+
+Cada sesión de Streamlit guardaba su propia copia de los mismos datos públicos
+(el crudo de educación, la infraestructura): con 50 analistas en el servidor,
+50 copias. Aquí se guarda una sola por (nombre, versión) y cada sesión recibe
+una referencia: una copia superficial que comparte los arreglos del original.
+
+Con Copy-on-Write de pandas (el comportamiento por defecto desde pandas 3), lo
+que una sesión escriba en su referencia copia solo esa columna, en esa sesión;
+el original y las referencias de las demás sesiones no cambian. Importar el
+módulo no toca las opciones de pandas: los puntos de entrada (app.py, etl.py,
+benchmarks.py) llaman a `activar_copy_on_write` al arrancar.
+
+Uso:
+    df = compartir("nudc-7mev-3f2a9c1b0d4e", meta["version"], lambda: pd.read_parquet(ruta))
+"""
+import os
+import threading
+import weakref
+from typing import Callable, Hashable, Optional
+
+import pandas as pd
+
+from memo_compartido import MemoCompartido
+
+# Con DASHBOARD_COMPARTIR=0 cada sesión vuelve a tener su propia copia (para comparar)
+ACTIVO = os.environ.get("DASHBOARD_COMPARTIR", "1") == "1"
+
+# Versiones retenidas; al superarlas se suelta la usada hace más tiempo
+MAX_VERSIONES = int(os.environ.get("DASHBOARD_COMPARTIR_MAX", 8))
+
+_versiones = MemoCompartido(MAX_VERSIONES)
+_referencias: dict = {}
+_lock = threading.Lock()
+
+
+def activar_copy_on_write():
+    """
+    Activa Copy-on-Write de pandas si los datasets se comparten: sin él, escribir en
+    una referencia modificaría los datos de todas las sesiones.
+    """
+    if ACTIVO:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def referencia(base: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia superficial de `base` para una sesión: comparte los arreglos y se
+    recuerda de qué dataset compartido salió (ver `original`).
+    """
+    ref = base.copy(deep=False)
+    with _lock:
+        _referencias[id(ref)] = (weakref.ref(ref, lambda _, k=id(ref): _referencias.pop(k, None)), base)
+    return ref
+
+
+# ===================================================================
+# Función: compartir
+# ===================================================================
+def compartir(nombre: str, version: Hashable, cargar: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Devuelve una referencia al dataset `nombre` en la versión pedida, cargándolo
+    solo si ninguna sesión lo tiene ya en memoria.
+
+    Args:
+        nombre (str): Identificador del dataset (ej. la clave de su snapshot).
+        version (Hashable): Cambia cuando cambian los datos.
+        cargar (callable): Lee el dataset; se llama una sola vez por versión
+            aunque varias sesiones lo pidan a la vez.
+
+    Returns:
+        pd.DataFrame: Referencia de solo lectura compartida (copy-on-write).
+    """
+    if not ACTIVO:
+        return cargar()
+    base, _ = _versiones.obtener((nombre, version), cargar)
+    return referencia(base)
+
+
+def publicar(nombre: str, version: Hashable, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Registra `df` como la versión `version` de `nombre` (ej. recién descargado) y
+    devuelve una referencia. Se guarda una copia superficial, así que lo que quien
+    llama escriba después en `df` tampoco llega a las otras sesiones.
+    """
+    if not ACTIVO:
+        return df
+    base = df.copy(deep=False)
+    _versiones.guardar((nombre, version), base)
+    return referencia(base)
+
+
+# ===================================================================
+# Función: original
+# ===================================================================
+def original(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Dataset compartido del que salió `df`, si `df` es una referencia intacta.
+
+    Con Copy-on-Write, la primera escritura en una referencia reemplaza los
+    arreglos que compartía; por eso basta comparar su identidad para saber que
+    los datos siguen siendo los del original.
+
+    Returns:
+        pd.DataFrame | None: El original, o None si `df` no es una referencia o ya cambió.
+    """
+    with _lock:
+        conocido = _referencias.get(id(df))
+    if conocido is None or conocido[0]() is not df:
+        return None
+    base = conocido[1]
+    arreglos, arreglos_base = df._mgr.arrays, base._mgr.arrays
+    if not df.columns.equals(base.columns) or len(arreglos) != len(arreglos_base):
+        return None
+    if any(a is not b for a, b in zip(arreglos, arreglos_base)):
+        return None
+    return base
+
+
+def es_compartido(df) -> bool:
+    """True si `df` es una referencia intacta a un dataset compartido."""
+    return isinstance(df, pd.DataFrame) and original(df) is not None
+
+
+def resumen() -> pd.DataFrame:
+    """
+    Versiones en memoria del proceso.
+
+    Returns:
+        pd.DataFrame: Columnas [dataset, version, filas, MB, referencias].
+    """
+    versiones = _versiones.entradas()
+    with _lock:
+        vivas = [par[1] for par in _referencias.values() if par[0]() is not None]
+    filas = [{
+        'dataset': nombre,
+        'version': str(version),
+        'filas': len(df),
+        'MB': df.memory_usage(deep=True).sum() / 1024 ** 2,
+        'referencias': sum(base is df for base in vivas),
+    } for (nombre, version), df in versiones]
+    return pd.DataFrame(filas, columns=['dataset', 'version', 'filas', 'MB', 'referencias'])
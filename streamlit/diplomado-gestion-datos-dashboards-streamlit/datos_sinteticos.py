@@ -0,0 +1,194 @@
+"""
+Datos sintéticos con la forma de las respuestas JSON de la API Socrata del MEN.
+
+Reproducen lo que el ETL tiene que limpiar en los datos reales: nombres de
+departamento y municipio (los de DIVIPOLA) con mayúsculas, tildes y espacios inconsistentes,
+códigos con y sin cero a la izquierda, filas del nivel nacional y valores no
+numéricos en las métricas. Todo se genera con numpy a partir de pocos textos
+distintos, así que 5 millones de filas caben en memoria.
+
+Uso:
+    df_raw = educacion(500_000)          # nudc-7mev, columnas como texto
+    df_infra = infraestructura(50_000)   # 3ncw-3qwq
+    for pagina in paginas_json(df_raw):  # cuerpos JSON como los devuelve el portal
+        ...
+"""
+import json
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from registro_geografico import tabla_proyecciones
+
+# Departamentos con su código DIVIPOLA y el nombre como lo escribe el MEN
+DEPARTAMENTOS = {
+    5: "Antioquia", 8: "Atlántico", 11: "Bogotá, D.C.", 13: "Bolívar", 15: "Boyacá",
+    17: "Caldas", 18: "Caquetá", 19: "Cauca", 20: "Cesar", 23: "Córdoba",
+    25: "Cundinamarca", 27: "Chocó", 41: "Huila", 44: "La Guajira", 47: "Magdalena",
+    50: "Meta", 52: "Nariño", 54: "Norte de Santander", 63: "Quindío", 66: "Risaralda",
+    68: "Santander", 70: "Sucre", 73: "Tolima", 76: "Valle del Cauca", 81: "Arauca",
+    85: "Casanare", 86: "Putumayo", 88: "Archipiélago de San Andrés, Providencia y Santa Catalina",
+    91: "Amazonas", 94: "Guainía", 95: "Guaviare", 97: "Vaupés", 99: "Vichada",
+}
+
+ANIOS = range(2011, 2024)
+
+# Métricas del modelo estrella: (mínimo, máximo, decimales)
+METRICAS = {
+    'poblaci_n_5_16': (200, 900_000, 0),
+    'tasa_matriculaci_n_5_16': (40, 130, 2),
+    'cobertura_neta': (30, 110, 2),
+    'cobertura_bruta': (50, 140, 2),
+}
+
+# Columnas del dataset real que el tablero no usa (las pide la descarga completa)
+COLUMNAS_SIN_USO_EDUCACION = [
+    "c_digo_municipio", "c_digo_etc", "etc", "tama_o_promedio_de_grupo", "sedes_conectadas_a_internet",
+    "tasa_matriculaci_n_5_6", "cobertura_neta_transici_n", "cobertura_neta_primaria",
+    "cobertura_neta_secundaria", "cobertura_neta_media", "cobertura_bruta_transici_n",
+    "cobertura_bruta_primaria", "cobertura_bruta_secundaria", "cobertura_bruta_media",
+    "deserci_n", "aprobaci_n", "reprobaci_n", "repitencia",
+]
+
+# Lo que aparece en las métricas cuando el dato no existe
+NO_NUMERICOS = ["", "ND", "N/A", "-", "s.d.", "NaN"]
+
+# Valores distintos por métrica: las filas comparten los mismos objetos de texto
+_VALORES_POR_METRICA = 20_000
+
+
+def _sin_tildes(texto: str) -> str:
+    return texto.translate(str.maketrans("áéíóúÁÉÍÓÚ", "aeiouAEIOU"))
+
+
+def _variantes(nombre: str) -> list:
+    """Formas en que llega un mismo nombre: la canónica primero."""
+    return [nombre, nombre.upper(), _sin_tildes(nombre).upper(), f" {nombre} ", nombre.lower()]
+
+
+def _elegir(rng: np.random.Generator, n: int, n_variantes: int, p_canonica: float) -> np.ndarray:
+    """Índice de variante por fila: la canónica con probabilidad `p_canonica`, el resto uniforme."""
+    otras = rng.integers(1, n_variantes, n)
+    return np.where(rng.random(n) < p_canonica, 0, otras)
+
+
+def _textos(pool: list, indices: np.ndarray) -> np.ndarray:
+    """Arreglo de objetos que reutiliza los textos de `pool` (no crea un str por fila)."""
+    return np.array(pool, dtype=object)[indices]
+
+
+def _metrica(rng: np.random.Generator, n: int, minimo: float, maximo: float, decimales: int,
+             p_no_numerico: float) -> np.ndarray:
+    pool = [f"{v:.{decimales}f}" for v in rng.uniform(minimo, maximo, _VALORES_POR_METRICA)]
+    valores = _textos(pool, rng.integers(0, _VALORES_POR_METRICA, n))
+    faltan = rng.random(n) < p_no_numerico
+    valores[faltan] = _textos(NO_NUMERICOS + [None], rng.integers(0, len(NO_NUMERICOS) + 1, faltan.sum()))
+    return valores
+
+
+def _municipios() -> pd.DataFrame:
+    """Municipios reales (código y nombre DIVIPOLA) de los libros de proyecciones del DANE."""
+    tabla = tabla_proyecciones()
+    return tabla.loc[tabla['cod_dpto'].isin(list(DEPARTAMENTOS)), ['cod_dpto', 'cod_mpio', 'nom_mpio']] \
+                .reset_index(drop=True)
+
+
+# ===================================================================
+# Función: educacion
+# ===================================================================
+def educacion(n_filas: int, semilla: int = 0, p_nacional: float = 0.01, p_no_numerico: float = 0.02,
+              p_canonica: float = 0.7, columnas_extra: bool = False) -> pd.DataFrame:
+    """
+    Registros con el esquema de `nudc-7mev` (estadísticas en educación), todo como texto.
+
+    Args:
+        n_filas (int): Filas a generar.
+        semilla (int): Semilla del generador (mismo valor → mismos datos).
+        p_nacional (float): Fracción de filas del total nacional ("NACIONAL").
+        p_no_numerico (float): Fracción de celdas de métricas vacías o no numéricas.
+        p_canonica (float): Fracción de nombres escritos en su forma canónica.
+        columnas_extra (bool): Incluir también `COLUMNAS_SIN_USO_EDUCACION`.
+
+    Returns:
+        pd.DataFrame: Columnas de texto (`object`) como las entrega `fetch_dataset`.
+    """
+    rng = np.random.default_rng(semilla)
+    municipios = _municipios()
+    fila_mpio = rng.integers(0, len(municipios), n_filas)
+    cod_dpto = municipios['cod_dpto'].to_numpy()[fila_mpio]
+
+    # Departamento: variantes de cada nombre en un solo pool, indexadas por departamento
+    posicion = {c: i for i, c in enumerate(DEPARTAMENTOS)}
+    pool_deptos = [v for nombre in DEPARTAMENTOS.values() for v in _variantes(nombre)]
+    n_var = len(_variantes(""))
+    idx_depto = np.vectorize(posicion.get)(cod_dpto) * n_var + _elegir(rng, n_filas, n_var, p_canonica)
+
+    pool_mpios = [v for nombre in municipios['nom_mpio'] for v in _variantes(nombre)]
+    idx_mpio = fila_mpio * n_var + _elegir(rng, n_filas, n_var, p_canonica)
+
+    # Código del departamento con y sin cero a la izquierda ("05" / "5")
+    pool_codigos = [f for c in DEPARTAMENTOS for f in (str(c), f"{c:02d}")]
+    idx_codigo = np.vectorize(posicion.get)(cod_dpto) * 2 + rng.integers(0, 2, n_filas)
+
+    df = pd.DataFrame({
+        'a_o': _textos([str(a) for a in ANIOS], rng.integers(0, len(ANIOS), n_filas)),
+        'c_digo_departamento': _textos(pool_codigos, idx_codigo),
+        'departamento': _textos(pool_deptos, idx_depto),
+        'municipio': _textos(pool_mpios, idx_mpio),
+        **{col: _metrica(rng, n_filas, *rango, p_no_numerico) for col, rango in METRICAS.items()},
+    })
+
+    nacional = rng.random(n_filas) < p_nacional
+    df.loc[nacional, ['departamento', 'municipio']] = "NACIONAL"
+    df.loc[nacional, 'c_digo_departamento'] = "0"
+
+    if columnas_extra:
+        pool_extra = [f"{v:.2f}" for v in rng.uniform(0, 100, _VALORES_POR_METRICA)]
+        for col in COLUMNAS_SIN_USO_EDUCACION:
+            df[col] = _textos(pool_extra, rng.integers(0, _VALORES_POR_METRICA, n_filas))
+    return df
+
+
+# ===================================================================
+# Función: infraestructura
+# ===================================================================
+def infraestructura(n_filas: int, semilla: int = 0, p_no_numerico: float = 0.05,
+                    p_canonica: float = 0.5) -> pd.DataFrame:
+    """
+    Registros con las columnas de `3ncw-3qwq` que usa el tablero: una fila por sede,
+    con el nombre del departamento en mayúsculas, sin tildes o con espacios sobrantes.
+
+    Returns:
+        pd.DataFrame: [nombre_depto, nombre_municipio, aulas_mejoradas] como texto.
+    """
+    rng = np.random.default_rng(semilla + 1)
+    municipios = _municipios()
+    fila_mpio = rng.integers(0, len(municipios), n_filas)
+    posicion = {c: i for i, c in enumerate(DEPARTAMENTOS)}
+    n_var = len(_variantes(""))
+    pool_deptos = [v for nombre in DEPARTAMENTOS.values() for v in _variantes(nombre)]
+    idx_depto = (np.vectorize(posicion.get)(municipios['cod_dpto'].to_numpy()[fila_mpio]) * n_var
+                 + _elegir(rng, n_filas, n_var, p_canonica))
+    return pd.DataFrame({
+        'nombre_depto': _textos(pool_deptos, idx_depto),
+        'nombre_municipio': _textos(municipios['nom_mpio'].str.upper().tolist(), fila_mpio),
+        'aulas_mejoradas': _metrica(rng, n_filas, 0, 40, 0, p_no_numerico),
+    })
+
+
+# ===================================================================
+# Función: paginas_json
+# ===================================================================
+def paginas_json(df: pd.DataFrame, page_size: int = 50_000) -> Iterator[bytes]:
+    """
+    Cuerpos JSON página por página, como los devuelve Socrata: los campos nulos se omiten.
+
+    Se generan a medida que se piden para no tener todo el texto en memoria.
+    """
+    columnas = list(df.columns)
+    for inicio in range(0, len(df), page_size):
+        bloque = df.iloc[inicio:inicio + page_size]
+        registros = [{c: v for c, v in zip(columnas, fila) if v is not None}
+                     for fila in bloque.itertuples(index=False, name=None)]
+        yield json.dumps(registros, ensure_ascii=False).encode("utf-8")
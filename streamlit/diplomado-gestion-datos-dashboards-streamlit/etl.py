@@ -0,0 +1,239 @@
+"""
+ETL del tablero sin Streamlit, para correrlo desde cron.
+
+Usa las mismas funciones que las pestañas: descarga ambos datasets a la vez
+(pasando por los snapshots locales), limpia el crudo por años en un grupo de
+procesos, arma el modelo estrella y lo deja en la bodega SQLite (hechos,
+dimensiones y sumas por celda municipio × año) y en el dataset Parquet
+particionado por año. Una sesión que abre el tablero lee la bodega en vez de
+repetir el pipeline; si la precarga le entrega el mismo crudo, también.
+
+Uso:
+    python etl.py
+    python etl.py --procesos 4 --anios 2015 2023
+    python etl.py --sincronizar                 # solo años nuevos o corregidos
+    python etl.py --sintetico 1000000           # datos de datos_sinteticos, sin red
+
+Ejemplo de crontab (todos los días a las 3:00):
+    0 3 * * * cd /ruta/al/tablero && python etl.py --sincronizar >> Datos/etl.log 2>&1
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import almacen
+import datos_compartidos
+import datos_sinteticos
+import particiones
+from cargar_datos import EDUCACION_DATASET, consulta_educacion, descargar_educacion
+from cargar_infraestructura import descargar_infraestructura
+from instrumentacion import rss_mb
+from modelo_estrella import TIPOS_CRUDO, huella, limpiar_particion, modelo_desde_limpio, unir_particiones
+from registro_geografico import obtener_registro
+from sincronizacion import sincronizar_incremental
+from vista_hechos import VistaHechos
+
+# Con fork los procesos heredan el crudo sin copiarlo; en otras plataformas se les envía su año
+_FORK = "fork" in multiprocessing.get_all_start_methods()
+
+# Crudo visible para los procesos creados con fork (solo durante `transformar`)
+_crudo: Optional[pd.DataFrame] = None
+
+
+@contextmanager
+def _medir(reporte: list, nombre: str):
+    """Agrega al reporte el tiempo y la memoria residente al terminar la etapa."""
+    registro = {"etapa": nombre}
+    inicio = time.perf_counter()
+    yield registro
+    registro["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    registro["MB_rss"] = rss_mb()
+    reporte.append(registro)
+
+
+# ===================================================================
+# Función: extraer
+# ===================================================================
+def extraer(anios: Optional[tuple] = None, sincronizar: bool = False,
+            sintetico: Optional[int] = None) -> tuple:
+    """
+    Trae educación e infraestructura en paralelo (cada una pagina con sus propios hilos).
+
+    Args:
+        anios (tuple): (desde, hasta) para filtrar la educación en el portal.
+        sincronizar (bool): Traer solo los años nuevos o corregidos del snapshot.
+        sintetico (int): Generar este número de filas con `datos_sinteticos` en vez de descargar.
+
+    Returns:
+        tuple: (df_raw, df_infraestructura).
+    """
+    if sintetico:
+        return datos_sinteticos.educacion(sintetico), datos_sinteticos.infraestructura(max(1, sintetico // 10))
+
+    consulta = consulta_educacion(anios)
+
+    def educacion():
+        if not sincronizar:
+            return descargar_educacion(consulta)
+        df, resumen = sincronizar_incremental(EDUCACION_DATASET, params=consulta.params(), tipos=TIPOS_CRUDO)
+        df.attrs["origen"] = f"sincronización {resumen['modo']}"
+        return df
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="etl") as grupo:
+        df_raw = grupo.submit(educacion)
+        df_infraestructura = grupo.submit(descargar_infraestructura)
+        return df_raw.result(), df_infraestructura.result()
+
+
+def _particiones_por_anio(df_raw: pd.DataFrame) -> list:
+    """Posiciones de las filas de cada año del crudo (los años ilegibles van juntos)."""
+    columna = next(c for c in df_raw.columns if c.lower() == 'a_o')
+    codigos, _ = pd.factorize(df_raw[columna])
+    orden = np.argsort(codigos, kind='stable')
+    return np.split(orden, np.flatnonzero(np.diff(codigos[orden])) + 1)
+
+
+def _limpiar_anio(parte) -> tuple:
+    # `parte` son posiciones en el crudo heredado (fork) o el DataFrame del año
+    inicio = time.perf_counter()
+    df = _crudo.take(parte) if isinstance(parte, np.ndarray) else parte
+    return limpiar_particion(df), (time.perf_counter() - inicio) * 1000
+
+
+# ===================================================================
+# Función: transformar
+# ===================================================================
+def transformar(df_raw: pd.DataFrame, procesos: int = os.cpu_count() or 1) -> tuple:
+    """
+    Limpia el crudo año por año en `procesos` procesos y arma el modelo estrella.
+
+    El resultado es el mismo que `build_star_schema(df_raw)`: las partes se reúnen
+    en el orden original de las filas.
+
+    Returns:
+        tuple: ((df_fact, dim_geo, dim_tiempo), ms de limpieza sumados en todos los procesos).
+
+    Raises:
+        ValueError: Si faltan columnas relevantes en `df_raw`.
+    """
+    global _crudo
+    # El registro DIVIPOLA se arma antes del fork: los procesos lo heredan en vez de leerlo cada uno
+    obtener_registro()
+    grupos = _particiones_por_anio(df_raw)
+    procesos = max(1, min(procesos, len(grupos)))
+    if procesos == 1:
+        resultados = [_limpiar_anio(df_raw.take(g)) for g in grupos]
+    else:
+        contexto = multiprocessing.get_context("fork" if _FORK else None)
+        _crudo = df_raw if _FORK else None
+        try:
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as grupo:
+                # Los años más grandes primero: el último en terminar no queda solo
+                grupos = sorted(grupos, key=len, reverse=True)
+                tareas = grupos if _FORK else [df_raw.take(g) for g in grupos]
+                resultados = list(grupo.map(_limpiar_anio, tareas))
+        finally:
+            _crudo = None
+    partes, ms = zip(*resultados)
+    return modelo_desde_limpio(unir_particiones(list(partes))), sum(ms)
+
+
+# ===================================================================
+# Función: publicar
+# ===================================================================
+def publicar(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame, crudo: str,
+             ruta_dw: Path = almacen.DW_PATH, ruta_parquet: Path = particiones.PARQUET_DIR) -> dict:
+    """
+    Escribe a la vez la bodega SQLite y el dataset Parquet por año de esta versión del modelo.
+
+    Returns:
+        dict: {"version", "bodega", "parquet"} con lo que se escribió (False si ya estaba).
+    """
+    version = huella(df_fact)
+    vista = VistaHechos(df_fact, dim_geo, dim_tiempo)
+    Path(ruta_parquet).mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="etl") as grupo:
+        bodega = grupo.submit(almacen.guardar_modelo, df_fact, dim_geo, dim_tiempo, version, ruta_dw, crudo)
+        parquet = grupo.submit(particiones.escribir_particiones, vista.df, version, ruta_parquet)
+        return {"version": version, "bodega": bodega.result(), "parquet": parquet.result()}
+
+
+# ===================================================================
+# Función: ejecutar
+# ===================================================================
+def ejecutar(procesos: int = os.cpu_count() or 1, anios: Optional[tuple] = None, sincronizar: bool = False,
+             sintetico: Optional[int] = None, ruta_dw: Path = almacen.DW_PATH,
+             ruta_parquet: Path = particiones.PARQUET_DIR) -> pd.DataFrame:
+    """
+    Corre el ETL completo y devuelve el tiempo de cada etapa.
+
+    Returns:
+        pd.DataFrame: Columnas [etapa, ms, MB_rss, filas, detalle].
+
+    Raises:
+        ValueError: Si el portal no devolvió datos o les faltan columnas.
+        requests.exceptions.RequestException: Si la API falla y no hay snapshot.
+    """
+    reporte = []
+    inicio = time.perf_counter()
+
+    with _medir(reporte, "extracción (educación + infraestructura)") as r:
+        df_raw, df_infraestructura = extraer(anios, sincronizar, sintetico)
+        r["filas"] = len(df_raw)
+        r["detalle"] = (f"infraestructura: {len(df_infraestructura):,} filas · origen: "
+                        f"{'sintético' if sintetico else df_raw.attrs.get('origen')}")
+    if df_raw.empty:
+        raise ValueError("El portal no devolvió registros de educación.")
+
+    with _medir(reporte, "huella del crudo") as r:
+        crudo = huella(df_raw)
+        r["detalle"] = crudo
+
+    with _medir(reporte, "limpieza por año + modelo estrella") as r:
+        (df_fact, dim_geo, dim_tiempo), ms_procesos = transformar(df_raw, procesos)
+        r["filas"] = len(df_fact)
+        r["detalle"] = (f"{min(procesos, len(dim_tiempo))} procesos · {len(dim_tiempo)} años · "
+                        f"{ms_procesos:,.0f} ms de limpieza sumados")
+    # El crudo ya no se necesita: la memoria queda para escribir
+    del df_raw
+
+    with _medir(reporte, "bodega SQLite + Parquet por año") as r:
+        escrito = publicar(df_fact, dim_geo, dim_tiempo, crudo, ruta_dw, ruta_parquet)
+        r["filas"] = len(df_fact)
+        r["detalle"] = (f"versión {escrito['version']} · bodega {'escrita' if escrito['bodega'] else 'sin cambios'}"
+                        f" · parquet {'escrito' if escrito['parquet'] else 'sin cambios'}")
+
+    reporte.append({"etapa": "total", "ms": round((time.perf_counter() - inicio) * 1000, 1), "MB_rss": rss_mb()})
+    return pd.DataFrame(reporte, columns=["etapa", "ms", "MB_rss", "filas", "detalle"])
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para la limpieza por año (por defecto, uno por núcleo)")
+    parser.add_argument("--anios", type=int, nargs=2, metavar=("DESDE", "HASTA"),
+                        help="Solo estos años (filtrados en el portal)")
+    parser.add_argument("--sincronizar", action="store_true", help="Traer solo los años nuevos o corregidos")
+    parser.add_argument("--sintetico", type=int, metavar="FILAS", help="Usar datos sintéticos en vez del portal")
+    parser.add_argument("--dw", type=Path, default=almacen.DW_PATH, help="Bodega SQLite de destino")
+    parser.add_argument("--parquet", type=Path, default=particiones.PARQUET_DIR,
+                        help="Carpeta del dataset Parquet por año")
+    args = parser.parse_args(argv)
+
+    datos_compartidos.activar_copy_on_write()
+    reporte = ejecutar(args.procesos, tuple(args.anios) if args.anios else None, args.sincronizar,
+                       args.sintetico, args.dw, args.parquet)
+    with pd.option_context("display.max_colwidth", 120):
+        print(reporte.fillna("").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import gzip
+import io
+import threading
+import time
+import zipfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+from modelo_estrella import huella
+
+# Formatos de descarga: etiqueta → (extensión del archivo, tipo MIME)
+FORMATOS = {
+    "CSV (.zip)": ("csv.zip", "application/zip"),
+    "CSV comprimido (.csv.gz en .zip)": ("csv.gz.zip", "application/zip"),
+    "Parquet (.zip)": ("parquet.zip", "application/zip"),
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Filas por bloque al escribir CSV y Excel (acota la memoria temporal)
+FILAS_POR_BLOQUE = 100_000
+
+# Exportaciones ya generadas: solo las de la versión vigente de la tabla de hechos
+_exportaciones: dict = {}
+_candados: dict = {}
+_lock = threading.Lock()
+
+
+def _tablas(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> dict:
+    return {"hechos_educacion": df_fact, "dim_geo": dim_geo, "dim_tiempo": dim_tiempo}
+
+
+def _csv_por_bloques(df: pd.DataFrame, destino):
+    """Escribe `df` como CSV UTF-8 en `destino` (binario) sin armar el texto completo en memoria."""
+    texto = io.TextIOWrapper(destino, encoding="utf-8", newline="", write_through=True)
+    for inicio in range(0, max(len(df), 1), FILAS_POR_BLOQUE):
+        df.iloc[inicio:inicio + FILAS_POR_BLOQUE].to_csv(texto, index=False, header=inicio == 0)
+    texto.flush()
+    texto.detach()
+
+
+def _zip_csv(tablas: dict, comprimir: bool) -> bytes:
+    salida = io.BytesIO()
+    # El zip solo empaqueta: el CSV plano es la opción más rápida y el .csv.gz la más liviana
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED) as archivo:
+        for nombre, df in tablas.items():
+            with archivo.open(f"{nombre}.csv{'.gz' if comprimir else ''}", "w", force_zip64=True) as entrada:
+                if comprimir:
+                    with gzip.GzipFile(fileobj=entrada, mode="wb", compresslevel=6) as gz:
+                        _csv_por_bloques(df, gz)
+                else:
+                    _csv_por_bloques(df, entrada)
+    return salida.getvalue()
+
+
+def _zip_parquet(tablas: dict) -> bytes:
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED) as archivo:
+        for nombre, df in tablas.items():
+            with archivo.open(f"{nombre}.parquet", "w", force_zip64=True) as entrada:
+                df.to_parquet(entrada, index=False)
+    return salida.getvalue()
+
+
+def _xlsx(tablas: dict) -> bytes:
+    """
+    Libro con una hoja por tabla en modo `write_only` de openpyxl: las filas se
+    escriben en streaming a disco y no se arma el libro completo en memoria.
+    """
+    libro = Workbook(write_only=True)
+    for nombre, df in tablas.items():
+        hoja = libro.create_sheet(title=nombre[:31])
+        hoja.append(list(map(str, df.columns)))
+        for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+            bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE].astype(object)
+            for fila in bloque.itertuples(index=False, name=None):
+                hoja.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def exportar(formato: str, df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> bytes:
+    """
+    Genera el archivo de descarga con la tabla de hechos y las dos dimensiones.
+
+    Args:
+        formato (str): Una de las llaves de `FORMATOS`.
+
+    Returns:
+        bytes: Contenido del archivo.
+    """
+    tablas = _tablas(df_fact, dim_geo, dim_tiempo)
+    extension = FORMATOS[formato][0]
+    if extension == "csv.zip":
+        return _zip_csv(tablas, comprimir=False)
+    if extension == "csv.gz.zip":
+        return _zip_csv(tablas, comprimir=True)
+    if extension == "parquet.zip":
+        return _zip_parquet(tablas)
+    return _xlsx(tablas)
+
+
+# ===================================================================
+# Función: exportacion_lista
+# ===================================================================
+def exportacion_lista(formato: str, df_fact: pd.DataFrame):
+    """
+    Devuelve la exportación ya generada para esta versión de la tabla de hechos, o None.
+
+    Returns:
+        dict | None: {"datos", "archivo", "mime", "ms", "bytes"}.
+    """
+    with _lock:
+        return _exportaciones.get((huella(df_fact), formato))
+
+
+# ===================================================================
+# Función: obtener_exportacion
+# ===================================================================
+def obtener_exportacion(formato: str, df_fact: pd.DataFrame, dim_geo: pd.DataFrame,
+                        dim_tiempo: pd.DataFrame) -> dict:
+    """
+    Genera la exportación solo la primera vez que se pide para esta versión y formato.
+
+    Sesiones simultáneas que piden lo mismo esperan a la primera en lugar de repetir el trabajo.
+
+    Returns:
+        dict: {"datos", "archivo", "mime", "ms", "bytes"}.
+    """
+    version = huella(df_fact)
+    clave = (version, formato)
+    with _lock:
+        candado = _candados.setdefault(clave, threading.Lock())
+
+    with candado:
+        lista = exportacion_lista(formato, df_fact)
+        if lista is not None:
+            return lista
+
+        inicio = time.perf_counter()
+        datos = exportar(formato, df_fact, dim_geo, dim_tiempo)
+        extension, mime = FORMATOS[formato]
+        resultado = {
+            "datos": datos,
+            "archivo": f"tabla_hechos_educacion.{extension}",
+            "mime": mime,
+            "ms": (time.perf_counter() - inicio) * 1000,
+            "bytes": len(datos),
+        }
+        with _lock:
+            # Al cambiar los datos se descartan las exportaciones de la versión anterior
+            for anterior in [k for k in _exportaciones if k[0] != version]:
+                del _exportaciones[anterior]
+                _candados.pop(anterior, None)
+            _exportaciones[clave] = resultado
+        return resultado
@@ -0,0 +1,229 @@
+"""
+Figuras de plotly memorizadas por gráfico, parámetros y versión de los datos.
+
+Cada rerun volvía a construir todas las figuras con plotly express (el 3D animado
+tarda más de un segundo) aunque nada hubiera cambiado. Aquí se guarda la figura
+ya validada, con su tiempo de construcción y el tamaño del JSON que recibe el
+navegador, y se comparte entre sesiones: las que ven la misma versión de los
+datos con los mismos selectores reciben la misma figura.
+
+Con muchos puntos la figura pasa a modo ligero: trazas WebGL y datos resumidos
+en el servidor (estadísticos de caja, muestra de puntos, celdas sin texto).
+
+Uso:
+    info = mostrar("boxplot", huella(df_fact), (depto,), lambda ligero: figura_boxplot(df, depto, ligero),
+                   puntos=vista.contar(departamento=depto))
+"""
+import os
+import re
+import time
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from instrumentacion import etapa, graficar
+from memo_compartido import MemoCompartido
+
+# Por encima de estos puntos, los gráficos usan WebGL y datos resumidos en el servidor
+UMBRAL_PUNTOS = int(os.environ.get("DASHBOARD_GRAFICOS_UMBRAL", 5_000))
+
+# "auto" decide por el umbral; "completo" o "ligero" fuerzan un modo (para comparar)
+MODO = os.environ.get("DASHBOARD_GRAFICOS", "auto")
+
+# Figuras retenidas; al superarlas se suelta la usada hace más tiempo
+MAX_FIGURAS = int(os.environ.get("DASHBOARD_GRAFICOS_MAX", 64))
+
+_figuras = MemoCompartido(MAX_FIGURAS)
+
+
+def ligero(puntos: Optional[int]) -> bool:
+    """
+    True si una figura con `puntos` valores debe dibujarse en modo ligero.
+    Sin `puntos` el gráfico no tiene modo ligero.
+    """
+    if puntos is None:
+        return False
+    if MODO != "auto":
+        return MODO == "ligero"
+    return puntos > UMBRAL_PUNTOS
+
+
+class FiguraSerializada(go.Figure):
+    """
+    Figura vacía que entrega a `st.plotly_chart` el dict de una figura memorizada.
+
+    st.plotly_chart llama a `to_dict()` en cada rerun, que copia todas las trazas
+    y cuadros (más de 200 ms en el 3D animado); la figura memorizada ya no cambia,
+    así que se convierte una sola vez y cada rerun envuelve ese dict en una de estas.
+    """
+
+    def __init__(self, spec: dict):
+        super().__init__()
+        self._spec = spec
+
+    def to_dict(self) -> dict:
+        return self._spec
+
+
+# ===================================================================
+# Función: figura
+# ===================================================================
+def figura(grafico: str, version: Hashable, parametros: tuple,
+           construir: Callable[[bool], go.Figure], puntos: Optional[int] = None) -> dict:
+    """
+    Devuelve la figura de `grafico` para estos parámetros y versión de datos,
+    construyéndola solo si ninguna sesión la tiene ya.
+
+    Args:
+        grafico (str): Identificador del gráfico (ej. "boxplot").
+        version (Hashable): Versión de los datos, ej. `huella(df_fact)`.
+        parametros (tuple): Selectores que cambian la figura (departamento, año...).
+        construir (callable): Recibe `ligero` (bool) y devuelve la figura; se llama
+            una sola vez por clave aunque varias sesiones la pidan a la vez.
+        puntos (int): Valores que dibujaría la figura completa; decide el modo
+            (None si el gráfico no tiene modo ligero).
+
+    Returns:
+        dict: {"figura", "spec", "ms_construir", "bytes", "puntos", "ligero", "reutilizada"}.
+            La figura y su dict (`spec`) son compartidos: no deben modificarse.
+    """
+    modo = ligero(puntos)
+
+    def construir_info() -> dict:
+        inicio = time.perf_counter()
+        fig = construir(modo)
+        ms = (time.perf_counter() - inicio) * 1000
+        spec = fig.to_dict()
+        return {
+            "figura": fig,
+            "spec": spec,
+            "ms_construir": ms,
+            # Lo mismo que serializa st.plotly_chart, medido una sola vez
+            "bytes": len(pio.to_json(spec, validate=False).encode("utf-8")),
+            "puntos": puntos,
+            "ligero": modo,
+            "usos": 0,
+        }
+
+    with etapa(f"figura: {grafico}") as e:
+        info, reutilizada = _figuras.obtener((grafico, version, parametros, modo), construir_info)
+        info["usos"] += 1
+        e.cache(reutilizada).carga_util(info["bytes"])
+    return {**info, "reutilizada": reutilizada}
+
+
+# ===================================================================
+# Función: mostrar
+# ===================================================================
+def mostrar(grafico: str, version: Hashable, parametros: tuple, construir: Callable[[bool], go.Figure],
+            puntos: Optional[int] = None, **kwargs) -> dict:
+    """
+    `figura` + `st.plotly_chart`, con el costo de la figura debajo del gráfico.
+
+    Returns:
+        dict: Lo mismo que `figura`.
+    """
+    info = figura(grafico, version, parametros, construir, puntos)
+    graficar(FiguraSerializada(info["spec"]), grafico, n_bytes=info["bytes"], **kwargs)
+    detalle = f"⏱️ Figura construida en {info['ms_construir']:.0f} ms"
+    if info["reutilizada"]:
+        detalle += " (reutilizada)"
+    detalle += f" · 📦 {info['bytes'] / 1024:.0f} KB"
+    if info["ligero"]:
+        detalle += f" · modo ligero ({info['puntos']:,} puntos): WebGL y datos resumidos en el servidor"
+    st.caption(detalle)
+    return info
+
+
+def resumen() -> pd.DataFrame:
+    """
+    Figuras en memoria del proceso.
+
+    Returns:
+        pd.DataFrame: Columnas [grafico, parametros, ligero, puntos, ms_construir, KB, usos].
+    """
+    figuras = _figuras.entradas()
+    filas = [{
+        'grafico': grafico,
+        'parametros': ", ".join(map(str, parametros)),
+        'ligero': modo,
+        'puntos': info['puntos'],
+        'ms_construir': info['ms_construir'],
+        'KB': info['bytes'] / 1024,
+        'usos': info['usos'],
+    } for (grafico, _, parametros, modo), info in figuras]
+    return pd.DataFrame(filas, columns=['grafico', 'parametros', 'ligero', 'puntos', 'ms_construir', 'KB', 'usos'])
+
+
+def vaciar():
+    """Suelta todas las figuras memorizadas (ej. entre mediciones)."""
+    _figuras.vaciar()
+
+
+# ===================================================================
+# Reducciones en el servidor
+# ===================================================================
+def muestra(valores: np.ndarray, n: Optional[int] = None) -> np.ndarray:
+    """
+    A lo sumo `n` valores repartidos uniformemente sobre los datos ordenados:
+    la muestra conserva la forma de la distribución y es la misma en cada llamada.
+    """
+    n = UMBRAL_PUNTOS if n is None else n
+    ordenados = np.sort(valores)
+    if len(ordenados) <= n:
+        return ordenados
+    return ordenados[np.linspace(0, len(ordenados) - 1, n).round().astype(np.int64)]
+
+
+def caja_resumida(valores: np.ndarray, nombre: str, color: str, n_puntos: Optional[int] = None) -> list:
+    """
+    Caja con los cuartiles calculados en el servidor y una muestra de los puntos
+    en WebGL, en lugar de enviar todos los valores para que el navegador los procese.
+
+    Los bigotes siguen la regla de Tukey (1.5 × rango intercuartílico) como plotly,
+    y los valores atípicos siempre se incluyen en los puntos.
+
+    Returns:
+        list: [go.Box, go.Scattergl] para `go.Figure(data=...)`; la caja va en x=0.
+    """
+    valores = valores[~np.isnan(valores)]
+    q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+    rango = q3 - q1
+    dentro = valores[(valores >= q1 - 1.5 * rango) & (valores <= q3 + 1.5 * rango)]
+    atipicos = valores[(valores < q1 - 1.5 * rango) | (valores > q3 + 1.5 * rango)]
+    puntos = np.concatenate([muestra(dentro, n_puntos), muestra(atipicos, n_puntos)])
+    # Desplazados a la izquierda de la caja, con dispersión fija, como points='all'
+    dispersion = np.random.default_rng(0).uniform(-0.15, 0.15, len(puntos))
+    return [
+        go.Box(x=[0], q1=[q1], median=[mediana], q3=[q3], lowerfence=[dentro.min()],
+               upperfence=[dentro.max()], mean=[valores.mean()], name=nombre, marker_color=color,
+               width=0.4, boxpoints=False, showlegend=True),
+        go.Scattergl(x=-0.5 + dispersion, y=puntos, mode='markers', name=nombre, legendgroup=nombre,
+                     marker=dict(color=color, size=4, opacity=0.5), showlegend=False,
+                     hovertemplate="%{y}<extra>" + nombre + "</extra>"),
+    ]
+
+
+def aligerar_cuadros(fig: go.Figure, campo: str) -> go.Figure:
+    """
+    Deja en cada cuadro de una animación 3D solo lo que cambia entre cuadros
+    (coordenadas y tamaño); el estilo, la leyenda y el texto de ayuda viajan una
+    vez en las trazas base. `campo` es la etiqueta del eje de animación, que se
+    quita del texto de ayuda porque ya lo muestra el deslizador.
+
+    Si los cuadros no tienen las mismas trazas en el mismo orden, no se toca nada.
+    """
+    nombres = [t.name for t in fig.data]
+    if not fig.frames or any([t.name for t in c.data] != nombres for c in fig.frames):
+        return fig
+    fig.frames = [go.Frame(name=c.name, data=[go.Scatter3d(x=t.x, y=t.y, z=t.z, marker=dict(size=t.marker.size))
+                                              for t in c.data]) for c in fig.frames]
+    patron = re.compile(rf"{re.escape(campo)}=[^<]*<br>")
+    for traza in fig.data:
+        if traza.hovertemplate:
+            traza.hovertemplate = patron.sub("", traza.hovertemplate)
+    return fig
@@ -0,0 +1,133 @@
+import threading
+import time
+from pathlib import Path
+
+import folium
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+# Shapefile de departamentos del MGN (DANE)
+RUTA_SHAPES = Path("data/shapes/MGN_ANM_DPTOS.shp")
+
+# Columna con el código DIVIPOLA del departamento en el shapefile
+CODIGO_SHAPES = "DPTO_CCDGO"
+
+# Tolerancias de simplificación en grados (0.001° ≈ 110 m en el ecuador)
+TOLERANCIAS = {
+    'original': 0.0,
+    'alta': 0.001,
+    'media': 0.005,
+    'baja': 0.02,
+}
+
+# Nivel por defecto del mapa
+NIVEL_DEFECTO = 'media'
+
+# Rejilla a la que se redondean las coordenadas simplificadas (≈ 1 m)
+PRECISION = 1e-5
+
+_geometrias: dict = {}
+_lock = threading.Lock()
+
+
+def _simplificar(geometrias, tolerancia: float):
+    """
+    Simplifica preservando la topología entre departamentos vecinos.
+
+    Con una cobertura válida (polígonos sin traslapes) se usa `coverage_simplify`,
+    que simplifica cada frontera compartida una sola vez y no abre huecos entre
+    vecinos; si no, cada polígono se simplifica por separado sin autointersecciones.
+    """
+    if shapely.coverage_is_valid(geometrias):
+        simplificadas = shapely.coverage_simplify(geometrias, tolerancia)
+    else:
+        simplificadas = shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+    return shapely.set_precision(simplificadas, PRECISION)
+
+
+# ===================================================================
+# Clase: GeometriaDepartamentos
+# ===================================================================
+class GeometriaDepartamentos:
+    """
+    Geometría de los departamentos leída una sola vez, con GeoJSON precalculado por nivel.
+
+    Cada nivel guarda el texto GeoJSON listo para el mapa, su tamaño y número de
+    vértices. `reporte()` mide además cuánto tarda en renderizarse cada nivel.
+    """
+
+    def __init__(self, ruta: Path = RUTA_SHAPES):
+        gdf = gpd.read_file(ruta)
+        # Folium espera longitud/latitud WGS84
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(4326)
+        gdf[CODIGO_SHAPES] = gdf[CODIGO_SHAPES].astype(str)
+        self.codigos = gdf[CODIGO_SHAPES].tolist()
+        self.limites = gdf.total_bounds
+
+        self.niveles = {}
+        base = gdf[[CODIGO_SHAPES, 'geometry']]
+        for nivel, tolerancia in TOLERANCIAS.items():
+            inicio = time.perf_counter()
+            capa = base if tolerancia == 0 else base.set_geometry(_simplificar(base.geometry.values, tolerancia))
+            geojson = capa.to_json(drop_id=True)
+            self.niveles[nivel] = {
+                'tolerancia': tolerancia,
+                'geojson': geojson,
+                'bytes': len(geojson.encode('utf-8')),
+                'vertices': int(shapely.get_num_coordinates(capa.geometry.values).sum()),
+                'ms_preparar': (time.perf_counter() - inicio) * 1000,
+            }
+        self._reporte = None
+
+    def geojson(self, nivel: str = NIVEL_DEFECTO) -> str:
+        """Texto GeoJSON del nivel (una copia nueva se parsea en cada mapa, así no se comparte estado)."""
+        return self.niveles[nivel]['geojson']
+
+    def reporte(self) -> pd.DataFrame:
+        """
+        Tamaño y tiempo de render de un mapa coroplético por nivel (se mide una vez por proceso).
+
+        Returns:
+            pd.DataFrame: Columnas [nivel, tolerancia, vertices, KB_geojson, KB_html, ms_render].
+        """
+        if self._reporte is None:
+            valores = pd.DataFrame({CODIGO_SHAPES: self.codigos, 'valor': range(len(self.codigos))})
+            filas = []
+            for nivel, info in self.niveles.items():
+                inicio = time.perf_counter()
+                mapa = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+                folium.Choropleth(geo_data=info['geojson'], data=valores, columns=[CODIGO_SHAPES, 'valor'],
+                                  key_on=f"feature.properties.{CODIGO_SHAPES}").add_to(mapa)
+                html = mapa.get_root().render()
+                filas.append({
+                    'nivel': nivel,
+                    'tolerancia': info['tolerancia'],
+                    'vertices': info['vertices'],
+                    'KB_geojson': round(info['bytes'] / 1024, 1),
+                    'KB_html': round(len(html.encode('utf-8')) / 1024, 1),
+                    'ms_render': round((time.perf_counter() - inicio) * 1000, 1),
+                })
+            self._reporte = pd.DataFrame(filas)
+        return self._reporte
+
+
+# ===================================================================
+# Función: obtener_geometria
+# ===================================================================
+def obtener_geometria(ruta: Path = RUTA_SHAPES) -> GeometriaDepartamentos:
+    """
+    Devuelve la geometría de departamentos del proceso, leyéndola solo la primera vez
+    (o cuando el shapefile cambia en disco).
+
+    Raises:
+        Exception: Si el shapefile no se puede leer.
+    """
+    ruta = Path(ruta)
+    clave = (str(ruta), ruta.stat().st_mtime_ns)
+    with _lock:
+        if clave not in _geometrias:
+            _geometrias.clear()
+            _geometrias[clave] = GeometriaDepartamentos(ruta)
+        return _geometrias[clave]
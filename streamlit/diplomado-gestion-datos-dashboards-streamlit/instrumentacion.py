@@ -0,0 +1,259 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+# Con DASHBOARD_PERF=1 se miden las etapas y se muestra el panel de rendimiento
+ACTIVO = os.environ.get("DASHBOARD_PERF", "0") == "1"
+
+# Una línea JSON por etapa medida, para agregar entre sesiones
+LOG_PATH = Path(os.environ.get("DASHBOARD_PERF_LOG", "Datos/perf.jsonl"))
+
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Etapas de la ejecución en curso (cada sesión de Streamlit corre en su propio hilo)
+_local = threading.local()
+_log_lock = threading.Lock()
+# Aciertos y fallos de cache acumulados en el proceso: {nombre: [aciertos, fallos]}
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def rss_mb() -> Optional[float]:
+    """Memoria residente del proceso (Linux); None donde no hay /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _sesion() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+def _etapas() -> list:
+    if not hasattr(_local, "etapas"):
+        _local.etapas, _local.pila = [], []
+    return _local.etapas
+
+
+# ===================================================================
+# Clase: Etapa
+# ===================================================================
+class Etapa:
+    """
+    Medición de una etapa con nombre: tiempo, variación de memoria residente,
+    filas de entrada y salida, acierto de cache y bytes enviados al navegador.
+    """
+
+    def __init__(self, nombre: str, filas_entrada: Optional[int] = None, nivel: int = 0):
+        self.nombre = nombre
+        self.nivel = nivel
+        self.filas_entrada = filas_entrada
+        self.filas_salida: Optional[int] = None
+        self.acierto: Optional[bool] = None
+        self.bytes: Optional[int] = None
+        self.ms_hijas = 0.0
+        self._ts = time.time()
+        self._inicio = time.perf_counter()
+        self._rss = rss_mb()
+
+    def filas(self, salida: int) -> "Etapa":
+        self.filas_salida = int(salida)
+        return self
+
+    def cache(self, acierto: bool) -> "Etapa":
+        self.acierto = bool(acierto)
+        return self
+
+    def carga_util(self, n_bytes: int) -> "Etapa":
+        self.bytes = int(n_bytes)
+        return self
+
+    def _cerrar(self) -> dict:
+        ms = (time.perf_counter() - self._inicio) * 1000
+        rss = rss_mb()
+        return {
+            "ts": self._ts,
+            "sesion": _sesion(),
+            "etapa": self.nombre,
+            "nivel": self.nivel,
+            "ms": round(ms, 2),
+            # Tiempo de la etapa sin el de sus etapas internas
+            "ms_propio": round(ms - self.ms_hijas, 2),
+            "MB_delta": round(rss - self._rss, 2) if rss is not None and self._rss is not None else None,
+            "filas_entrada": self.filas_entrada,
+            "filas_salida": self.filas_salida,
+            "cache": self.acierto,
+            "bytes": self.bytes,
+        }
+
+
+class _EtapaNula:
+    """Lo que se recibe con la instrumentación apagada: no mide nada."""
+
+    def filas(self, salida):
+        return self
+
+    def cache(self, acierto):
+        return self
+
+    def carga_util(self, n_bytes):
+        return self
+
+
+_NULA = _EtapaNula()
+
+
+def _registrar(registro: dict):
+    _etapas().append(registro)
+    if registro["cache"] is not None:
+        with _cache_lock:
+            conteo = _cache.setdefault(registro["etapa"], [0, 0])
+            conteo[0 if registro["cache"] else 1] += 1
+    try:
+        with _log_lock:
+            LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # Sin permiso de escritura el panel sigue funcionando
+
+
+# ===================================================================
+# Función: etapa
+# ===================================================================
+@contextmanager
+def etapa(nombre: str, filas_entrada: Optional[int] = None):
+    """
+    Mide el bloque como una etapa con nombre. Las etapas pueden anidarse.
+
+    Uso:
+        with etapa("modelo estrella", filas_entrada=len(df_raw)) as e:
+            df_fact, *_ = build_star_schema(df_raw)
+            e.filas(len(df_fact)).cache(ultima_ejecucion()['modelo']['cache'])
+
+    Con la instrumentación apagada no mide nada y su costo es despreciable.
+    """
+    if not ACTIVO:
+        yield _NULA
+        return
+    _etapas()
+    actual = Etapa(nombre, filas_entrada, nivel=len(_local.pila))
+    _local.pila.append(actual)
+    try:
+        yield actual
+    finally:
+        _local.pila.pop()
+        registro = actual._cerrar()
+        if _local.pila:
+            _local.pila[-1].ms_hijas += registro["ms"]
+        _registrar(registro)
+
+
+def medir(nombre: str):
+    """Decorador: mide cada llamada a la función como la etapa `nombre`."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def graficar(fig, nombre: str, n_bytes: Optional[int] = None, **kwargs):
+    """
+    `st.plotly_chart` medido: registra el tiempo de envío y el tamaño del JSON de la figura.
+
+    El tamaño se calcula antes de abrir la etapa, así que la serialización extra
+    no se suma al tiempo medido (y solo ocurre con la instrumentación activa). Si
+    ya se conoce (figuras memorizadas), se pasa en `n_bytes` y no se serializa.
+    """
+    if not ACTIVO:
+        return st.plotly_chart(fig, **kwargs)
+    if n_bytes is None:
+        n_bytes = len(fig.to_json().encode("utf-8"))
+    with etapa(f"plotly: {nombre}") as e:
+        e.carga_util(n_bytes)
+        return st.plotly_chart(fig, **kwargs)
+
+
+def resumir_registro(ruta: Path = LOG_PATH) -> pd.DataFrame:
+    """
+    Agrega el registro JSONL de todas las sesiones por etapa.
+
+    Returns:
+        pd.DataFrame: Mediciones, sesiones, ms p50/p95, tasa de acierto y KB promedio por etapa,
+            de la más lenta (p95) a la más rápida.
+    """
+    if not Path(ruta).exists():
+        return pd.DataFrame()
+    df = pd.read_json(ruta, lines=True)
+    resumen = df.groupby("etapa").agg(
+        mediciones=("ms", "size"),
+        sesiones=("sesion", "nunique"),
+        ms_p50=("ms", "median"),
+        ms_p95=("ms", lambda ms: ms.quantile(0.95)),
+        tasa_cache=("cache", lambda c: c.dropna().astype(float).mean()),
+        KB_promedio=("bytes", lambda b: b.mean() / 1024),
+    )
+    return resumen.sort_values("ms_p95", ascending=False).reset_index()
+
+
+def nueva_ejecucion():
+    """Empieza una lista de etapas nueva para la ejecución del script que arranca."""
+    _local.etapas, _local.pila = [], []
+
+
+# ===================================================================
+# Función: mostrar_panel
+# ===================================================================
+def mostrar_panel():
+    """
+    Panel plegable con las etapas de esta ejecución y las tasas de acierto de cache
+    del proceso. Solo aparece con DASHBOARD_PERF=1.
+    """
+    if not ACTIVO:
+        return
+    with st.expander("🔬 Rendimiento de esta ejecución"):
+        etapas = pd.DataFrame(_etapas())
+        if etapas.empty:
+            st.caption("Sin etapas medidas en esta ejecución.")
+        else:
+            # Se registran al cerrar; se muestran en el orden en que empezaron
+            etapas = etapas.sort_values("ts", kind="stable")
+            etapas["etapa"] = ["· " * n + e for n, e in zip(etapas["nivel"], etapas["etapa"])]
+            etapas = etapas.astype({"filas_entrada": "Int64", "filas_salida": "Int64"})
+            etapas["KB"] = etapas["bytes"] / 1024
+            st.dataframe(etapas[["etapa", "ms", "ms_propio", "MB_delta", "filas_entrada", "filas_salida",
+                                 "cache", "KB"]].style.format(
+                {"ms": "{:.1f}", "ms_propio": "{:.1f}", "MB_delta": "{:+.1f}", "KB": "{:.1f}"}, na_rep="—"),
+                hide_index=True)
+            raiz = etapas[etapas["nivel"] == 0]
+            st.caption(f"Total medido: {raiz['ms'].sum():.0f} ms · enviado al navegador: "
+                       f"{etapas['bytes'].sum() / 1024:.0f} KB. Los fragmentos que se reejecutan "
+                       "solos no actualizan este panel.")
+
+        with _cache_lock:
+            cache = pd.DataFrame([{"cache": nombre, "aciertos": a, "fallos": f, "tasa": a / (a + f)}
+                                  for nombre, (a, f) in sorted(_cache.items())])
+        if not cache.empty:
+            st.markdown("**Aciertos de cache en el proceso**")
+            st.dataframe(cache.style.format({"tasa": "{:.0%}"}), hide_index=True)
+        st.caption(f"Registro acumulado: {LOG_PATH}")
+        if st.button("📊 Resumir el registro de todas las sesiones"):
+            st.dataframe(resumir_registro().round(1), hide_index=True)
@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import folium
+import streamlit.components.v1 as components
 from streamlit_folium import st_folium
 
+import instrumentacion
+from cubo_olap import obtener_cubo
+from geometria import CODIGO_SHAPES, NIVEL_DEFECTO, TOLERANCIAS, obtener_geometria
+from instrumentacion import etapa
+from mapa_animado import PALETAS, html_mapa_animado
+from modelo_estrella import huella
+from registro_geografico import obtener_registro
+from vista_hechos import obtener_vista
+
 def show_map_tab():
     st.header("🗺️ Mapa Interactivo por Departamento")
 
@@ -11,11 +20,8 @@ def show_map_tab():
         st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    dim_tiempo = st.session_state['dim_tiempo']
-
-    df = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
+    vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
+    cubo = obtener_cubo(vista)
 
     # === Selectores dinámicos ===
     metricas = {
@@ -24,61 +30,87 @@ def show_map_tab():
         'Tasa de Matriculación 5-16 (%)': 'tasa_matriculaci_n_5_16'
     }
 
+    # === Geometría: leída y simplificada una vez por proceso ===
+    try:
+        with etapa("mapa: geometría"):
+            geometria = obtener_geometria()
+    except Exception as e:
+        st.error(f"❌ Error al leer el archivo .shp: {e}")
+        return
+
+    modo = st.radio("Modo del mapa", ["Estático", "Animado"], horizontal=True,
+                    help="El modo animado envía la geometría una sola vez y cambia año, métrica "
+                         "y paleta directamente en el navegador.")
+    niveles = list(TOLERANCIAS)
+    nivel_sel = st.selectbox("Resolución de los bordes", niveles, index=niveles.index(NIVEL_DEFECTO))
+
+    if modo == "Animado":
+        with etapa("mapa animado: HTML"):
+            animado = html_mapa_animado(cubo, huella(st.session_state['df_fact']), geometria, nivel_sel,
+                                        metricas, next(iter(metricas.values())))
+        st.subheader("🧭 Serie completa por departamento")
+        with etapa("mapa animado: envío") as e:
+            e.carga_util(len(animado['html'].encode('utf-8')))
+            components.html(animado['html'], height=560)
+        st.caption(f"📦 {animado['KB_html']:.0f} KB enviados una vez (geometría {animado['KB_geometria']:.0f} KB "
+                   f"+ todos los años y métricas); un año de una métrica ocupa {animado['KB_por_anio']:.1f} KB "
+                   "y se aplica en el navegador sin rerun.")
+        return
+
     metrica_label = st.selectbox("Selecciona la métrica", list(metricas.keys()))
     metrica_col = metricas[metrica_label]
 
-    años = sorted(df['a_o'].unique())
+    años = vista.anios()
     año_sel = st.selectbox("Selecciona el año", años, index=len(años)-1)
 
     # Selector de color
-    paletas_color = [
-        "YlGnBu", "YlOrRd", "OrRd", "BuPu", "PuRd", 
-        "GnBu", "PuBuGn", "RdPu", "Greens", "Blues"
-    ]
-    color_sel = st.selectbox("Selecciona la escala de color", paletas_color, index=0)
+    color_sel = st.selectbox("Selecciona la escala de color", PALETAS, index=0)
 
     # === Agrupar por departamento y año seleccionado ===
-    df_filtrado = df[df['a_o'] == año_sel]
-    resumen = (
-        df_filtrado
-        .groupby('c_digo_departamento')[metrica_col]
-        .mean()
-        .reset_index()
-        .rename(columns={'c_digo_departamento': 'codigo_departamento'})
-    )
-    resumen['codigo_departamento'] = resumen['codigo_departamento'].astype(str)
-
-    # === Leer archivo SHP ===
-    try:
-        gdf = gpd.read_file("data/shapes/MGN_ANM_DPTOS.shp")  # ✅ Reemplaza \ por /
-    except Exception as e:
-        st.error(f"❌ Error al leer el archivo .shp: {e}")
-        return
-
-    codigo_col = "DPTO_CCDGO"
-    gdf[codigo_col] = gdf[codigo_col].astype(str)
+    # Promedio ponderado por población 5-16, leído del cubo precalculado
+    corte = cubo.corte_anio(año_sel)
+    resumen = pd.DataFrame({
+        # Código DIVIPOLA de dos dígitos, como en el shapefile ("5" y "05" son el mismo departamento)
+        'codigo_departamento': obtener_registro().codigo_dos_digitos(corte.index.map(cubo.codigo_departamento)),
+        metrica_col: corte[metrica_col].to_numpy(),
+    })
+
+    codigo_col = CODIGO_SHAPES
     resumen[codigo_col] = resumen["codigo_departamento"]
 
-    gdf_merged = gdf.merge(resumen, on=codigo_col, how="left")
-
     # === Crear el mapa ===
-    m = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
-
-    folium.Choropleth(
-        geo_data=gdf_merged,
-        name="choropleth",
-        data=gdf_merged,
-        columns=[codigo_col, metrica_col],
-        key_on=f"feature.properties.{codigo_col}",
-        fill_color=color_sel,  # 🎨 Aquí está el color seleccionado
-        fill_opacity=0.7,
-        line_opacity=0.2,
-        nan_fill_color="gray",
-        legend_name=f"{metrica_label} - {año_sel}",
-        highlight=True
-    ).add_to(m)
-
-    folium.LayerControl().add_to(m)
+    with etapa("mapa: folium"):
+        m = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+
+        folium.Choropleth(
+            geo_data=geometria.geojson(nivel_sel),
+            name="choropleth",
+            data=resumen,
+            columns=[codigo_col, metrica_col],
+            key_on=f"feature.properties.{codigo_col}",
+            fill_color=color_sel,  # 🎨 Aquí está el color seleccionado
+            fill_opacity=0.7,
+            line_opacity=0.2,
+            nan_fill_color="gray",
+            legend_name=f"{metrica_label} - {año_sel}",
+            highlight=True
+        ).add_to(m)
+
+        folium.LayerControl().add_to(m)
 
     st.subheader(f"🧭 {metrica_label} por Departamento - {año_sel}")
-    st_folium(m, width=750, height=550)
+    with etapa("mapa: st_folium") as e:
+        if instrumentacion.ACTIVO:
+            # HTML que st_folium manda al navegador (se genera de nuevo solo para medirlo)
+            e.carga_util(len(m.get_root().render().encode('utf-8')))
+        st_folium(m, width=750, height=550)
+
+    with st.expander("📐 Tamaño de la geometría por nivel"):
+        st.dataframe(pd.DataFrame([
+            {'nivel': nivel, 'tolerancia': info['tolerancia'], 'vertices': info['vertices'],
+             'KB_geojson': round(info['bytes'] / 1024, 1)}
+            for nivel, info in geometria.niveles.items()
+        ]), hide_index=True)
+        # Renderizar un mapa por nivel cuesta ~1 s: se mide solo a pedido y una vez por proceso
+        if st.button("⏱️ Medir tiempo de render por nivel"):
+            st.dataframe(geometria.reporte(), hide_index=True)
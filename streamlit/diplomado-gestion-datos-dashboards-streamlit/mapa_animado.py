@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+import branca.colormap as cm
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+from cubo_olap import CuboOLAP
+from geometria import CODIGO_SHAPES, GeometriaDepartamentos
+from registro_geografico import obtener_registro
+
+# Escalas de color disponibles (ColorBrewer, 9 clases)
+PALETAS = ["YlGnBu", "YlOrRd", "OrRd", "BuPu", "PuRd", "GnBu", "PuBuGn", "RdPu", "Greens", "Blues"]
+
+# Milisegundos entre años al reproducir la animación
+MS_POR_ANIO = 900
+
+# HTML por (versión de los datos, nivel de geometría, selección inicial): los reruns
+# reutilizan el mismo texto; al superar `_MAX_HTMLS` se suelta el usado hace más tiempo
+_MAX_HTMLS = 8
+_htmls: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def _hex(rgba) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*(round(c * 255) for c in rgba[:3]))
+
+
+def series_por_codigo(cubo: CuboOLAP, metricas: dict) -> dict:
+    """
+    Valores por métrica, año y código de departamento, listos para el navegador.
+
+    Args:
+        metricas (dict): Etiqueta → columna de métrica.
+
+    Returns:
+        dict: {columna: {"etiqueta", "min", "max", "anios": {año: {código: valor}}}}.
+    """
+    series = {}
+    registro = obtener_registro()
+    for etiqueta, metrica in metricas.items():
+        matriz = cubo.matriz(metrica)
+        codigos = registro.codigo_dos_digitos([cubo.codigo_departamento[d] for d in matriz.index])
+        anios = {}
+        for anio in matriz.columns:
+            columna = matriz[anio]
+            anios[str(int(anio))] = {c: round(float(v), 2) for c, v in zip(codigos, columna) if v == v}
+        valores = matriz.to_numpy()
+        series[metrica] = {
+            "etiqueta": etiqueta,
+            "min": float(valores[valores == valores].min()),
+            "max": float(valores[valores == valores].max()),
+            "anios": anios,
+        }
+    return series
+
+
+class _ControlAnimado(MacroElement):
+    """Controles en el navegador: año (slider + reproducir), métrica, paleta y leyenda."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var mapa = {{ this._parent.get_name() }};
+            var capa = {{ this.capa.get_name() }};
+            var datos = {{ this.datos }};
+            var estado = {metrica: datos.metrica, anio: datos.anios.length - 1, paleta: datos.paleta, timer: null};
+
+            function color(v) {
+                if (v === undefined || v === null) { return "gray"; }
+                var s = datos.series[estado.metrica], colores = datos.paletas[estado.paleta];
+                var t = s.max > s.min ? (v - s.min) / (s.max - s.min) : 0;
+                return colores[Math.min(colores.length - 1, Math.max(0, Math.floor(t * colores.length)))];
+            }
+            function valores() { return datos.series[estado.metrica].anios[datos.anios[estado.anio]] || {}; }
+
+            function pintar() {
+                var v = valores(), s = datos.series[estado.metrica];
+                capa.setStyle(function(f) {
+                    return {fillColor: color(v[f.properties[datos.codigo]]), fillOpacity: 0.7,
+                            color: "#444", weight: 0.5, opacity: 0.6};
+                });
+                panel.querySelector(".anio").textContent = datos.anios[estado.anio];
+                panel.querySelector("input").value = estado.anio;
+                var colores = datos.paletas[estado.paleta];
+                panel.querySelector(".leyenda").innerHTML = s.etiqueta + "<br>" +
+                    colores.map(function(c) { return '<span style="display:inline-block;width:18px;height:10px;background:' + c + '"></span>'; }).join("") +
+                    "<br>" + s.min.toFixed(1) + " – " + s.max.toFixed(1);
+            }
+
+            capa.eachLayer(function(l) {
+                l.bindTooltip(function() {
+                    var v = valores()[l.feature.properties[datos.codigo]];
+                    return l.feature.properties[datos.codigo] + ": " + (v === undefined ? "sin dato" : v.toFixed(1));
+                }, {sticky: true});
+            });
+
+            var control = L.control({position: "topright"});
+            var panel = L.DomUtil.create("div", "leaflet-bar");
+            panel.style.cssText = "background:white;padding:6px 8px;font:12px sans-serif;min-width:220px";
+            panel.innerHTML =
+                '<select class="metrica" style="width:100%"></select>' +
+                '<select class="paleta" style="width:100%;margin-top:4px"></select>' +
+                '<div style="margin-top:6px"><button class="play">▶</button> <b class="anio"></b></div>' +
+                '<input type="range" min="0" max="' + (datos.anios.length - 1) + '" step="1" style="width:100%">' +
+                '<div class="leyenda" style="margin-top:4px"></div>';
+            control.onAdd = function() { return panel; };
+            control.addTo(mapa);
+            L.DomEvent.disableClickPropagation(panel);
+            L.DomEvent.disableScrollPropagation(panel);
+
+            var selMetrica = panel.querySelector(".metrica"), selPaleta = panel.querySelector(".paleta");
+            Object.keys(datos.series).forEach(function(m) { selMetrica.add(new Option(datos.series[m].etiqueta, m, false, m === estado.metrica)); });
+            Object.keys(datos.paletas).forEach(function(p) { selPaleta.add(new Option(p, p, false, p === estado.paleta)); });
+            selMetrica.onchange = function() { estado.metrica = this.value; pintar(); };
+            selPaleta.onchange = function() { estado.paleta = this.value; pintar(); };
+            panel.querySelector("input").oninput = function() { estado.anio = +this.value; pintar(); };
+
+            var boton = panel.querySelector(".play");
+            boton.onclick = function() {
+                if (estado.timer) { clearInterval(estado.timer); estado.timer = null; boton.textContent = "▶"; return; }
+                boton.textContent = "⏸";
+                estado.timer = setInterval(function() {
+                    estado.anio = (estado.anio + 1) % datos.anios.length;
+                    pintar();
+                }, datos.ms_por_anio);
+            };
+            pintar();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, capa, datos: dict):
+        super().__init__()
+        self._name = "ControlAnimado"
+        self.capa = capa
+        self.datos = json.dumps(datos, ensure_ascii=False)
+
+
+# ===================================================================
+# Función: html_mapa_animado
+# ===================================================================
+def html_mapa_animado(cubo: CuboOLAP, version: Hashable, geometria: GeometriaDepartamentos, nivel: str,
+                      metricas: dict, metrica_inicial: str, paleta_inicial: str = PALETAS[0]) -> dict:
+    """
+    Construye (una vez por versión de los datos y nivel) un mapa cuya geometría viaja una sola vez.
+
+    Todos los valores código → valor de cada año y métrica van en el mismo HTML y el
+    navegador vuelve a colorear la capa con `setStyle`: cambiar año, métrica o paleta
+    no hace un rerun de Streamlit ni reenvía geometría. Mientras el HTML no cambie,
+    Streamlit tampoco lo vuelve a mandar en los reruns de la sesión.
+
+    Args:
+        version (Hashable): Versión de los datos del cubo, ej. `huella(df_fact)`.
+
+    Returns:
+        dict: {"html", "KB_html", "KB_geometria", "KB_por_anio", "ms_construir"}.
+    """
+    clave = (version, nivel, metrica_inicial, paleta_inicial)
+    with _lock:
+        if clave in _htmls:
+            _htmls.move_to_end(clave)
+            return _htmls[clave]
+
+    inicio = time.perf_counter()
+    series = series_por_codigo(cubo, metricas)
+    anios = sorted(next(iter(series.values()))["anios"], key=int)
+    datos = {
+        "codigo": CODIGO_SHAPES,
+        "anios": anios,
+        "series": series,
+        "metrica": metrica_inicial,
+        "paleta": paleta_inicial,
+        "paletas": {p: [_hex(c) for c in getattr(cm.linear, f"{p}_09").colors] for p in PALETAS},
+        "ms_por_anio": MS_POR_ANIO,
+    }
+
+    mapa = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+    capa = folium.GeoJson(geometria.geojson(nivel), name="departamentos").add_to(mapa)
+    _ControlAnimado(capa, datos).add_to(mapa)
+    html = mapa.get_root().render()
+
+    un_anio = series[metrica_inicial]["anios"][anios[-1]]
+    resultado = {
+        "html": html,
+        "KB_html": len(html.encode("utf-8")) / 1024,
+        "KB_geometria": geometria.niveles[nivel]["bytes"] / 1024,
+        "KB_por_anio": len(json.dumps(un_anio).encode("utf-8")) / 1024,
+        "ms_construir": (time.perf_counter() - inicio) * 1000,
+    }
+    with _lock:
+        _htmls[clave] = resultado
+        while len(_htmls) > _MAX_HTMLS:
+            _htmls.popitem(last=False)
+    return resultado
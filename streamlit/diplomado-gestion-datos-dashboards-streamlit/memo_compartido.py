@@ -0,0 +1,99 @@
+"""
+Memoria de resultados compartida por todas las sesiones del proceso.
+
+Figuras, pronósticos, datasets y modelos repetían el mismo bloque: un candado
+por clave para que, si varias sesiones piden lo mismo a la vez, solo una lo
+construya, y un OrderedDict que suelta la entrada usada hace más tiempo al
+superar el límite (los snapshots en disco, solo el candado). `MemoCompartido`
+es ese bloque, una sola vez.
+
+Uso:
+    _figuras = MemoCompartido(64)
+    info, reutilizada = _figuras.obtener(clave, lambda: construir(ligero))
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Marca de "no está" (None puede ser un resultado válido)
+_FALTA = object()
+
+
+# ===================================================================
+# Clase: MemoCompartido
+# ===================================================================
+class MemoCompartido:
+    """
+    Resultados por clave con una sola construcción a la vez por clave y un
+    límite de entradas (LRU). Los valores son compartidos: no deben modificarse.
+    """
+
+    def __init__(self, max_entradas: Optional[int] = None):
+        """
+        Args:
+            max_entradas (int): Entradas retenidas; None = sin límite.
+        """
+        self.max_entradas = max_entradas
+        self._entradas: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._candados: dict = {}
+
+    def candado(self, clave: Hashable) -> threading.Lock:
+        """Candado de la clave, para quien construya o reescriba su valor por fuera de `obtener`."""
+        with self._lock:
+            return self._candados.setdefault(clave, threading.Lock())
+
+    def buscar(self, clave: Hashable, defecto=None):
+        """Valor guardado para `clave` (y la marca como usada), o `defecto`."""
+        with self._lock:
+            valor = self._entradas.get(clave, _FALTA)
+            if valor is _FALTA:
+                return defecto
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave: Hashable, valor):
+        """Guarda `valor` y suelta las entradas usadas hace más tiempo si se supera el límite."""
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while self.max_entradas is not None and len(self._entradas) > self.max_entradas:
+                vieja, _ = self._entradas.popitem(last=False)
+                self._candados.pop(vieja, None)
+
+    def obtener(self, clave: Hashable, construir: Callable[[], Any],
+                vigente: Optional[Callable[[Any], bool]] = None) -> tuple:
+        """
+        Devuelve el valor de `clave`, construyéndolo solo si ninguna sesión lo tiene ya.
+
+        Args:
+            clave (Hashable): Identifica el resultado (ej. (gráfico, versión, parámetros)).
+            construir (callable): Sin argumentos; se llama una sola vez por clave
+                aunque varias sesiones la pidan a la vez.
+            vigente (callable): Recibe el valor guardado; si devuelve False se
+                vuelve a construir (ej. cambió una entrada que no está en la clave).
+
+        Returns:
+            tuple: (valor, reutilizado).
+        """
+        with self.candado(clave):
+            valor = self.buscar(clave, _FALTA)
+            if valor is not _FALTA and (vigente is None or vigente(valor)):
+                return valor, True
+            valor = construir()
+            self.guardar(clave, valor)
+        return valor, False
+
+    def entradas(self) -> list:
+        """Pares (clave, valor) retenidos, del usado hace más tiempo al más reciente."""
+        with self._lock:
+            return list(self._entradas.items())
+
+    def vaciar(self):
+        """Suelta todas las entradas (ej. entre mediciones)."""
+        with self._lock:
+            self._entradas.clear()
+            self._candados.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
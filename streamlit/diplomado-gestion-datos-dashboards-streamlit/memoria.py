@@ -0,0 +1,72 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+import datos_compartidos
+
+
+# ===================================================================
+# Función: bytes_objeto
+# ===================================================================
+def bytes_objeto(obj, _vistos: set = None) -> int:
+    """
+    Estima los bytes que ocupa un objeto, incluyendo los textos de columnas object.
+
+    Recorre DataFrames, Series, arreglos, contenedores y atributos de objetos
+    propios (vista, cubo). Cada objeto se cuenta una sola vez.
+
+    Returns:
+        int: Bytes aproximados.
+    """
+    vistos = set() if _vistos is None else _vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(bytes_objeto(k, vistos) + bytes_objeto(v, vistos)
+                                        for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(bytes_objeto(v, vistos) for v in obj)
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        return sys.getsizeof(obj) + bytes_objeto(vars(obj), vistos)
+    return sys.getsizeof(obj)
+
+
+# ===================================================================
+# Función: reporte_memoria
+# ===================================================================
+def reporte_memoria(estado, compartidos=()) -> pd.DataFrame:
+    """
+    Lista los DataFrames guardados en el estado de la sesión con su tamaño.
+
+    Args:
+        estado: `st.session_state` o cualquier mapeo clave → objeto.
+        compartidos: Otros objetos que la sesión comparte con las demás (ej. el
+            modelo estrella memorizado); las referencias de `datos_compartidos`
+            se reconocen solas.
+
+    Returns:
+        pd.DataFrame: Columnas [objeto, filas, columnas, MB, compartido], de mayor a menor.
+    """
+    ids_compartidos = {id(obj) for obj in compartidos}
+    filas = []
+    for clave in list(estado.keys()):
+        valor = estado[clave]
+        if isinstance(valor, pd.DataFrame):
+            filas.append({
+                'objeto': str(clave),
+                'filas': len(valor),
+                'columnas': valor.shape[1],
+                'MB': bytes_objeto(valor) / 1024 ** 2,
+                'compartido': id(valor) in ids_compartidos or datos_compartidos.es_compartido(valor),
+            })
+    reporte = pd.DataFrame(filas, columns=['objeto', 'filas', 'columnas', 'MB', 'compartido'])
+    return reporte.sort_values('MB', ascending=False, ignore_index=True)
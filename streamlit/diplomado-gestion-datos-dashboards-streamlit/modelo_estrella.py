@@ -0,0 +1,294 @@
+import hashlib
+import threading
+import time
+import weakref
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import datos_compartidos
+from memo_compartido import MemoCompartido
+from registro_geografico import SIN_CODIGO, normalizar, obtener_registro
+
+# Columnas del dataset MEN que usa el modelo estrella
+COLUMNAS_RELEVANTES = [
+    'a_o', 'departamento', 'municipio', 'c_digo_departamento',
+    'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
+    'cobertura_neta', 'cobertura_bruta'
+]
+
+# Versión de las reglas de limpieza: al cambiarlas, los modelos guardados a partir
+# de un crudo (ver `almacen.version_crudo`) dejan de servir
+VERSION_LIMPIEZA = 3
+
+COLUMNAS_TEXTO = ['departamento', 'municipio', 'c_digo_departamento']
+
+METRICAS = ['poblaci_n_5_16', 'tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta']
+
+# Tipos del crudo al descargarlo por CSV (ver `socrata.tipar`): año entero con nulos,
+# geografía categórica y métricas float64, como las dejaría `pd.to_numeric`
+TIPOS_CRUDO = {
+    'a_o': 'Int16',
+    **{col: 'category' for col in COLUMNAS_TEXTO},
+    **{col: 'float64' for col in METRICAS},
+}
+
+# Tipos de los datos limpios: año int16, código DIVIPOLA del municipio (int32) y métricas float32
+ESQUEMA = {
+    'a_o': 'int16',
+    'id_geo': 'int32',
+    **{col: 'float32' for col in METRICAS},
+}
+
+# Resultados recientes por huella de contenido (pocas versiones del dataset a la vez)
+_MAX_VERSIONES = 4
+_resultados = MemoCompartido(_MAX_VERSIONES * 2)
+_huellas: dict = {}
+_lock = threading.RLock()
+
+# Tiempos de la última llamada en este hilo (cada sesión de Streamlit corre en el suyo)
+_local = threading.local()
+
+
+def ultima_ejecucion() -> dict:
+    """
+    Tiempos de las últimas llamadas hechas desde el hilo actual, por etapa.
+
+    Returns:
+        dict: {etapa: {"cache": bool, "ms_huella": float, "ms_total": float}}.
+    """
+    if not hasattr(_local, "tiempos"):
+        _local.tiempos = {}
+    return _local.tiempos
+
+
+# ===================================================================
+# Función: huella
+# ===================================================================
+def huella(df: pd.DataFrame) -> str:
+    """
+    Calcula una huella del contenido del DataFrame (columnas + valores).
+
+    El resultado se recuerda por objeto, así que volver a pedir la huella
+    del mismo DataFrame de la sesión no vuelve a recorrer los datos. Las
+    referencias intactas a un dataset compartido usan la del original: los
+    datos se recorren una vez por versión en todo el proceso, no una por sesión.
+
+    Returns:
+        str: Huella hexadecimal estable entre reruns.
+    """
+    compartido = datos_compartidos.original(df)
+    if compartido is not None:
+        df = compartido
+    with _lock:
+        conocido = _huellas.get(id(df))
+        if conocido and conocido[0]() is df:
+            return conocido[1]
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("|".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    resultado = f"{len(df)}-{digest.hexdigest()}"
+
+    with _lock:
+        _huellas[id(df)] = (weakref.ref(df, lambda _, k=id(df): _huellas.pop(k, None)), resultado)
+    return resultado
+
+
+def version_reglas() -> str:
+    """Versión de la limpieza: `VERSION_LIMPIEZA` más la del registro DIVIPOLA con que se resuelven los códigos."""
+    return f"{VERSION_LIMPIEZA}-{obtener_registro().version}"
+
+
+def _memorizar(etapa: str, df_raw: pd.DataFrame, construir):
+    """Devuelve el resultado de `construir(df_raw)` guardado para esta huella, o lo calcula."""
+    inicio = time.perf_counter()
+    clave = (etapa, huella(df_raw), version_reglas())
+    ms_huella = (time.perf_counter() - inicio) * 1000
+
+    # Si varias sesiones piden la misma versión a la vez, solo una la construye
+    resultado, reutilizado = _resultados.obtener(clave, lambda: construir(df_raw))
+    ultima_ejecucion()[etapa] = {"cache": reutilizado, "ms_huella": ms_huella,
+                                 "ms_total": (time.perf_counter() - inicio) * 1000}
+    return resultado
+
+
+# ===================================================================
+# Función: limpiar_datos
+# ===================================================================
+def _sin_codigo(departamento: pd.Series, municipio: pd.Series, faltan: np.ndarray) -> dict:
+    """Filas por par (departamento, municipio) del crudo que no está en el registro DIVIPOLA."""
+    if not faltan.any():
+        return {}
+    pares = pd.DataFrame({'departamento': departamento[faltan].astype(object),
+                          'municipio': municipio[faltan].astype(object)})
+    # El total nacional no es un municipio: se descarta sin reportarlo
+    pares = pares[pares['departamento'].map(normalizar) != 'NACIONAL']
+    return pares.value_counts(dropna=False).to_dict()
+
+
+def _limpiar(df_raw: pd.DataFrame, conservar_indice: bool = False) -> pd.DataFrame:
+    # Renombrar columnas en minúscula
+    columnas = {c: c.lower() for c in df_raw.columns}
+    faltantes = [col for col in COLUMNAS_RELEVANTES if col not in columnas.values()]
+    if faltantes:
+        raise ValueError(f"Columnas faltantes: {faltantes}")
+    origen = {v: k for k, v in columnas.items()}
+    departamento = df_raw[origen['departamento']]
+    municipio = df_raw[origen['municipio']]
+
+    # Llaves enteras DIVIPOLA: el registro normaliza solo los valores distintos.
+    # El departamento sale de su código y, si el código no se reconoce, de su nombre
+    registro = obtener_registro()
+    cod_depto = registro.codigo_departamento(df_raw[origen['c_digo_departamento']])
+    por_nombre = cod_depto == SIN_CODIGO
+    if por_nombre.any():
+        cod_depto[por_nombre] = registro.codigo_departamento(departamento[por_nombre])
+    cod_mpio = registro.codigo_municipio(cod_depto, municipio)
+
+    df = pd.DataFrame({
+        'a_o': pd.to_numeric(df_raw[origen['a_o']], errors='coerce'),
+        'id_geo': cod_mpio,
+        **{col: pd.to_numeric(df_raw[origen[col]], errors='coerce') for col in METRICAS},
+    }, index=df_raw.index)
+
+    # Sin municipio DIVIPOLA (incluye el nivel nacional) o incompletos: fuera
+    resuelto = cod_mpio != SIN_CODIGO
+    df = aplicar_esquema(df[resuelto & df.notna().all(axis=1).to_numpy()], conservar_indice)
+    df.attrs['sin_codigo'] = _sin_codigo(departamento, municipio, ~resuelto)
+    return df
+
+
+def aplicar_esquema(df: pd.DataFrame, conservar_indice: bool = False) -> pd.DataFrame:
+    """
+    Convierte los datos limpios a los tipos de `ESQUEMA`.
+
+    Returns:
+        pd.DataFrame: Copia compacta con índice 0..n-1 (o el original con `conservar_indice`).
+    """
+    df = df[list(ESQUEMA)].astype(ESQUEMA)
+    if not conservar_indice:
+        df = df.reset_index(drop=True)
+    return df
+
+
+def limpiar_datos(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpia el dataset crudo del MEN: cada fila queda con el código DIVIPOLA de su
+    municipio (`id_geo`), sin registros nacionales ni sin código, y con los tipos
+    compactos de `ESQUEMA`. Los pares sin código quedan en `attrs['sin_codigo']`.
+    El resultado se memoriza por huella de contenido.
+
+    Raises:
+        ValueError: Si faltan columnas relevantes en `df_raw`.
+    """
+    return _memorizar("limpieza", df_raw, _limpiar)
+
+
+# ===================================================================
+# Función: limpiar_particion
+# ===================================================================
+def limpiar_particion(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpia una parte del crudo (ej. las filas de un año) sin memorizar, conservando
+    en el índice la posición de cada fila. Es la unidad de trabajo del ETL por
+    procesos (ver `etl.py`); las partes se reúnen con `unir_particiones`.
+
+    Raises:
+        ValueError: Si faltan columnas relevantes en `df_raw`.
+    """
+    return _limpiar(df_raw, conservar_indice=True)
+
+
+def unir_particiones(partes: list) -> pd.DataFrame:
+    """
+    Reúne las partes de `limpiar_particion` en el orden original de las filas.
+
+    Todas las columnas son numéricas, así que el resultado es igual al de limpiar
+    el crudo completo de una sola vez.
+
+    Returns:
+        pd.DataFrame: Datos limpios con los tipos de `ESQUEMA`.
+    """
+    orden = np.argsort(np.concatenate([p.index.to_numpy() for p in partes]), kind='stable')
+    df = aplicar_esquema(pd.DataFrame({col: np.concatenate([p[col].to_numpy() for p in partes])[orden]
+                                       for col in ESQUEMA}))
+    df.attrs['sin_codigo'] = dict(sum((Counter(p.attrs.get('sin_codigo', {})) for p in partes), Counter()))
+    return df
+
+
+# ===================================================================
+# Función: crear_dimension_geo
+# ===================================================================
+def crear_dimension_geo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Construye la dimensión geográfica a nivel municipio, con jerarquía hacia departamento.
+
+    Las llaves son los códigos DIVIPOLA enteros de los datos limpios (`id_geo`,
+    5 dígitos, y `id_departamento`, sus dos primeros) y los nombres, los oficiales
+    del registro geográfico: un municipio es una sola fila aunque el portal lo
+    escriba de varias formas.
+
+    Returns:
+        pd.DataFrame: Columnas [id_geo, id_departamento, c_digo_departamento, departamento, municipio].
+    """
+    registro = obtener_registro()
+    mpios = np.unique(df['id_geo'].to_numpy()).astype(np.int32)
+    deptos = mpios // 1000
+    dim_geo = pd.DataFrame({
+        'id_geo': mpios,
+        'id_departamento': deptos,
+        'c_digo_departamento': [f"{d:02d}" for d in deptos],
+        'departamento': registro.nombre_departamento(deptos),
+        'municipio': registro.nombre_municipio(mpios),
+    })
+    dim_geo.attrs['sin_codigo'] = df.attrs.get('sin_codigo', {})
+    return dim_geo
+
+
+# ===================================================================
+# Función: build_star_schema
+# ===================================================================
+def modelo_desde_limpio(df_clean: pd.DataFrame):
+    """
+    Construye dimensiones y tabla de hechos a partir de datos ya limpios (sin memoizar).
+
+    Returns:
+        tuple: (df_fact, dim_geo, dim_tiempo).
+    """
+    cod_tiempo, anios = pd.factorize(df_clean['a_o'], sort=True)
+    dim_tiempo = pd.DataFrame({
+        'id_tiempo': np.arange(1, len(anios) + 1, dtype=np.int32),
+        'a_o': anios,
+    })
+    dim_geo = crear_dimension_geo(df_clean)
+
+    # Las llaves de la tabla de hechos salen de los datos limpios: no hace falta merge
+    df_fact = pd.DataFrame({
+        'id_tiempo': cod_tiempo.astype(np.int32) + 1,
+        'id_geo': df_clean['id_geo'].to_numpy(),
+        **{col: df_clean[col].to_numpy() for col in METRICAS},
+    })
+    return df_fact, dim_geo, dim_tiempo
+
+
+def _construir(df_raw: pd.DataFrame):
+    # Sin pasar por la memoria de `limpiar_datos`: solo se conserva el modelo final
+    return modelo_desde_limpio(_limpiar(df_raw))
+
+
+def build_star_schema(df_raw: pd.DataFrame):
+    """
+    Construye el modelo estrella (tabla de hechos + dimensiones) a partir del dataset crudo.
+
+    Es una función pura, sin Streamlit: el resultado se memoriza por huella de
+    contenido, así que los reruns con los mismos datos no repiten el pipeline.
+
+    Returns:
+        tuple: (df_fact, dim_geo, dim_tiempo).
+
+    Raises:
+        ValueError: Si faltan columnas relevantes en `df_raw`.
+    """
+    return _memorizar("modelo", df_raw, _construir)
@@ -0,0 +1,174 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Carpeta del dataset Parquet de hechos, un subdirectorio por versión del modelo
+PARQUET_DIR = Path(os.environ.get("DASHBOARD_PARQUET_DIR", "Datos/hechos_parquet"))
+
+# Filas por grupo: grupos pequeños permiten saltar los que no tienen el departamento pedido
+FILAS_POR_GRUPO = 16_384
+
+# Columna de partición (un directorio a_o=AAAA por año)
+PARTICION = 'a_o'
+
+# Versiones que se conservan en disco y abiertas en memoria (varias sesiones con datos distintos)
+_MAX_VERSIONES = 4
+
+_datasets: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+_en_curso: set = set()
+
+
+def _ruta_version(version: str, ruta: Path) -> Path:
+    return Path(ruta) / version
+
+
+def disponible(version: str, ruta: Path = PARQUET_DIR) -> bool:
+    """Indica si el dataset particionado de esta versión ya está escrito completo."""
+    return _ruta_version(version, ruta).is_dir()
+
+
+# ===================================================================
+# Función: escribir_particiones
+# ===================================================================
+def escribir_particiones(df: pd.DataFrame, version: str, ruta: Path = PARQUET_DIR) -> bool:
+    """
+    Escribe los hechos limpios como dataset Parquet particionado por año.
+
+    Dentro de cada año las filas van ordenadas por departamento, así las
+    estadísticas de cada grupo de filas permiten filtrar departamentos sin leerlos.
+    Se escribe en un directorio temporal y se publica con un rename atómico;
+    se conservan las `_MAX_VERSIONES` versiones usadas más recientemente y las
+    demás se eliminan.
+
+    Args:
+        df (pd.DataFrame): Hechos con dimensiones (ej. `VistaHechos.df`), incluida `a_o`.
+        version (str): Huella del modelo; nombra el subdirectorio.
+
+    Returns:
+        bool: False si esa versión ya estaba escrita.
+    """
+    destino = _ruta_version(version, ruta)
+    if destino.is_dir():
+        return False
+
+    ordenado = df.sort_values([PARTICION, 'departamento'], kind='stable')
+    tabla = pa.Table.from_pandas(ordenado, preserve_index=False)
+    # Texto plano en el esquema: Parquet lo guarda con diccionario igual y los filtros usan sus estadísticas
+    tabla = tabla.cast(pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f for f in tabla.schema
+    ]))
+
+    temporal = Path(ruta) / f".{version}.{os.getpid()}.{threading.get_ident()}.tmp"
+    ds.write_dataset(
+        tabla, temporal, format='parquet',
+        partitioning=ds.partitioning(pa.schema([tabla.schema.field(PARTICION)]), flavor='hive'),
+        max_rows_per_group=FILAS_POR_GRUPO, min_rows_per_group=FILAS_POR_GRUPO // 2,
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    try:
+        os.replace(temporal, destino)
+    except OSError:
+        # Otra sesión publicó la misma versión primero
+        shutil.rmtree(temporal, ignore_errors=True)
+        return False
+
+    _podar(ruta)
+    return True
+
+
+def _podar(ruta: Path):
+    # Otras sesiones pueden estar leyendo versiones distintas: solo se borran las menos usadas
+    versiones = []
+    for d in Path(ruta).iterdir():
+        try:
+            if d.is_dir() and not d.name.startswith('.'):
+                versiones.append((d.stat().st_mtime, d))
+        except FileNotFoundError:
+            pass  # Otro hilo la acaba de podar
+    versiones.sort(reverse=True)
+    for _, anterior in versiones[_MAX_VERSIONES:]:
+        with _lock:
+            _datasets.pop(str(anterior), None)
+        shutil.rmtree(anterior, ignore_errors=True)
+
+
+def escribir_en_segundo_plano(df: pd.DataFrame, version: str, ruta: Path = PARQUET_DIR) -> bool:
+    """
+    Lanza `escribir_particiones` en un hilo aparte para no bloquear la sesión.
+
+    Returns:
+        bool: False si esa versión ya existe o se está escribiendo.
+    """
+    clave = (str(Path(ruta)), version)
+    with _lock:
+        if clave in _en_curso or disponible(version, ruta):
+            return False
+        _en_curso.add(clave)
+
+    def escribir():
+        try:
+            escribir_particiones(df, version, ruta)
+        finally:
+            with _lock:
+                _en_curso.discard(clave)
+
+    threading.Thread(target=escribir, name=f"parquet-{version}", daemon=True).start()
+    return True
+
+
+def _dataset(version: str, ruta: Path) -> ds.Dataset:
+    # Descubrir archivos y esquema una vez por versión, no en cada lectura
+    clave = str(_ruta_version(version, ruta))
+    with _lock:
+        if clave in _datasets:
+            _datasets.move_to_end(clave)
+            return _datasets[clave]
+    # Al abrirla, la versión cuenta como reciente para `_podar`
+    os.utime(clave)
+    dataset = ds.dataset(clave, format='parquet', partitioning='hive')
+    with _lock:
+        _datasets[clave] = dataset
+        while len(_datasets) > _MAX_VERSIONES:
+            _datasets.popitem(last=False)
+    return dataset
+
+
+# ===================================================================
+# Función: leer_hechos
+# ===================================================================
+def leer_hechos(version: str, departamento: Optional[str] = None, anio=None,
+                columnas: Optional[list] = None, ruta: Path = PARQUET_DIR) -> pd.DataFrame:
+    """
+    Lee del dataset particionado solo el año, departamento y columnas pedidos.
+
+    El filtro por año descarta particiones completas, el de departamento descarta
+    grupos de filas por sus estadísticas y la proyección evita leer columnas de más.
+
+    Args:
+        version (str): Huella del modelo escrita con `escribir_particiones`.
+        departamento (str): Departamento (None = todos).
+        anio: Año (None = todos).
+        columnas (list): Columnas a devolver (None = todas).
+
+    Returns:
+        pd.DataFrame: Filas filtradas, con textos como categóricas.
+    """
+    filtro = None
+    if anio is not None:
+        filtro = ds.field(PARTICION) == int(anio)
+    if departamento is not None:
+        por_depto = ds.field('departamento') == departamento
+        filtro = por_depto if filtro is None else filtro & por_depto
+    df = _dataset(version, ruta).to_table(columns=columnas, filter=filtro).to_pandas(strings_to_categorical=True)
+    # La partición se descubre como int32; se devuelve con el tipo del esquema limpio
+    if PARTICION in df.columns:
+        df[PARTICION] = df[PARTICION].astype('int16')
+    return df
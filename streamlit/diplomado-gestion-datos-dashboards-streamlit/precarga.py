@@ -0,0 +1,178 @@
+import threading
+import time
+from typing import Callable, MutableMapping, Optional
+
+import pandas as pd
+import streamlit as st
+
+from cache_snapshots import ORIGENES
+
+# Llave de la sesión donde viven las tareas de precarga
+CLAVE_SESION = 'precarga'
+
+# Cada cuánto se refresca la barra de progreso mientras hay cargas en curso
+INTERVALO_PROGRESO = 0.5
+
+NOMBRES = {'educacion': "Estadísticas en educación", 'infraestructura': "Infraestructura educativa",
+           'divipola': "Códigos DIVIPOLA"}
+
+
+# ===================================================================
+# Clase: Tarea
+# ===================================================================
+class Tarea:
+    """
+    Carga de un dataset en un hilo aparte, con el progreso a la vista de la sesión.
+
+    El hilo nunca toca `st.session_state` ni llama a Streamlit: solo escribe en la
+    tarea, y la sesión recoge el resultado en su propia ejecución (ver `entregar`).
+    """
+
+    def __init__(self, nombre: str, cargar: Callable[..., pd.DataFrame]):
+        """
+        Args:
+            nombre (str): Identificador de la tarea (ej. "educacion").
+            cargar (callable): Se llama como `cargar(progress=...)` y devuelve el DataFrame.
+        """
+        self.nombre = nombre
+        self._cargar = cargar
+        self.hechas = 0
+        self.total = 0
+        self.resultado: Optional[pd.DataFrame] = None
+        self.error: Optional[Exception] = None
+        self.ms: Optional[float] = None
+        self.entregada = False
+        # Lo que queda para mostrar después de entregar (el DataFrame ya no se retiene)
+        self.filas = 0
+        self.origen: Optional[str] = None
+        self._hilo = threading.Thread(target=self._ejecutar, name=f"precarga-{nombre}", daemon=True)
+
+    def iniciar(self) -> "Tarea":
+        self._inicio = time.perf_counter()
+        self._hilo.start()
+        return self
+
+    def _progreso(self, hechas: int, total: int):
+        self.hechas, self.total = hechas, total
+
+    def _ejecutar(self):
+        try:
+            self.resultado = self._cargar(progress=self._progreso)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Se asigna al final: `terminada` implica que resultado/error ya están listos
+            self.ms = (time.perf_counter() - self._inicio) * 1000
+
+    @property
+    def terminada(self) -> bool:
+        return self.ms is not None
+
+    @property
+    def fraccion(self) -> float:
+        return self.hechas / self.total if self.total else 0.0
+
+    def esperar(self, timeout: Optional[float] = None) -> "Tarea":
+        """Bloquea hasta que la tarea termine (útil fuera de Streamlit)."""
+        self._hilo.join(timeout)
+        return self
+
+
+# ===================================================================
+# Función: iniciar_precarga
+# ===================================================================
+def iniciar_precarga(estado: MutableMapping, tareas: dict) -> dict:
+    """
+    Lanza en paralelo las cargas de `tareas` la primera vez que se abre la sesión.
+
+    Args:
+        estado (MutableMapping): `st.session_state` (o un dict en pruebas).
+        tareas (dict): {nombre: cargar(progress=...)}, ej. educación e infraestructura.
+
+    Returns:
+        dict: {nombre: Tarea} de la sesión.
+    """
+    if CLAVE_SESION not in estado:
+        estado[CLAVE_SESION] = {nombre: Tarea(nombre, cargar).iniciar() for nombre, cargar in tareas.items()}
+    return estado[CLAVE_SESION]
+
+
+def pendientes(estado: MutableMapping) -> list:
+    """Tareas de la sesión que siguen descargando."""
+    return [t for t in estado.get(CLAVE_SESION, {}).values() if not t.terminada]
+
+
+# ===================================================================
+# Función: entregar
+# ===================================================================
+def entregar(estado: MutableMapping) -> list:
+    """
+    Pasa a la sesión los datasets que terminaron de cargar desde la última ejecución.
+
+    La educación llega como `df_raw` (el modelo estrella ya está memorizado) salvo que
+    el usuario haya cargado otros datos a mano; el modelo leído de la bodega sí se
+    reemplaza, porque la descarga es igual o más reciente. La infraestructura llega
+    como `df_infraestructura` si la sesión todavía no la tiene. La tarea suelta el
+    DataFrame al entregarlo, para no retenerlo toda la sesión.
+
+    Returns:
+        list: Nombres de las tareas entregadas en esta llamada.
+    """
+    entregadas = []
+    for tarea in estado.get(CLAVE_SESION, {}).values():
+        if not tarea.terminada or tarea.entregada:
+            continue
+        tarea.entregada = True
+        entregadas.append(tarea.nombre)
+        df, tarea.resultado = tarea.resultado, None
+        if df is None or df.empty:
+            continue
+        tarea.filas, tarea.origen = len(df), df.attrs.get("origen")
+        if tarea.nombre == 'educacion':
+            if 'df_raw' not in estado and estado.get('origen_modelo', 'bodega') == 'bodega':
+                estado['df_raw'] = df
+        elif tarea.nombre == 'infraestructura':
+            if 'df_infraestructura' not in estado:
+                estado['df_infraestructura'] = df
+    return entregadas
+
+
+# ===================================================================
+# Función: mostrar_progreso
+# ===================================================================
+@st.fragment(run_every=INTERVALO_PROGRESO)
+def mostrar_progreso():
+    """
+    Barras de progreso de la precarga. Se vuelve a ejecutar sola cada
+    `INTERVALO_PROGRESO` segundos y, cuando una carga termina, reejecuta la app
+    completa para que la pestaña abierta ya pueda usar los datos.
+    """
+    tareas = st.session_state.get(CLAVE_SESION, {})
+    if any(t.terminada and not t.entregada for t in tareas.values()):
+        st.rerun()
+    for tarea in tareas.values():
+        if tarea.terminada:
+            continue
+        texto = (f"⏳ {NOMBRES.get(tarea.nombre, tarea.nombre)}: página {tarea.hechas}/{tarea.total}"
+                 if tarea.total else f"⏳ {NOMBRES.get(tarea.nombre, tarea.nombre)}: consultando el portal...")
+        st.progress(tarea.fraccion, text=texto)
+
+
+def estado_tarea(nombre: str):
+    """
+    Muestra en la pestaña cómo terminó (o va) la precarga de un dataset.
+
+    Returns:
+        Tarea | None: La tarea de la sesión, si existe.
+    """
+    tarea = st.session_state.get(CLAVE_SESION, {}).get(nombre)
+    if tarea is None:
+        return None
+    if not tarea.terminada:
+        st.info("⏳ Cargando en segundo plano; esta pestaña se actualiza sola al terminar.")
+    elif tarea.error is not None:
+        st.error(f"Error en la precarga: {tarea.error}")
+    elif tarea.filas:
+        st.success(f"✅ Precargado en segundo plano: {tarea.filas:,} filas en {tarea.ms / 1000:.1f} s.")
+        st.caption(ORIGENES.get(tarea.origen, ""))
+    return tarea
@@ -0,0 +1,258 @@
+"""
+Pronóstico de cobertura y matrícula para todos los municipios y departamentos a la vez.
+
+Cada serie anual (media ponderada del cubo OLAP) se modela como una recta en el
+tiempo más el logaritmo de la población total proyectada de su departamento (libros
+del DANE, ver `proyecciones`) como covariable. Las ~1.100 series de municipios y
+las de departamentos no se ajustan una por una: las ecuaciones normales de todas
+las series y métricas se arman con `np.einsum` y se resuelven en una sola llamada
+por lotes a `np.linalg.solve`.
+
+Con una docena de años por serie, tiempo y población van casi juntos; por eso las
+pendientes de cada serie se encogen hacia las pendientes comunes de todas las
+series de la métrica, con el peso de `PSEUDO_OBSERVACIONES` años.
+
+El resultado se memoriza por versión de los datos (y de los libros de proyecciones).
+
+Uso:
+    pronostico = obtener_pronosticos(cubo, huella(df_fact))
+    pronostico.departamento("Antioquia")   # años futuros × métricas
+"""
+import os
+import time
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+import proyecciones
+from cubo_olap import CuboOLAP
+from instrumentacion import etapa
+from memo_compartido import MemoCompartido
+
+# Métricas pronosticadas (tasas en %, no se suman entre series)
+METRICAS_PRONOSTICO = ['cobertura_neta', 'cobertura_bruta', 'tasa_matriculaci_n_5_16']
+
+# Años pronosticados después del último año con datos
+HORIZONTE = int(os.environ.get("DASHBOARD_PRONOSTICO_ANIOS", 5))
+
+# Peso de las pendientes comunes, en años observados equivalentes
+PSEUDO_OBSERVACIONES = 3.0
+
+# Series con menos años observados no se pronostican
+MIN_ANIOS = 3
+
+# Pronósticos recientes por versión de los datos
+_MAX_VERSIONES = 4
+_pronosticos = MemoCompartido(_MAX_VERSIONES)
+
+
+def previa(Y: np.ndarray, X: np.ndarray, pseudo: float = PSEUDO_OBSERVACIONES) -> tuple:
+    """
+    Pendientes comunes de cada métrica y la penalización que encoge hacia ellas.
+
+    Las pendientes comunes salen de una regresión con todas las series centradas
+    en su media (efectos fijos); la penalización equivale a `pseudo` años con la
+    varianza media de cada covariable. El intercepto no se penaliza.
+
+    Returns:
+        tuple: (penalización (métricas, k, k), coeficientes previos (métricas, k)).
+    """
+    W = np.isfinite(Y).astype(np.float64)
+    Y0 = np.where(W > 0, Y, 0.0)
+    n = W.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_media = np.einsum('mst,stk->msk', W, X) / n[..., None]
+        y_media = (W * Y0).sum(axis=-1) / n
+    x_centrada = np.nan_to_num(X[None, :, :, 1:] - x_media[:, :, None, 1:])
+    y_centrada = np.nan_to_num(Y0 - y_media[..., None])
+
+    # Pendientes comunes: una regresión con todas las series centradas, por métrica
+    G = np.einsum('mst,mstj,mstk->mjk', W, x_centrada, x_centrada)
+    h = np.einsum('mst,mstj,mst->mj', W, x_centrada, y_centrada)
+    k = X.shape[-1]
+    comunes = np.linalg.solve(G + 1e-9 * np.eye(k - 1), h[..., None])[..., 0]
+
+    # Penalización en unidades de "años": la varianza media de cada covariable
+    penalizacion = np.zeros((len(Y), k, k))
+    idx = np.arange(1, k)
+    penalizacion[:, idx, idx] = pseudo * np.diagonal(G, axis1=1, axis2=2) / W.sum(axis=(1, 2))[:, None]
+    return penalizacion, np.concatenate([np.zeros((len(Y), 1)), comunes], axis=1)
+
+
+# ===================================================================
+# Función: ajustar
+# ===================================================================
+def ajustar(Y: np.ndarray, X: np.ndarray, pseudo: float = PSEUDO_OBSERVACIONES) -> np.ndarray:
+    """
+    Ajusta una regresión lineal por serie para todas las series y métricas a la vez:
+    las ecuaciones normales (con la penalización de `previa`) se arman con `einsum`
+    y se resuelven en una sola llamada por lotes.
+
+    Args:
+        Y (np.ndarray): (métricas, series, años), NaN donde no hay dato.
+        X (np.ndarray): (series, años, coeficientes), covariables de cada serie y año;
+            la primera columna es el intercepto.
+        pseudo (float): Años equivalentes de las pendientes comunes.
+
+    Returns:
+        np.ndarray: Coeficientes (métricas, series, coeficientes); NaN en las series
+            con menos de `MIN_ANIOS` años observados.
+    """
+    penalizacion, coef_previos = previa(Y, X, pseudo)
+    W = np.isfinite(Y).astype(np.float64)
+    Y0 = np.where(W > 0, Y, 0.0)
+    k = X.shape[-1]
+    A = np.einsum('mst,stj,stk->msjk', W, X, X) + penalizacion[:, None]
+    b = np.einsum('mst,stj,mst->msj', W, X, Y0) + np.einsum('mjk,mk->mj', penalizacion, coef_previos)[:, None]
+    # Las series sin datos quedan con A = penalización (singular); se resuelven con la identidad
+    vacias = W.sum(axis=-1) < MIN_ANIOS
+    A[vacias] = np.eye(k)
+    beta = np.linalg.solve(A, b[..., None])[..., 0]
+    beta[vacias] = np.nan
+    return beta
+
+
+def predecir(beta: np.ndarray, X: np.ndarray) -> np.ndarray:
+    """
+    Valores del modelo en las covariables `X` (series, años, coeficientes).
+
+    Returns:
+        np.ndarray: (métricas, series, años), sin valores negativos.
+    """
+    return np.clip(np.einsum('msk,stk->mst', beta, X), 0, None)
+
+
+# ===================================================================
+# Función: armar_series
+# ===================================================================
+def armar_series(cubo: CuboOLAP, poblacion: Optional[pd.DataFrame] = None, horizonte: int = HORIZONTE) -> dict:
+    """
+    Lleva las series del cubo (departamentos y municipios) a las matrices de `ajustar`.
+
+    Las covariables son la tendencia (décadas desde el último año con datos) y, con
+    `poblacion`, el log de la población total proyectada del departamento de la
+    serie relativa al último año. Los municipios usan la de su departamento.
+
+    Returns:
+        dict: {"Y": (métricas, series, años observados), "X": (series, años observados, k),
+            "X_futuro": (series, años futuros, k), "historia", "futuro", "departamentos", "municipios"}.
+    """
+    departamentos = cubo.tabla('departamento_anio')
+    municipios = cubo.tabla('municipio_anio')
+    historia = np.sort(departamentos.index.get_level_values('a_o').unique().to_numpy())
+    ultimo = int(historia[-1])
+    futuro = np.arange(ultimo + 1, ultimo + 1 + horizonte)
+    if poblacion is not None:
+        matriz = poblacion.pivot_table(index='c_digo_departamento', columns='a_o', values='poblacion_total')
+        # Sin proyección para esos años no hay pronóstico
+        futuro = futuro[np.isin(futuro, matriz.columns)]
+    anios = np.concatenate([historia, futuro])
+
+    series_depto = departamentos[METRICAS_PRONOSTICO].unstack('a_o')
+    series_mpio = municipios[METRICAS_PRONOSTICO].unstack('a_o')
+    Y = np.stack([np.vstack([series_depto[m].reindex(columns=historia).to_numpy(dtype=np.float64),
+                             series_mpio[m].reindex(columns=historia).to_numpy(dtype=np.float64)])
+                  for m in METRICAS_PRONOSTICO])
+
+    tiempo = np.broadcast_to((anios - ultimo) / 10.0, (Y.shape[1], len(anios)))
+    columnas = [np.ones_like(tiempo), tiempo]
+    if poblacion is not None:
+        depto_de_mpio = municipios.groupby(level='id_geo')['departamento'].first().reindex(series_mpio.index)
+        codigo = {d: pd.to_numeric(c, errors='coerce') for d, c in cubo.codigo_departamento.items()}
+        codigos = [codigo.get(d) for d in np.concatenate([series_depto.index.to_numpy(), depto_de_mpio.to_numpy()])]
+        pob = matriz.reindex(index=codigos, columns=anios).to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_pob = np.log(pob / pob[:, [len(historia) - 1]])
+        # Departamentos sin proyección: solo tendencia
+        columnas.append(np.nan_to_num(log_pob, nan=0.0, posinf=0.0, neginf=0.0))
+    X = np.stack(columnas, axis=-1)
+    return {
+        "Y": Y,
+        "X": X[:, :len(historia)],
+        "X_futuro": X[:, len(historia):],
+        "historia": historia,
+        "futuro": futuro,
+        "departamentos": series_depto.index,
+        "municipios": series_mpio.index,
+    }
+
+
+# ===================================================================
+# Clase: Pronosticos
+# ===================================================================
+class Pronosticos:
+    """
+    Pronósticos de `METRICAS_PRONOSTICO` por departamento y por municipio, para
+    los `HORIZONTE` años siguientes al último con datos.
+    """
+
+    def __init__(self, cubo: CuboOLAP, poblacion: Optional[pd.DataFrame] = None, horizonte: int = HORIZONTE):
+        inicio = time.perf_counter()
+        series = armar_series(cubo, poblacion, horizonte)
+        self.ms_preparar = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        self.beta = ajustar(series["Y"], series["X"])
+        self.ms_ajuste = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        valores = predecir(self.beta, series["X_futuro"])
+        self.ms_prediccion = (time.perf_counter() - inicio) * 1000
+
+        self.covariable = poblacion is not None
+        self.ultimo_anio = int(series["historia"][-1])
+        self.anios = series["futuro"].tolist()
+        self.n_series = self.beta.shape[1]
+        self.n_ajustadas = int(np.isfinite(self.beta[..., 0]).all(axis=0).sum())
+
+        n_depto = len(series["departamentos"])
+        indice = pd.MultiIndex.from_product([series["departamentos"], series["futuro"]], names=['departamento', 'a_o'])
+        self.por_departamento = pd.DataFrame(
+            {m: valores[i, :n_depto].ravel() for i, m in enumerate(METRICAS_PRONOSTICO)}, index=indice)
+        indice = pd.MultiIndex.from_product([series["municipios"], series["futuro"]], names=['id_geo', 'a_o'])
+        self.por_municipio = pd.DataFrame(
+            {m: valores[i, n_depto:].ravel() for i, m in enumerate(METRICAS_PRONOSTICO)}, index=indice)
+        self._series = {d: g.droplevel('departamento')
+                        for d, g in self.por_departamento.groupby(level='departamento', observed=True)}
+
+    def departamento(self, departamento: str) -> pd.DataFrame:
+        """Pronóstico de un departamento (índice = año; vacío si no tiene)."""
+        return self._series.get(departamento, self.por_departamento.iloc[:0].droplevel('departamento'))
+
+    def municipio(self, id_geo: int) -> pd.DataFrame:
+        """Pronóstico de un municipio por su `id_geo` (índice = año)."""
+        return self.por_municipio.xs(id_geo, level='id_geo')
+
+
+def _poblacion() -> Optional[pd.DataFrame]:
+    try:
+        return proyecciones.poblacion_departamental()
+    except (OSError, KeyError, ValueError):
+        return None  # Sin los libros del DANE el pronóstico es solo de tendencia
+
+
+# ===================================================================
+# Función: obtener_pronosticos
+# ===================================================================
+def obtener_pronosticos(cubo: CuboOLAP, version: Hashable, horizonte: int = HORIZONTE) -> Pronosticos:
+    """
+    Devuelve los pronósticos de esta versión de los datos, ajustándolos solo la
+    primera vez (una sola sesión los calcula aunque varias los pidan a la vez).
+
+    Args:
+        cubo (CuboOLAP): Cubo de la versión, ver `obtener_cubo`.
+        version (Hashable): Versión de los datos, ej. `huella(df_fact)`.
+
+    Returns:
+        Pronosticos: Compartido por todas las sesiones; no debe modificarse.
+    """
+    poblacion = _poblacion()
+    clave = (version, horizonte)
+    with etapa("pronósticos") as e:
+        # Los libros de proyecciones son el mismo objeto mientras no cambien
+        (_, pronostico), reutilizado = _pronosticos.obtener(
+            clave, lambda: (poblacion, Pronosticos(cubo, poblacion, horizonte)),
+            vigente=lambda conocido: conocido[0] is poblacion)
+        e.cache(reutilizado)
+        if not reutilizado:
+            e.filas(len(pronostico.por_municipio) + len(pronostico.por_departamento))
+    return pronostico
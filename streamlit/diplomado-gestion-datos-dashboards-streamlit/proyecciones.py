@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from cache_snapshots import CACHE_DIR
+
+# Libros de proyecciones de población municipal del DANE que vienen con el repositorio
+ARCHIVOS = [Path("Datos/Info_2005_2019.xlsx"), Path("Datos/Info_2020_2035.xlsx")]
+
+# Subcarpeta propia: el desalojo de snapshots solo recorre el primer nivel de CACHE_DIR
+CACHE_PROYECCIONES = CACHE_DIR / "proyecciones"
+
+# Encabezado del libro → columna limpia (los dos libros traen MPIO y DPMP en distinto orden)
+COLUMNAS = {
+    'DP': 'c_digo_departamento',
+    'DPNOM': 'departamento',
+    'MPIO': 'c_digo_municipio',
+    'DPMP': 'municipio',
+    'AÑO': 'a_o',
+    'ÁREA GEOGRÁFICA': 'area',
+    'Población': 'poblacion',
+}
+
+# Versión del formato de la copia Parquet (cambiarla invalida las copias anteriores)
+VERSION_CACHE = 2
+
+# Áreas geográficas del libro → columna de la tabla por departamento
+AREAS = {
+    'Total': 'poblacion_total',
+    'Cabecera Municipal': 'poblacion_cabecera',
+    'Centros Poblados y Rural Disperso': 'poblacion_rural',
+}
+
+_tablas: dict = {}
+_departamental: dict = {}
+_por_hechos: dict = {}
+_ultima_carga: list = []
+_lock = threading.Lock()
+
+
+def _hash_archivo(ruta: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1024 ** 2), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _parsear(ruta: Path) -> pd.DataFrame:
+    """Lee la primera hoja con el lector `read_only` de openpyxl (sin estilos ni fórmulas)."""
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas)
+        valores = dict(zip(encabezado, zip(*filas)))
+    finally:
+        libro.close()
+
+    df = pd.DataFrame({limpia: valores[original] for original, limpia in COLUMNAS.items()})
+    return pd.DataFrame({
+        'c_digo_departamento': pd.to_numeric(df['c_digo_departamento']).astype('int16'),
+        'departamento': df['departamento'].astype('category'),
+        'c_digo_municipio': pd.to_numeric(df['c_digo_municipio']).astype('int32'),
+        'municipio': df['municipio'].astype('category'),
+        'a_o': df['a_o'].astype('int16'),
+        'area': df['area'].astype('category'),
+        'poblacion': pd.to_numeric(df['poblacion']).astype('int32'),
+    })
+
+
+def _rutas_cache(ruta: Path):
+    return CACHE_PROYECCIONES / f"{ruta.stem}.parquet", CACHE_PROYECCIONES / f"{ruta.stem}.json"
+
+
+def _guardar_cache(ruta: Path, df: pd.DataFrame, meta: dict):
+    CACHE_PROYECCIONES.mkdir(parents=True, exist_ok=True)
+    ruta_datos, ruta_meta = _rutas_cache(ruta)
+    sufijo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    # Escritura atómica, igual que los snapshots
+    temporal = ruta_datos.with_suffix(sufijo)
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, ruta_datos)
+    temporal = ruta_meta.with_suffix(sufijo)
+    temporal.write_text(json.dumps(meta), encoding='utf-8')
+    os.replace(temporal, ruta_meta)
+
+
+# ===================================================================
+# Función: cargar_libro
+# ===================================================================
+def cargar_libro(ruta: Path) -> tuple:
+    """
+    Devuelve el contenido de un libro de proyecciones en formato largo y tipado.
+
+    El libro se parsea solo la primera vez; después se lee su copia Parquet.
+    La copia vale mientras el archivo conserve fecha de modificación y tamaño;
+    si cambian, se compara el hash del contenido antes de volver a parsear
+    (un `touch` o una copia idéntica no invalidan la caché).
+
+    Returns:
+        tuple: (DataFrame [c_digo_departamento, departamento, c_digo_municipio, municipio,
+        a_o, area, poblacion], origen: "memoria" | "parquet" | "excel").
+    """
+    ruta = Path(ruta)
+    estado = ruta.stat()
+    firma = (str(ruta), estado.st_mtime_ns, estado.st_size)
+    with _lock:
+        if firma in _tablas:
+            return _tablas[firma], "memoria"
+
+    ruta_datos, ruta_meta = _rutas_cache(ruta)
+    meta = json.loads(ruta_meta.read_text(encoding='utf-8')) if ruta_meta.exists() else {}
+    df, origen = None, "parquet"
+    if ruta_datos.exists() and meta.get('version') == VERSION_CACHE and meta.get('tamano') == estado.st_size:
+        if meta.get('mtime_ns') == estado.st_mtime_ns:
+            df = pd.read_parquet(ruta_datos)
+        elif meta.get('hash') == _hash_archivo(ruta):
+            df = pd.read_parquet(ruta_datos)
+            _guardar_cache(ruta, df, {**meta, 'mtime_ns': estado.st_mtime_ns})
+
+    if df is None:
+        origen = "excel"
+        df = _parsear(ruta)
+        _guardar_cache(ruta, df, {
+            'archivo': ruta.name,
+            'version': VERSION_CACHE,
+            'mtime_ns': estado.st_mtime_ns,
+            'tamano': estado.st_size,
+            'hash': _hash_archivo(ruta),
+            'filas': len(df),
+        })
+
+    with _lock:
+        for anterior in [k for k in _tablas if k[0] == firma[0]]:
+            del _tablas[anterior]
+        _tablas[firma] = df
+    return df, origen
+
+
+# ===================================================================
+# Función: poblacion_departamental
+# ===================================================================
+def poblacion_departamental(archivos: list = ARCHIVOS) -> pd.DataFrame:
+    """
+    Población proyectada por departamento y año (suma de los municipios).
+
+    Returns:
+        pd.DataFrame: Columnas [c_digo_departamento, a_o, poblacion_total,
+        poblacion_cabecera, poblacion_rural], una fila por departamento y año.
+    """
+    cargas = []
+    partes = []
+    for ruta in archivos:
+        inicio = time.perf_counter()
+        df, origen = cargar_libro(ruta)
+        cargas.append({'archivo': Path(ruta).name, 'origen': origen, 'filas': len(df),
+                       'ms': (time.perf_counter() - inicio) * 1000})
+        partes.append(df)
+    with _lock:
+        _ultima_carga[:] = cargas
+        # Mientras los libros sean los mismos objetos, la agregación también lo es
+        conocida = _departamental.get('tabla')
+        if conocida is not None and list(map(id, conocida[0])) == list(map(id, partes)):
+            return conocida[1]
+
+    df = pd.concat(partes, ignore_index=True)
+    tabla = (df.groupby(['c_digo_departamento', 'a_o', 'area'], observed=True)['poblacion'].sum()
+               .unstack('area')
+               .rename(columns=AREAS)
+               .reindex(columns=list(AREAS.values())))
+    tabla = tabla.reset_index().rename_axis(columns=None)
+    with _lock:
+        _departamental['tabla'] = (partes, tabla)
+    return tabla
+
+
+def ultima_carga() -> pd.DataFrame:
+    """Origen y tiempo de cada libro en la última llamada a `poblacion_departamental`."""
+    with _lock:
+        return pd.DataFrame(list(_ultima_carga))
+
+
+# ===================================================================
+# Función: unir_poblacion
+# ===================================================================
+def unir_poblacion(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                   poblacion: pd.DataFrame = None) -> pd.Series:
+    """
+    Población total proyectada del departamento y año de cada fila de hechos.
+
+    El cruce se hace sobre una matriz departamento × año armada con las
+    dimensiones, sin merge sobre las filas de hechos.
+
+    Returns:
+        pd.Series: `poblacion_proyectada` alineada con `df_fact` (NaN sin proyección).
+    """
+    if poblacion is None:
+        poblacion = poblacion_departamental()
+    serie = poblacion.set_index(['c_digo_departamento', 'a_o'])['poblacion_total']
+
+    cod_depto, deptos = pd.factorize(pd.to_numeric(dim_geo['c_digo_departamento'], errors='coerce'))
+    anios = dim_tiempo['a_o'].to_numpy()
+    claves = pd.MultiIndex.from_product([deptos, anios])
+    matriz = serie.reindex(claves).to_numpy(dtype='float64').reshape(len(deptos), len(anios))
+
+    pos_geo = pd.Index(dim_geo['id_geo']).get_indexer(df_fact['id_geo'])
+    pos_tiempo = pd.Index(dim_tiempo['id_tiempo']).get_indexer(df_fact['id_tiempo'])
+    depto_fila = cod_depto[pos_geo]
+    valores = np.where(depto_fila >= 0, matriz[np.maximum(depto_fila, 0), pos_tiempo], np.nan)
+    return pd.Series(valores, index=df_fact.index, name='poblacion_proyectada')
+
+
+# ===================================================================
+# Función: poblacion_de_hechos
+# ===================================================================
+def poblacion_de_hechos(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> pd.Series:
+    """
+    `unir_poblacion` calculado una vez por versión de la tabla de hechos y de los libros.
+
+    Returns:
+        pd.Series: Población proyectada de cada fila de hechos.
+    """
+    poblacion = poblacion_departamental()
+    clave = id(df_fact)
+    with _lock:
+        conocida = _por_hechos.get(clave)
+        if conocida and conocida[0]() is df_fact and conocida[1] is poblacion:
+            return conocida[2]
+
+    serie = unir_poblacion(df_fact, dim_geo, dim_tiempo, poblacion)
+    with _lock:
+        _por_hechos[clave] = (weakref.ref(df_fact, lambda _, k=clave: _por_hechos.pop(k, None)), poblacion, serie)
+    return serie
@@ -0,0 +1,236 @@
+import hashlib
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import cache_snapshots
+import proyecciones
+from socrata import fetch_dataset
+from soql import ConsultaSoQL
+
+# Dataset DIVIPOLA (DANE) en datos.gov.co: códigos y nombres de departamentos y municipios
+DIVIPOLA_DATASET = "gdxc-w37w"
+
+# Columnas de DIVIPOLA que usa el registro
+COLUMNAS_DIVIPOLA = ['cod_dpto', 'dpto', 'cod_mpio', 'nom_mpio']
+
+# Llave entera de un valor que no se pudo resolver
+SIN_CODIGO = -1
+
+# Variantes de nombre (ya normalizadas) que no coinciden con el nombre oficial
+ALIAS_DEPARTAMENTOS = {
+    'BOGOTA': 11,
+    'BOGOTA DC': 11,
+    'BOGOTA D C': 11,
+    'BOGOTA DISTRITO CAPITAL': 11,
+    'SANTAFE DE BOGOTA': 11,
+    'SANTAFE DE BOGOTA D C': 11,
+    'SAN ANDRES': 88,
+    'SAN ANDRES Y PROVIDENCIA': 88,
+    'SAN ANDRES PROVIDENCIA Y SANTA CATALINA': 88,
+    'ARCHIPIELAGO DE SAN ANDRES PROVIDENCIA Y SANTA CATALINA': 88,
+    'GUAJIRA': 44,
+    'VALLE': 76,
+    'NORTE SANTANDER': 54,
+}
+
+_registros: dict = {}
+_lock = threading.Lock()
+_construccion = threading.Lock()
+
+
+def normalizar(texto) -> str:
+    """
+    Forma canónica de un nombre geográfico: sin tildes, en mayúsculas, sin
+    puntuación y con espacios simples (ej. "Bogotá, D.C." → "BOGOTA D C").
+    """
+    sin_tildes = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", sin_tildes.upper()).split())
+
+
+def _codigos_unicos(valores) -> tuple:
+    """Factoriza `valores` para normalizar cada variante distinta una sola vez."""
+    if isinstance(valores, pd.Categorical) or isinstance(getattr(valores, 'dtype', None), pd.CategoricalDtype):
+        categorico = pd.Categorical(valores)
+        return np.asarray(categorico.codes), pd.Index(categorico.categories)
+    return pd.factorize(np.asarray(valores, dtype=object), use_na_sentinel=True)
+
+
+# ===================================================================
+# Clase: RegistroGeografico
+# ===================================================================
+class RegistroGeografico:
+    """
+    Llaves enteras DIVIPOLA para departamentos y municipios.
+
+    Al construirse precalcula los diccionarios nombre normalizado → código.
+    Resolver una columna normaliza solo sus valores distintos y lleva el
+    resultado a todas las filas con un `take`, así que 100 mil nombres cuestan
+    lo mismo que las pocas decenas de variantes que contienen.
+    """
+
+    def __init__(self, divipola: pd.DataFrame, origen: str):
+        """
+        Args:
+            divipola (pd.DataFrame): Columnas [cod_dpto, dpto, cod_mpio, nom_mpio].
+            origen (str): De dónde salió la tabla (para mostrarlo en la app).
+        """
+        self.origen = origen
+        cod_dpto = pd.to_numeric(divipola['cod_dpto'], errors='coerce')
+        cod_mpio = pd.to_numeric(divipola['cod_mpio'], errors='coerce')
+        validas = cod_dpto.notna() & cod_mpio.notna()
+        tabla = pd.DataFrame({
+            'cod_dpto': cod_dpto[validas].astype('int32'),
+            'dpto': divipola['dpto'][validas].astype(str),
+            'cod_mpio': cod_mpio[validas].astype('int32'),
+            'nom_mpio': divipola['nom_mpio'][validas].astype(str),
+        }).drop_duplicates('cod_mpio')
+
+        # Huella de la tabla: los resultados calculados con otro registro no se reutilizan
+        self.version = hashlib.blake2b(
+            pd.util.hash_pandas_object(tabla, index=False).to_numpy().tobytes(), digest_size=8).hexdigest()
+
+        deptos = tabla.drop_duplicates('cod_dpto').sort_values('cod_dpto')
+        self.departamentos = pd.Series(deptos['dpto'].to_numpy(), index=deptos['cod_dpto'].to_numpy(), name='departamento')
+        self.nombres_municipio = pd.Series(tabla['nom_mpio'].to_numpy(), index=tabla['cod_mpio'].to_numpy(),
+                                           name='municipio').sort_index()
+
+        self._depto = {normalizar(n): int(c) for c, n in self.departamentos.items()}
+        self._depto.update({a: c for a, c in ALIAS_DEPARTAMENTOS.items() if c in self.departamentos.index})
+        # Los códigos escritos como texto ("05", "5") también son variantes válidas
+        self._depto.update({str(c): int(c) for c in self.departamentos.index})
+
+        self._mpio = {(int(d), normalizar(n)): int(m)
+                      for d, n, m in zip(tabla['cod_dpto'], tabla['nom_mpio'], tabla['cod_mpio'])}
+        self.municipios = len(tabla)
+
+    def _resolver_departamento(self, texto) -> int:
+        clave = normalizar(texto)
+        if clave.isdigit():
+            clave = str(int(clave))
+        return self._depto.get(clave, SIN_CODIGO)
+
+    def codigo_departamento(self, valores) -> np.ndarray:
+        """
+        Código DIVIPOLA entero del departamento de cada valor (nombre o código, en cualquier variante).
+
+        Returns:
+            np.ndarray: int32, `SIN_CODIGO` donde no se encontró.
+        """
+        codigos, unicos = _codigos_unicos(valores)
+        resueltos = np.fromiter((self._resolver_departamento(u) for u in unicos), dtype=np.int32, count=len(unicos))
+        return np.where(codigos >= 0, np.append(resueltos, SIN_CODIGO)[codigos], SIN_CODIGO).astype(np.int32)
+
+    def codigo_municipio(self, departamentos, municipios) -> np.ndarray:
+        """
+        Código DIVIPOLA entero (5 dígitos) de cada par departamento + municipio.
+
+        Returns:
+            np.ndarray: int32, `SIN_CODIGO` donde no se encontró.
+        """
+        cod_depto = self.codigo_departamento(departamentos)
+        cod_nombre, nombres = _codigos_unicos(municipios)
+        normalizados = [normalizar(n) for n in nombres] + ['']
+        # Par (departamento, municipio) → un entero, para resolver cada par distinto una sola vez
+        ancho = len(normalizados)
+        pares, unicos = pd.factorize(cod_depto.astype(np.int64) * ancho + np.where(cod_nombre >= 0, cod_nombre, ancho - 1))
+        resueltos = np.fromiter(
+            (self._mpio.get((int(par // ancho), normalizados[par % ancho]), SIN_CODIGO) for par in unicos),
+            dtype=np.int32, count=len(unicos))
+        return resueltos[pares]
+
+    def codigo_dos_digitos(self, valores) -> list:
+        """
+        Código de departamento como texto de dos dígitos ("05"), igual que DIVIPOLA
+        y el shapefile del MGN; los valores sin código se dejan como texto original.
+        """
+        return [f"{c:02d}" if c != SIN_CODIGO else str(v)
+                for c, v in zip(self.codigo_departamento(valores), valores)]
+
+    def nombre_departamento(self, codigos) -> np.ndarray:
+        """Nombre oficial de cada código de departamento (NaN si no existe)."""
+        return self.departamentos.reindex(np.asarray(codigos)).to_numpy(dtype=object)
+
+    def nombre_municipio(self, codigos) -> np.ndarray:
+        """Nombre oficial de cada código de municipio (NaN si no existe)."""
+        return self.nombres_municipio.reindex(np.asarray(codigos)).to_numpy(dtype=object)
+
+    def no_encontrados(self, valores) -> pd.DataFrame:
+        """
+        Valores de departamento que no se pudieron resolver, con cuántas filas los usan.
+
+        Returns:
+            pd.DataFrame: Columnas [valor, normalizado, filas], de más a menos filas.
+        """
+        serie = pd.Series(np.asarray(valores, dtype=object))
+        faltantes = serie[(self.codigo_departamento(valores) == SIN_CODIGO) & serie.notna()]
+        conteo = faltantes.value_counts()
+        return pd.DataFrame({
+            'valor': conteo.index,
+            'normalizado': [normalizar(v) for v in conteo.index],
+            'filas': conteo.to_numpy(),
+        })
+
+
+def tabla_proyecciones() -> pd.DataFrame:
+    """DIVIPOLA de respaldo: los libros de proyecciones del DANE traen los mismos códigos y nombres."""
+    df, _ = proyecciones.cargar_libro(proyecciones.ARCHIVOS[-1])
+    df = df.drop_duplicates('c_digo_municipio')
+    return pd.DataFrame({
+        'cod_dpto': df['c_digo_departamento'].to_numpy(),
+        'dpto': df['departamento'].astype(str).to_numpy(),
+        'cod_mpio': df['c_digo_municipio'].to_numpy(),
+        'nom_mpio': df['municipio'].astype(str).to_numpy(),
+    })
+
+
+# ===================================================================
+# Función: descargar_divipola
+# ===================================================================
+def descargar_divipola(progress=None) -> pd.DataFrame:
+    """
+    Descarga DIVIPOLA desde la API (o la sirve del snapshot vigente) y la deja
+    guardada para que `obtener_registro` la use sin conexión. Es una tarea de la
+    precarga de cada sesión (ver `app.py`); si falla, el registro sigue saliendo
+    de los libros de proyecciones.
+    """
+    df, _ = cache_snapshots.cargar_con_cache(DIVIPOLA_DATASET, None, lambda: fetch_dataset(
+        DIVIPOLA_DATASET, ConsultaSoQL().seleccionar(*COLUMNAS_DIVIPOLA).params(), progress=progress))
+    with _lock:
+        _registros.clear()
+    return df
+
+
+# ===================================================================
+# Función: obtener_registro
+# ===================================================================
+def obtener_registro() -> RegistroGeografico:
+    """
+    Devuelve el registro geográfico del proceso, construido una sola vez.
+
+    Usa el snapshot local de DIVIPOLA (`gdxc-w37w`) si existe; si no, los
+    libros de proyecciones de población del DANE que vienen en `Datos/`.
+    """
+    info = cache_snapshots.info_snapshot(DIVIPOLA_DATASET)
+    clave = ('divipola', info.get('etag'), info.get('last_modified'), info.get('filas')) if info else ('proyecciones',)
+    with _lock:
+        if clave in _registros:
+            return _registros[clave]
+
+    # Las sesiones que abren a la vez esperan a la primera en vez de leer todas los libros
+    with _construccion:
+        with _lock:
+            if clave in _registros:
+                return _registros[clave]
+        if info:
+            registro = RegistroGeografico(cache_snapshots.leer_snapshot(DIVIPOLA_DATASET),
+                                          f"DIVIPOLA ({DIVIPOLA_DATASET})")
+        else:
+            registro = RegistroGeografico(tabla_proyecciones(), "proyecciones DANE (Datos/)")
+        with _lock:
+            _registros.clear()
+            _registros[clave] = registro
+    return registro
@@ -0,0 +1,254 @@
+import csv
+import io
+import json
+import operator
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+# ===================================================================
+# Función: cargar_grabacion
+# ===================================================================
+def cargar_grabacion(directorio: str) -> dict:
+    """
+    Lee respuestas grabadas de la API: un archivo `<dataset_id>.json` por dataset.
+
+    Returns:
+        dict: {dataset_id: lista de registros}.
+    """
+    return {ruta.stem: json.loads(ruta.read_text(encoding="utf-8"))
+            for ruta in Path(directorio).glob("*.json")}
+
+
+# ===================================================================
+# Subconjunto de SoQL: `col op valor`, `col IN (...)` unidas con AND,
+# `count(*)`/`sum`/`avg`/`min`/`max`, `$group` y `$order`
+# ===================================================================
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_LITERAL = r"'(?:[^']|'')*'|[^\s',()]+"
+_CONDICION = re.compile(rf"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*({_LITERAL})\s*$")
+_EN = re.compile(r"^\s*(\w+)\s+IN\s*\((.*)\)\s*$", re.IGNORECASE)
+_AGREGADO = re.compile(r"^(count|sum|avg|min|max)\((\*|\w+)\)(?:\s+AS\s+(\w+))?$", re.IGNORECASE)
+_OPERADORES = {">=": operator.ge, "<=": operator.le, "!=": operator.ne,
+               "=": operator.eq, ">": operator.gt, "<": operator.lt}
+
+
+def _como_numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return valor
+
+
+def _leer_literal(texto: str):
+    if texto.startswith("'"):
+        texto = texto[1:-1].replace("''", "'")
+    return _como_numero(texto)
+
+
+def _parsear_condicion(texto: str):
+    """Devuelve (columna, predicado) para una condición del `$where`."""
+    en = _EN.match(texto)
+    if en:
+        columna, lista = en.groups()
+        valores = [_leer_literal(v) for v in re.findall(_LITERAL, lista)]
+        return columna, lambda valor: any(type(valor) is type(v) and valor == v for v in valores)
+    coincidencia = _CONDICION.match(texto)
+    if not coincidencia:
+        raise ValueError(f"Condición SoQL no soportada: {texto}")
+    columna, op, literal = coincidencia.groups()
+    literal = _leer_literal(literal)
+    return columna, lambda valor: type(valor) is type(literal) and _OPERADORES[op](valor, literal)
+
+
+def _cumple(registro: dict, columna: str, predicado) -> bool:
+    valor = _como_numero(registro.get(columna))
+    return valor is not None and predicado(valor)
+
+
+def _a_csv(registros: list, select: str = None) -> bytes:
+    """Registros como CSV con encabezado, como el endpoint `.csv` (campos ausentes vacíos)."""
+    if select:
+        columnas = [c.strip() for c in select.split(",")]
+    else:
+        columnas = list(dict.fromkeys(c for r in registros for c in r))
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=columnas, quoting=csv.QUOTE_ALL, extrasaction="ignore")
+    escritor.writeheader()
+    escritor.writerows(registros)
+    return salida.getvalue().encode("utf-8")
+
+
+def _clave_orden(valor):
+    valor = _como_numero(valor)
+    # Números antes que textos y nulos al final, para no comparar tipos distintos
+    return (valor is None, isinstance(valor, str), valor if valor is not None else 0)
+
+
+def _ordenar(registros: list, order: str) -> list:
+    for campo in reversed([c.strip() for c in order.split(",")]):
+        columna, _, direccion = campo.partition(" ")
+        if columna.startswith(":"):
+            continue
+        registros = sorted(registros, key=lambda r: _clave_orden(r.get(columna)),
+                           reverse=direccion.strip().upper() == "DESC")
+    return registros
+
+
+def _seleccionar(registros: list, select: str, group: str = None) -> list:
+    campos = [c.strip() for c in select.split(",")]
+    agregados = [_AGREGADO.match(c) for c in campos]
+    if not any(agregados):
+        return [{c: r[c] for c in campos if c in r} for r in registros]
+
+    claves = [c.strip() for c in group.split(",")] if group else []
+    grupos: dict = {}
+    for r in registros:
+        grupos.setdefault(tuple(r.get(c) for c in claves), []).append(r)
+    if not claves:
+        grupos.setdefault((), [])
+
+    filas = []
+    for valores, miembros in grupos.items():
+        fila = dict(zip(claves, valores))
+        for campo, agg in zip(campos, agregados):
+            if not agg:
+                continue
+            funcion, columna, alias = agg.groups()
+            alias = alias or f"{funcion}_{columna}".replace("*", "")
+            funcion = funcion.lower()
+            if funcion == "count":
+                fila[alias] = str(len(miembros))
+                continue
+            numeros = [n for n in (_como_numero(m.get(columna)) for m in miembros) if isinstance(n, float)]
+            if funcion == "sum":
+                fila[alias] = str(sum(numeros))
+            elif numeros:
+                fila[alias] = str({"avg": lambda x: sum(x) / len(x), "min": min, "max": max}[funcion](numeros))
+        filas.append(fila)
+    return filas
+
+
+# ===================================================================
+# Clase: ServidorSocrataLocal
+# ===================================================================
+class ServidorSocrataLocal:
+    """
+    Servidor HTTP local que imita la API Socrata de datos.gov.co.
+
+    Sirve registros grabados con `$limit`, `$offset`, un subconjunto de SoQL
+    (`$where` con comparaciones e `IN`, `$select` con columnas y
+    `count`/`sum`/`avg`/`min`/`max`, `$group`, `$order`) y revalidación
+    por ETag (`If-None-Match` → 304), en JSON o en CSV según el endpoint
+    (`.json`/`.csv`), para probar y medir los cargadores sin depender del portal real.
+
+    Uso:
+        with ServidorSocrataLocal({"nudc-7mev": registros}, latencia=0.05) as srv:
+            df = fetch_dataset("nudc-7mev", base_url=srv.base_url)
+    """
+
+    def __init__(self, datasets: dict, latencia: float = 0.0, errores_iniciales: int = 0):
+        """
+        Args:
+            datasets (dict): {dataset_id: lista de registros (dicts)}.
+            latencia (float): Segundos de espera simulada por petición.
+            errores_iniciales (int): Cuántas peticiones responder con 503 antes de servir.
+        """
+        self.datasets = datasets
+        self.latencia = latencia
+        self.errores_pendientes = errores_iniciales
+        self.peticiones = 0
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._crear_handler())
+        self._hilo = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/resource"
+
+    def etag(self, dataset_id: str):
+        """Versión del dataset: cambia cuando cambia el número de registros."""
+        registros = self.datasets.get(dataset_id)
+        return f'"{dataset_id}-{len(registros)}"' if registros is not None else None
+
+    def responder(self, dataset_id: str, params: dict):
+        """Resuelve una consulta y devuelve (status, cuerpo JSON serializable)."""
+        registros = self.datasets.get(dataset_id)
+        if registros is None:
+            return 404, {"error": f"dataset {dataset_id} no existe"}
+        if "$where" in params:
+            condiciones = [_parsear_condicion(c) for c in _AND.split(params["$where"])]
+            registros = [r for r in registros if all(_cumple(r, *c) for c in condiciones)]
+        offset = int(params.get("$offset", 0))
+        limit = int(params.get("$limit", 1000))
+        agrega = any(_AGREGADO.match(c.strip()) for c in params.get("$select", "").split(","))
+        por_filas = not agrega and params.get("$order", ":id") == ":id"
+        if por_filas:
+            # Sin agregar ni reordenar, basta proyectar la página pedida
+            registros = registros[offset:offset + limit]
+            offset = 0
+        if "$select" in params:
+            registros = _seleccionar(registros, params["$select"], params.get("$group"))
+        if "$order" in params and not por_filas:
+            registros = _ordenar(registros, params["$order"])
+        return 200, registros[offset:offset + limit]
+
+    def _crear_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 para que el pool de conexiones del cliente se reutilice
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with servidor._lock:
+                    servidor.peticiones += 1
+                    fallar = servidor.errores_pendientes > 0
+                    if fallar:
+                        servidor.errores_pendientes -= 1
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                url = urlparse(self.path)
+                dataset_id = Path(url.path).stem
+                etag = servidor.etag(dataset_id)
+                if fallar:
+                    status, cuerpo = 503, {"error": "servicio no disponible"}
+                elif etag and self.headers.get("If-None-Match") == etag:
+                    status, cuerpo = 304, None
+                else:
+                    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    status, cuerpo = servidor.responder(dataset_id, params)
+                como_csv = url.path.endswith(".csv") and status == 200
+                if como_csv:
+                    datos = _a_csv(cuerpo, params.get("$select"))
+                else:
+                    datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else b""
+                with servidor._lock:
+                    servidor.bytes_enviados += len(datos)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/csv" if como_csv else "application/json")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
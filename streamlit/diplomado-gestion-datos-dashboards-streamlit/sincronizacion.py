@@ -0,0 +1,159 @@
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from cache_snapshots import candado_snapshot, guardar_snapshot, leer_snapshot
+from socrata import BASE_URL, concatenar, consultar, crear_sesion, fetch_dataset, revalidar, tipar
+from soql import ConsultaSoQL, combinar_where
+
+# Llave natural de un registro del dataset MEN
+CLAVES_EDUCACION = ['a_o', 'c_digo_departamento', 'municipio']
+
+# Columnas cuya suma por año funciona como checksum para detectar correcciones
+COLUMNAS_CHECKSUM = ['poblaci_n_5_16', 'tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta']
+
+
+# ===================================================================
+# Función: resumen_por_anio_remoto
+# ===================================================================
+def resumen_por_anio_remoto(dataset_id: str, columna_anio: str, columnas: list,
+                            base_url: str = BASE_URL, session=None,
+                            where: Optional[str] = None) -> pd.DataFrame:
+    """
+    Pide al portal filas y sumas por año con `$group` (una respuesta de pocos KB).
+
+    Args:
+        where (str): Filtro `$where` de la consulta base, para comparar las mismas filas.
+
+    Returns:
+        pd.DataFrame: Columnas [columna_anio, filas, suma_<col>...] como números.
+    """
+    consulta = ConsultaSoQL().seleccionar(columna_anio).agregar("count", alias="filas").agrupar(columna_anio)
+    for c in columnas:
+        consulta.agregar("sum", c, f"suma_{c}")
+    params = consulta.params()
+    if where:
+        params["$where"] = where
+    data = consultar(dataset_id, {**params, "$limit": 10000}, base_url=base_url, session=session)
+    resumen = pd.DataFrame(data, columns=[columna_anio, "filas"] + [f"suma_{c}" for c in columnas])
+    return resumen.apply(pd.to_numeric, errors='coerce')
+
+
+# ===================================================================
+# Función: resumen_por_anio_local
+# ===================================================================
+def resumen_por_anio_local(df: pd.DataFrame, columna_anio: str, columnas: list) -> pd.DataFrame:
+    """Mismo resumen que `resumen_por_anio_remoto`, calculado sobre el snapshot local."""
+    numerico = df[[columna_anio] + columnas].apply(pd.to_numeric, errors='coerce')
+    agrupado = numerico.groupby(columna_anio)
+    resumen = agrupado[columnas].sum().add_prefix("suma_")
+    resumen.insert(0, "filas", agrupado.size())
+    return resumen.reset_index()
+
+
+# ===================================================================
+# Función: anios_modificados
+# ===================================================================
+def anios_modificados(local: pd.DataFrame, remoto: pd.DataFrame, columna_anio: str,
+                      hasta: float) -> tuple:
+    """
+    Compara conteos y sumas por año hasta `hasta` (inclusive).
+
+    Returns:
+        tuple: (años corregidos o faltantes localmente, años que ya no existen en el portal).
+    """
+    remoto = remoto[remoto[columna_anio] <= hasta]
+    cruce = remoto.merge(local, on=columna_anio, how='outer', suffixes=('_remoto', '_local'),
+                         indicator=True)
+    eliminados = cruce.loc[cruce['_merge'] == 'right_only', columna_anio].tolist()
+    comunes = cruce[cruce['_merge'] != 'right_only']
+
+    columnas = [c for c in remoto.columns if c != columna_anio]
+    distinto = np.zeros(len(comunes), dtype=bool)
+    for c in columnas:
+        distinto |= ~np.isclose(comunes[f"{c}_remoto"].to_numpy(dtype=float),
+                                comunes[f"{c}_local"].to_numpy(dtype=float),
+                                rtol=1e-6, atol=1e-6, equal_nan=True)
+    return comunes.loc[distinto, columna_anio].tolist(), eliminados
+
+
+# ===================================================================
+# Función: sincronizar_incremental
+# ===================================================================
+def sincronizar_incremental(dataset_id: str, columna_anio: str = 'a_o',
+                            claves: list = CLAVES_EDUCACION,
+                            columnas_checksum: list = COLUMNAS_CHECKSUM,
+                            base_url: str = BASE_URL,
+                            progress: Optional[Callable[[int, int], None]] = None,
+                            params: Optional[dict] = None, tipos: Optional[dict] = None):
+    """
+    Actualiza el snapshot local pidiendo solo los años posteriores al más reciente guardado.
+
+    Además compara filas y sumas por año contra el portal; los años que no coinciden
+    se vuelven a descargar completos y reemplazan a los locales. Si no hay snapshot,
+    hace una descarga completa.
+
+    Args:
+        params (dict): Consulta base (`$select`/`$where`) que define el snapshot; los
+            años se piden agregando su condición al `$where` de esta consulta.
+        tipos (dict): Descargar por CSV con estos tipos (ver `socrata.fetch_dataset`); el
+            snapshot local se lleva a los mismos tipos antes de unirlo con lo nuevo.
+
+    Returns:
+        tuple: (DataFrame sincronizado, dict con el resumen de la sincronización).
+    """
+    session = crear_sesion()
+    params = dict(params or {})
+    where_base = params.get("$where")
+
+    def con_where(condicion: str) -> dict:
+        return {**params, "$where": combinar_where(where_base, condicion)}
+
+    with candado_snapshot(dataset_id, params or None):
+        local = leer_snapshot(dataset_id, params or None)
+        if local is None or local.empty:
+            df = fetch_dataset(dataset_id, params or None, base_url=base_url, session=session,
+                               progress=progress, tipos=tipos)
+            estado = revalidar(dataset_id, base_url=base_url, session=session)
+            df = guardar_snapshot(dataset_id, params or None, df, estado["etag"], estado["last_modified"])
+            return df, {"modo": "completa", "anios_nuevos": [], "anios_corregidos": [],
+                        "anios_eliminados": [], "filas_descargadas": len(df)}
+
+        if tipos:
+            # Los snapshots descargados por JSON traen textos
+            local, _ = tipar(local, tipos)
+        anios_locales = pd.to_numeric(local[columna_anio], errors='coerce')
+        anio_max = anios_locales.max()
+
+        remoto = resumen_por_anio_remoto(dataset_id, columna_anio, columnas_checksum, base_url, session, where_base)
+        corregidos, eliminados = anios_modificados(
+            resumen_por_anio_local(local, columna_anio, columnas_checksum), remoto, columna_anio, anio_max)
+
+        # Años nuevos: un solo `$where` con todo lo posterior al último año guardado
+        partes = [fetch_dataset(dataset_id, con_where(f"{columna_anio} > {anio_max:g}"),
+                                base_url=base_url, session=session, progress=progress, tipos=tipos)]
+        for anio in corregidos:
+            partes.append(fetch_dataset(dataset_id, con_where(f"{columna_anio} = {anio:g}"),
+                                        base_url=base_url, session=session, tipos=tipos))
+        descargado = concatenar(partes)
+
+        conservar = ~anios_locales.isin(corregidos + eliminados)
+        df = concatenar([local[conservar], descargado])
+        df = df.drop_duplicates(subset=[c for c in claves if c in df.columns], keep='last')
+        df = df.reset_index(drop=True)
+
+        estado = revalidar(dataset_id, base_url=base_url, session=session)
+        df = guardar_snapshot(dataset_id, params or None, df, estado["etag"], estado["last_modified"])
+
+    nuevos = partes[0]
+    anios_nuevos = [] if nuevos.empty else sorted(
+        pd.to_numeric(nuevos[columna_anio], errors='coerce').dropna().unique().tolist())
+    return df, {
+        "modo": "incremental",
+        "anio_max_local": int(anio_max),
+        "anios_nuevos": anios_nuevos,
+        "anios_corregidos": corregidos,
+        "anios_eliminados": eliminados,
+        "filas_descargadas": len(descargado),
+    }
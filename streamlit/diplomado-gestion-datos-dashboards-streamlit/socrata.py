@@ -0,0 +1,305 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import pandas as pd
+import requests
+from pandas.api.types import (is_float_dtype, is_integer_dtype, is_numeric_dtype, pandas_dtype,
+                              union_categoricals)
+from requests.adapters import HTTPAdapter
+
+# Portal de datos abiertos (API Socrata)
+BASE_URL = "https://www.datos.gov.co/resource"
+
+# Códigos HTTP que justifican un reintento (saturación o fallas temporales del portal)
+REINTENTAR_STATUS = {429, 500, 502, 503, 504}
+
+
+# ===================================================================
+# Función: crear_sesion
+# ===================================================================
+def crear_sesion(pool_size: int = 8) -> requests.Session:
+    """
+    Crea una sesión HTTP con un pool de conexiones reutilizables.
+
+    Args:
+        pool_size (int): Número máximo de conexiones abiertas por host.
+
+    Returns:
+        requests.Session: Sesión lista para compartir entre hilos.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# ===================================================================
+# Función: _pedir
+# ===================================================================
+def _pedir(session: requests.Session, url: str, params: dict, leer: Callable[[requests.Response], object],
+           reintentos: int = 3, backoff: float = 0.5, timeout: float = 60, stream: bool = False):
+    """
+    Hace un GET y procesa la respuesta con `leer`, reintentando con espera exponencial.
+
+    Con `stream` el cuerpo se lee mientras llega; si la conexión se corta a mitad
+    de camino, la página completa se vuelve a pedir.
+
+    Raises:
+        requests.exceptions.RequestException: Si se agotan los reintentos.
+    """
+    for intento in range(reintentos + 1):
+        try:
+            with session.get(url, params=params, timeout=timeout, stream=stream) as response:
+                if response.status_code in REINTENTAR_STATUS and intento < reintentos:
+                    time.sleep(backoff * 2 ** intento)
+                    continue
+                response.raise_for_status()
+                return leer(response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError):
+            if intento == reintentos:
+                raise
+            time.sleep(backoff * 2 ** intento)
+
+
+def _get_json(session: requests.Session, url: str, params: dict, **kwargs):
+    """GET con reintentos que decodifica el cuerpo JSON."""
+    return _pedir(session, url, params, lambda response: response.json(), **kwargs)
+
+
+# ===================================================================
+# Función: tipar
+# ===================================================================
+def tipar(df: pd.DataFrame, tipos: dict) -> tuple:
+    """
+    Lleva las columnas de `df` a los tipos de `tipos`, contando los valores mal formados.
+
+    Las columnas numéricas que ya llegan con tipo numérico solo se convierten; las
+    que traen textos se pasan por `pd.to_numeric` y cada texto que no es un número
+    (o un decimal en una columna entera) queda nulo y se cuenta. Sirve tanto para
+    las páginas CSV como para datos que llegaron como JSON (ej. snapshots anteriores).
+
+    Args:
+        tipos (dict): {columna: dtype de pandas}, ej. {"a_o": "Int16", "municipio": "category"}.
+
+    Returns:
+        tuple: (DataFrame tipado, {columna: valores mal formados}).
+    """
+    columnas = {}
+    malformados = {}
+    for col, tipo in tipos.items():
+        if col not in df.columns:
+            continue
+        serie, tipo = df[col], pandas_dtype(tipo)
+        if not is_numeric_dtype(tipo):
+            columnas[col] = serie.astype(tipo)
+            continue
+        numeros = serie if is_numeric_dtype(serie) else pd.to_numeric(serie, errors="coerce")
+        invalidos = numeros.isna() & serie.notna()
+        if is_integer_dtype(tipo) and is_float_dtype(numeros):
+            fraccion = numeros.notna() & (numeros % 1 != 0)
+            numeros = numeros.mask(fraccion)
+            invalidos |= fraccion
+        columnas[col] = numeros.astype(tipo)
+        malformados[col] = int(invalidos.sum())
+    return df.assign(**columnas), malformados
+
+
+# ===================================================================
+# Función: concatenar
+# ===================================================================
+def concatenar(partes: list) -> pd.DataFrame:
+    """
+    `pd.concat` de páginas tipadas que conserva las categóricas: cada página trae
+    sus propias categorías y `pd.concat` las convertiría en textos.
+    """
+    # Las páginas sin filas no aportan datos (y sin encabezado, tampoco columnas)
+    partes = [p for p in partes if len(p.columns)]
+    if not partes:
+        return pd.DataFrame()
+    partes = [p for p in partes if len(p)] or partes[:1]
+    df = pd.concat(partes, ignore_index=True)
+    for col in df.columns:
+        categoricas = [p[col] for p in partes if col in p.columns]
+        if len(categoricas) == len(partes) and all(isinstance(c.dtype, pd.CategoricalDtype) for c in categoricas):
+            df[col] = pd.Categorical(union_categoricals(categoricas, sort_categories=True))
+    return df
+
+
+def _leer_csv(flujo, tipos: dict) -> tuple:
+    """Convierte una página CSV en un DataFrame tipado a medida que se lee `flujo`."""
+    texto = {col: "category" for col, tipo in tipos.items() if tipo == "category"}
+    try:
+        # Solo los campos vacíos son nulos, como las claves ausentes en JSON
+        df = pd.read_csv(flujo, dtype=texto, keep_default_na=False, na_values=[""])
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame()
+    return tipar(df, tipos)
+
+
+# ===================================================================
+# Función: consultar
+# ===================================================================
+def consultar(dataset_id: str, params: dict, base_url: str = BASE_URL,
+              session: Optional[requests.Session] = None) -> list:
+    """
+    Ejecuta una sola consulta SoQL (sin paginar) y devuelve los registros JSON.
+
+    Útil para respuestas pequeñas, como agregados con `$group`.
+    """
+    return _get_json(session or crear_sesion(1), f"{base_url}/{dataset_id}.json", params)
+
+
+# ===================================================================
+# Función: contar_registros
+# ===================================================================
+def contar_registros(dataset_id: str, params: Optional[dict] = None,
+                     base_url: str = BASE_URL,
+                     session: Optional[requests.Session] = None) -> int:
+    """
+    Consulta cuántos registros tiene un dataset (respetando el filtro `$where`).
+
+    Returns:
+        int: Número de registros que devolvería la consulta completa.
+    """
+    session = session or crear_sesion(1)
+    consulta = {"$select": "count(*) AS total"}
+    if params and "$where" in params:
+        consulta["$where"] = params["$where"]
+    data = _get_json(session, f"{base_url}/{dataset_id}.json", consulta)
+    return int(data[0]["total"]) if data else 0
+
+
+# ===================================================================
+# Función: fetch_dataset
+# ===================================================================
+def fetch_dataset(dataset_id: str, params: Optional[dict] = None,
+                  page_size: int = 50000, max_workers: int = 4,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  base_url: str = BASE_URL,
+                  session: Optional[requests.Session] = None,
+                  tipos: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Descarga un dataset Socrata completo paginando con `$offset`/`$order`.
+
+    Primero cuenta los registros, luego pide todas las páginas en paralelo
+    sobre un pool de hilos acotado que comparte una misma sesión HTTP.
+
+    Con `tipos`, las páginas se piden al endpoint `.csv` y se leen en columnas
+    tipadas mientras llegan (ver `tipar`), en vez de decodificar el JSON a una
+    lista de diccionarios y armar columnas de objetos. Los valores mal formados
+    quedan nulos y su conteo por columna va en `df.attrs["malformados"]`.
+
+    Args:
+        dataset_id (str): Identificador del dataset (ej. "nudc-7mev").
+        params (dict): Parámetros SoQL adicionales (`$where`, `$select`, `$group`, ...),
+            normalmente `ConsultaSoQL(...).params()`.
+        page_size (int): Registros por página.
+        max_workers (int): Páginas descargadas simultáneamente.
+        progress (callable): Se llama como `progress(paginas_listas, total_paginas)`
+            desde el hilo principal, así que puede actualizar widgets de Streamlit.
+        base_url (str): Raíz de la API (permite apuntar a un servidor local).
+        session (requests.Session): Sesión a reutilizar; si no se da, se crea una.
+        tipos (dict): {columna: dtype} para la lectura tipada por CSV (None = JSON sin tipar).
+
+    Returns:
+        pd.DataFrame: Registros de todas las páginas en su orden original.
+
+    Raises:
+        requests.exceptions.RequestException: Si alguna página falla tras los reintentos.
+    """
+    session = session or crear_sesion(max_workers)
+    params = dict(params or {})
+    # Un orden estable es obligatorio para que las páginas no se solapen
+    params.setdefault("$order", ":id")
+    # Las respuestas agregadas son pequeñas y sus alias no siempre están en `tipos`
+    csv = tipos is not None and "$group" not in params
+    url = f"{base_url}/{dataset_id}.{'csv' if csv else 'json'}"
+
+    def leer_csv(response: requests.Response) -> tuple:
+        # Se lee del socket mientras llega, descomprimiendo si el portal usa gzip
+        response.raw.decode_content = True
+        return _leer_csv(response.raw, tipos)
+
+    def pedir_pagina(i: int):
+        pagina = {**params, "$limit": page_size, "$offset": i * page_size}
+        if not csv:
+            return _get_json(session, url, pagina)
+        df, conteo = _pedir(session, url, pagina, leer_csv, stream=True)
+        df.attrs["malformados"] = conteo
+        return df
+
+    def unir(paginas: list) -> pd.DataFrame:
+        if csv:
+            malformados = {}
+            for pagina in paginas:
+                for col, n in pagina.attrs["malformados"].items():
+                    malformados[col] = malformados.get(col, 0) + n
+            df = concatenar(paginas)
+            df.attrs["malformados"] = malformados
+            return df
+        df = pd.DataFrame([fila for pagina in paginas for fila in pagina])
+        if tipos is None:
+            return df
+        df, conteo = tipar(df, tipos)
+        df.attrs["malformados"] = conteo
+        return df
+
+    if "$group" in params:
+        # `count(*)` cuenta filas, no grupos: las respuestas agregadas se piden en serie
+        paginas = [pedir_pagina(0)]
+        while len(paginas[-1]) == page_size:
+            paginas.append(pedir_pagina(len(paginas)))
+        if progress:
+            progress(len(paginas), len(paginas))
+        return unir(paginas)
+
+    total = contar_registros(dataset_id, params, base_url=base_url, session=session)
+    n_paginas = max(1, -(-total // page_size))
+    if progress:
+        progress(0, n_paginas)
+
+    paginas = [None] * n_paginas
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futuros = {pool.submit(pedir_pagina, i): i for i in range(n_paginas)}
+        for hechas, futuro in enumerate(as_completed(futuros), start=1):
+            paginas[futuros[futuro]] = futuro.result()
+            if progress:
+                progress(hechas, n_paginas)
+
+    # Si el dataset creció después del conteo, se siguen pidiendo páginas en serie
+    while len(paginas[-1]) == page_size:
+        paginas.append(pedir_pagina(len(paginas)))
+
+    return unir(paginas)
+
+
+# ===================================================================
+# Función: revalidar
+# ===================================================================
+def revalidar(dataset_id: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None, base_url: str = BASE_URL,
+              session: Optional[requests.Session] = None) -> dict:
+    """
+    Pregunta al portal si el dataset cambió usando `If-None-Match`/`If-Modified-Since`.
+
+    Returns:
+        dict: {"modificado": bool, "etag": str | None, "last_modified": str | None}.
+    """
+    session = session or crear_sesion(1)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = session.get(f"{base_url}/{dataset_id}.json", params={"$limit": 1},
+                           headers=headers, timeout=30)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return {
+        "modificado": response.status_code != 304,
+        "etag": response.headers.get("ETag", etag),
+        "last_modified": response.headers.get("Last-Modified", last_modified),
+    }
@@ -0,0 +1,113 @@
+from typing import Optional
+
+# Funciones de agregación que usan las consultas del tablero (las soporta el servidor local)
+AGREGACIONES = {"count", "sum", "avg", "min", "max"}
+
+# Operadores de comparación admitidos en `donde`
+OPERADORES = {"=", "!=", ">", ">=", "<", "<="}
+
+
+def literal(valor) -> str:
+    """Escribe un valor como literal SoQL: números tal cual y textos entre comillas simples."""
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if isinstance(valor, (int, float)):
+        return f"{valor:g}" if isinstance(valor, float) else str(valor)
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+# ===================================================================
+# Clase: ConsultaSoQL
+# ===================================================================
+class ConsultaSoQL:
+    """
+    Constructor de consultas SoQL para la API de datos.gov.co.
+
+    Permite pedir al portal solo las columnas, filas y agregados que usa cada
+    pestaña, en lugar de descargar el dataset completo y filtrarlo en pandas.
+    Los métodos devuelven la misma consulta para poder encadenarlos:
+
+        ConsultaSoQL().seleccionar("a_o", "cobertura_neta").entre("a_o", 2018, 2022).params()
+    """
+
+    def __init__(self):
+        self._select = []
+        self._where = []
+        self._group = []
+        self._order = []
+
+    def seleccionar(self, *columnas: str) -> "ConsultaSoQL":
+        """Proyecta solo estas columnas (`$select`)."""
+        self._select.extend(columnas)
+        return self
+
+    def agregar(self, funcion: str, columna: str = "*", alias: Optional[str] = None) -> "ConsultaSoQL":
+        """Agrega `funcion(columna) AS alias` al `$select` (ej. `sum(aulas_mejoradas)`)."""
+        if funcion.lower() not in AGREGACIONES:
+            raise ValueError(f"Agregación SoQL no soportada: {funcion}")
+        alias = alias or f"{funcion}_{columna}".replace("*", "filas")
+        self._select.append(f"{funcion}({columna}) AS {alias}")
+        return self
+
+    def donde(self, columna: str, operador: str, valor) -> "ConsultaSoQL":
+        """Agrega la condición `columna operador valor` al `$where` (unidas con AND)."""
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador SoQL no soportado: {operador}")
+        self._where.append(f"{columna} {operador} {literal(valor)}")
+        return self
+
+    def en(self, columna: str, valores) -> "ConsultaSoQL":
+        """Condición `columna IN (...)`; sin valores no agrega nada."""
+        valores = list(valores)
+        if valores:
+            self._where.append(f"{columna} IN ({', '.join(literal(v) for v in valores)})")
+        return self
+
+    def entre(self, columna: str, desde=None, hasta=None) -> "ConsultaSoQL":
+        """Rango cerrado `desde <= columna <= hasta` (cualquiera de los extremos puede omitirse)."""
+        if desde is not None:
+            self.donde(columna, ">=", desde)
+        if hasta is not None:
+            self.donde(columna, "<=", hasta)
+        return self
+
+    def agrupar(self, *columnas: str) -> "ConsultaSoQL":
+        """Agrupa en el servidor (`$group`); el `$select` debe combinar estas columnas con agregados."""
+        self._group.extend(columnas)
+        return self
+
+    def ordenar(self, *columnas: str) -> "ConsultaSoQL":
+        """Orden de las filas (`$order`)."""
+        self._order.extend(columnas)
+        return self
+
+    @property
+    def agrupada(self) -> bool:
+        """Si la consulta devuelve filas agregadas (una sola respuesta, sin paginar por :id)."""
+        return bool(self._group)
+
+    def params(self) -> dict:
+        """
+        Parámetros para `fetch_dataset`/`consultar`.
+
+        Returns:
+            dict: Solo las llaves `$select`, `$where`, `$group` y `$order` que tengan contenido.
+        """
+        params = {}
+        if self._select:
+            params["$select"] = ", ".join(self._select)
+        if self._where:
+            params["$where"] = " AND ".join(self._where)
+        if self._group:
+            params["$group"] = ", ".join(self._group)
+            # Las filas agrupadas no tienen :id; se ordenan por las columnas del grupo
+            params["$order"] = ", ".join(self._order or self._group)
+        elif self._order:
+            params["$order"] = ", ".join(self._order)
+        return params
+
+
+def combinar_where(*condiciones: Optional[str]) -> Optional[str]:
+    """Une con AND las condiciones `$where` que no estén vacías."""
+    presentes = [c for c in condiciones if c]
+    return " AND ".join(presentes) if presentes else None
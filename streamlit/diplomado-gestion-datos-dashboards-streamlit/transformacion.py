@@ -1,33 +1,91 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import io
+import time
+
+import almacen
+import datos_compartidos
+import particiones
+from modelo_estrella import build_star_schema, huella, ultima_ejecucion
+from cubo_olap import obtener_cubo
+from exportacion import FORMATOS, exportacion_lista, obtener_exportacion
+from instrumentacion import etapa, graficar
+from memoria import bytes_objeto, reporte_memoria
+from registro_geografico import obtener_registro
+from vista_hechos import obtener_vista
+ 
+def preparar_modelo():
+    """
+    Deja el modelo estrella en la sesión: lo construye a partir de `df_raw` o,
+    tras un reinicio, lo recupera de la bodega SQLite.
+ 
+    app.py la llama en cada ejecución, porque solo se ejecuta la pestaña abierta
+    y las demás necesitan `df_fact` aunque nunca se abra esta.
+ 
+    Returns:
+        str | None: "etl", "bodega" o "sesion" según de dónde salió el modelo;
+            None si todavía no hay datos cargados.
+ 
+    Raises:
+        ValueError: Si el dataset no tiene las columnas que exige el modelo.
+    """
+    if 'df_raw' in st.session_state:
+        df_raw = st.session_state['df_raw']
+        with etapa("modelo estrella", filas_entrada=len(df_raw)) as e:
+            inicio = time.perf_counter()
+            # El ETL programado (etl.py) o una sesión anterior ya guardó el modelo de este mismo crudo
+            modelo = almacen.cargar_modelo() if almacen.version_crudo() == huella(df_raw) else None
+            if modelo is not None:
+                df_fact, dim_geo, dim_tiempo = modelo
+                st.session_state['tiempos_modelo'] = {'cache': True, 'ms_total': (time.perf_counter() - inicio) * 1000}
+            else:
+                df_fact, dim_geo, dim_tiempo = build_star_schema(df_raw)
+                st.session_state['tiempos_modelo'] = ultima_ejecucion().get('modelo', {})
+            e.filas(len(df_fact)).cache(st.session_state['tiempos_modelo'].get('cache', False))
+        st.session_state['df_fact'] = df_fact
+        st.session_state['dim_geo'] = dim_geo
+        st.session_state['dim_tiempo'] = dim_tiempo
+        st.session_state['registros_originales'] = len(df_raw)
+        st.session_state['origen_modelo'] = 'etl'
+        # Con la tabla de hechos lista, el crudo ya no se necesita en la sesión
+        del st.session_state['df_raw']
+        if almacen.version_guardada() != huella(df_fact):
+            almacen.guardar_en_segundo_plano(df_fact, dim_geo, dim_tiempo, huella(df_fact), crudo=huella(df_raw))
+        return 'etl'
+    if 'df_fact' in st.session_state:
+        return 'sesion'
+    # Tras un reinicio, el último modelo guardado en la bodega evita repetir el ETL
+    with etapa("modelo desde la bodega SQLite") as e:
+        modelo = almacen.cargar_modelo()
+        e.filas(len(modelo[0]) if modelo is not None else 0)
+    if modelo is None:
+        return None
+    st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'] = modelo
+    st.session_state['origen_modelo'] = 'bodega'
+    return 'bodega'
  
 def show_transform_tab():
     st.title("\U0001F4CA Dashboard Educativo: Modelo Estrella")
  
-    if 'df_raw' not in st.session_state:
+    try:
+        origen = preparar_modelo()
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    if origen is None:
         st.warning("\u26a0\ufe0f Primero debes cargar los datos desde la pestaña correspondiente.")
         return
- 
-    df = st.session_state['df_raw'].copy()
- 
-    # 🔄 Renombrar columnas en minúscula
-    df.columns = [c.lower() for c in df.columns]
- 
-    # 🔄 Limpieza general de departamento y municipio
-    df['departamento'] = df['departamento'].str.replace(",", "", regex=False).str.strip().str.title()
-    df['municipio'] = df['municipio'].str.replace(",", "", regex=False).str.strip().str.title()
- 
-    # ❌ Eliminar registros del nivel nacional
-    df = df[df['departamento'] != 'Nacional']
- 
-    # 🔄 Unificar San Andrés
-    df['departamento'] = df['departamento'].str.replace(
-        r"Archipielago De San Andres[,.].*Providencia Y Santa Catalina",
-        "San Andres",
-        regex=True
-    )
+    tiempos = st.session_state.get('tiempos_modelo', {})
+    if st.session_state.get('origen_modelo') == 'bodega':
+        st.info(f"🗄️ Modelo servido desde la bodega SQLite ({almacen.DW_PATH}).")
+ 
+    df_fact = st.session_state['df_fact']
+    dim_geo = st.session_state['dim_geo']
+    dim_tiempo = st.session_state['dim_tiempo']
+    vista = obtener_vista(df_fact, dim_geo, dim_tiempo)
+    cubo = obtener_cubo(vista)
+    # Copia particionada por año para las lecturas fila a fila (filtros y columnas en el disco)
+    particiones.escribir_en_segundo_plano(vista.df, huella(df_fact))
  
     st.markdown("""
     ### 🛠️ Etapas del Flujo de Trabajo
@@ -41,75 +99,83 @@ def show_transform_tab():
     st.markdown("---")
     st.subheader("1️⃣ Limpieza y Validación de Datos")
  
-    columnas_relevantes = [
-        'a_o', 'departamento', 'municipio', 'c_digo_departamento',
-        'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
-        'cobertura_neta', 'cobertura_bruta'
-    ]
-    columnas_faltantes = [col for col in columnas_relevantes if col not in df.columns]
-    if columnas_faltantes:
-        st.error(f"❌ Columnas faltantes: {columnas_faltantes}")
-        return
- 
-    df = df[columnas_relevantes]
-    for col in df.columns:
-        if col not in ['departamento', 'municipio', 'c_digo_departamento']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    df_clean = df.dropna()
- 
     col1, col2 = st.columns(2)
-    col1.metric("Registros originales", len(st.session_state['df_raw']))
-    col2.metric("Registros válidos", len(df_clean))
+    col1.metric("Registros originales", st.session_state.get('registros_originales', len(df_fact)))
+    col2.metric("Registros válidos", len(df_fact))
  
     # Verificación visual de registros de Bogotá
+    bogota = vista.df[vista.df['municipio'].str.contains("Bogotá", case=False, na=False)]
     st.markdown("\n**🔹 Registros de Bogotá luego de limpieza:**")
-    st.dataframe(df_clean[df_clean['municipio'].str.contains("Bogotá", na=False)][['a_o', 'municipio']].head(10))
+    st.dataframe(bogota[['a_o', 'municipio']].head(10))
  
     st.markdown("\n**🔹 Años únicos:**")
-    st.dataframe(df_clean[df_clean['municipio'].str.contains("Bogotá", na=False)][['a_o']].drop_duplicates())
+    st.dataframe(bogota[['a_o']].drop_duplicates())
  
     st.markdown("---")
     st.subheader("2️⃣ Dimensiones del Modelo Estrella")
  
-    def crear_dimension(df, cols, nombre, sort_col=None):
-        dim = df[cols].drop_duplicates()
-        if sort_col:
-            dim = dim.sort_values(by=sort_col)
-        dim = dim.reset_index(drop=True)
-        dim[f"id_{nombre}"] = dim.index + 1
-        return dim[[f"id_{nombre}"] + cols]
- 
-    dim_tiempo = crear_dimension(df_clean, ['a_o'], 'tiempo')
-    dim_geo = df_clean[['c_digo_departamento', 'departamento', 'municipio']].copy()
-    dim_geo = dim_geo.sort_values(by=['c_digo_departamento', 'municipio'])
-    dim_geo = dim_geo.drop_duplicates(subset=['c_digo_departamento'], keep='first').reset_index(drop=True)
-    dim_geo['id_geo'] = dim_geo.index + 1
-    dim_geo = dim_geo[['id_geo', 'c_digo_departamento', 'departamento', 'municipio']]
- 
     col3, col4 = st.columns(2)
     col3.metric("Dimensión Tiempo", len(dim_tiempo))
-    col4.metric("Dimensión Geográfica", len(dim_geo))
+    col4.metric("Dimensión Geográfica (municipios)", len(dim_geo))
+ 
+    with st.expander("🗺️ Códigos DIVIPOLA de la dimensión geográfica"):
+        # Las llaves de `dim_geo` ya son códigos DIVIPOLA: lo que el registro no resolvió quedó fuera
+        sin_codigo = dim_geo.attrs.get('sin_codigo', {})
+        col_a, col_b = st.columns(2)
+        col_a.metric("Departamentos", dim_geo['id_departamento'].nunique())
+        col_b.metric("Filas sin código (descartadas)", f"{sum(sin_codigo.values()):,}")
+        st.caption(f"Registro: {obtener_registro().origen}.")
+        if sin_codigo:
+            st.markdown("**Municipios sin código DIVIPOLA:**")
+            st.dataframe(pd.DataFrame([(d, m, n) for (d, m), n in sin_codigo.items()],
+                                      columns=['departamento', 'municipio', 'filas'])
+                         .sort_values('filas', ascending=False), hide_index=True)
  
     st.markdown("---")
     st.subheader("3️⃣ Tabla de Hechos")
  
-    df_fact = df_clean.merge(dim_tiempo, on='a_o') \
-                      .merge(dim_geo, on=['departamento', 'municipio', 'c_digo_departamento'], how='inner')
- 
-    df_fact = df_fact[['id_tiempo', 'id_geo',
-        'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
-        'cobertura_neta', 'cobertura_bruta']]
- 
     st.success(f"✅ Tabla de hechos construida con {len(df_fact):,} registros.")
-    st.session_state['df_fact'] = df_fact
-    st.session_state['dim_geo'] = dim_geo
-    st.session_state['dim_tiempo'] = dim_tiempo
+    if tiempos.get('cache'):
+        st.caption(f"⏱️ Modelo reutilizado en {tiempos['ms_total']:.1f} ms (sin repetir el pipeline).")
+    elif tiempos:
+        st.caption(f"⏱️ Pipeline ejecutado en {tiempos['ms_total']:.1f} ms.")
+ 
+    with st.expander("🧠 Memoria de la sesión"):
+        # El modelo sale de la memoria de `build_star_schema` o de la bodega: el mismo objeto para todas
+        reporte = reporte_memoria(st.session_state, compartidos=[df_fact, dim_geo, dim_tiempo])
+        st.dataframe(reporte.style.format({'MB': '{:.2f}'}), hide_index=True)
+        por_sesion = reporte.loc[~reporte['compartido'], 'MB'].sum()
+        datasets = datos_compartidos.resumen()
+        compartido = (bytes_objeto([vista, cubo, df_fact, dim_geo, dim_tiempo]) / 1024 ** 2
+                      + datasets['MB'].sum())
+        sesiones = st.number_input("Sesiones concurrentes", min_value=1, value=10, step=1)
+        col5, col6, col7 = st.columns(3)
+        col5.metric("Propio de la sesión", f"{por_sesion:.1f} MB")
+        col6.metric("Compartido por todas", f"{compartido:.1f} MB")
+        col7.metric("Estimado total", f"{por_sesion * sesiones + compartido:.1f} MB")
+        st.caption("Los datasets descargados, el modelo, la vista y el cubo están una sola vez en "
+                   "memoria por versión; cada sesión guarda referencias y su propio estado.")
+        if not datasets.empty:
+            st.markdown("**Datasets compartidos en el proceso**")
+            st.dataframe(datasets.style.format({'MB': '{:.1f}'}), hide_index=True)
+ 
+    with st.expander("🗄️ Bodega SQLite"):
+        if almacen.guardando():
+            st.info("💾 Guardando el modelo en la bodega en segundo plano...")
+        elif almacen.version_guardada() == huella(df_fact):
+            st.success(f"✅ El modelo actual está guardado en {almacen.DW_PATH}.")
+            nivel = st.selectbox("Nivel de agregación", list(almacen.NIVELES_SQL), key='nivel_sql')
+            inicio = time.perf_counter()
+            resultado = almacen.agregado(nivel)
+            st.caption(f"⏱️ Consulta SQL resuelta en {(time.perf_counter() - inicio) * 1000:.1f} ms.")
+            st.dataframe(resultado, hide_index=True)
+        else:
+            st.warning("⚠️ La bodega tiene otra versión del modelo.")
  
     st.markdown("---")
     st.subheader("4️⃣ Indicadores y Visualizaciones")
  
-    escolaridad_prom = df_fact.groupby('id_geo')[['tasa_matriculaci_n_5_16']].mean().reset_index()
-    escolaridad_prom = escolaridad_prom.merge(dim_geo, on='id_geo')
+    escolaridad_prom = cubo.tabla('municipio').reset_index()
     top_mpios = escolaridad_prom.sort_values(by='tasa_matriculaci_n_5_16', ascending=False).head(10)
  
     fig = px.bar(
@@ -120,32 +186,36 @@ def show_transform_tab():
         labels={'tasa_matriculaci_n_5_16': 'Tasa de Escolaridad (%)'},
         color_discrete_sequence=['#002855']
     )
-    st.plotly_chart(fig, use_container_width=True)
+    graficar(fig, "top 10 municipios", use_container_width=True)
  
-    cobertura_depto = df_fact.merge(dim_geo, on='id_geo') \
-        .groupby('departamento')['cobertura_neta'].mean().sort_values(ascending=False).head(10)
-    st.markdown("**🏩 Top Departamentos por Cobertura Neta Promedio**")
+    cobertura_depto = cubo.tabla('departamento')['cobertura_neta'].sort_values(ascending=False).head(10)
+    st.markdown("**🏩 Top Departamentos por Cobertura Neta Promedio (ponderada por población)**")
     st.dataframe(cobertura_depto.reset_index())
  
     st.markdown("---")
     st.subheader("5️⃣ Vista y Descarga de la Tabla de Hechos")
  
     st.dataframe(df_fact.head(50))
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_fact.to_excel(writer, index=False, sheet_name='TablaHechos')
-    output.seek(0)
  
-    st.download_button(
-        label="🗓️ Descargar Tabla de Hechos",
-        data=output,
-        file_name='tabla_hechos_educacion.xlsx',
-        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    # La exportación se genera solo al pedirla y se reutiliza mientras no cambien los datos
+    col8, col9 = st.columns([3, 1])
+    formato = col8.selectbox("Formato de descarga (hechos + dimensiones)", list(FORMATOS))
+    exportacion = exportacion_lista(formato, df_fact)
+    if exportacion is None and col9.button("📦 Preparar descarga"):
+        with st.spinner("Generando archivo..."), etapa(f"exportación {formato}", filas_entrada=len(df_fact)) as e:
+            exportacion = obtener_exportacion(formato, df_fact, dim_geo, dim_tiempo)
+            e.carga_util(exportacion['bytes'])
+    if exportacion is not None:
+        st.download_button(
+            label="🗓️ Descargar Tabla de Hechos",
+            data=exportacion['datos'],
+            file_name=exportacion['archivo'],
+            mime=exportacion['mime'])
+        st.caption(f"📄 {exportacion['bytes'] / 1024 ** 2:.1f} MB, generado en {exportacion['ms']:.0f} ms.")
  
     st.markdown("---")
     st.subheader("📈 Resumen por Departamento y Año")
  
-    df_fact_ext = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
-    resumen = df_fact_ext.groupby(['departamento', 'a_o'])[
-        ['tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta']].mean().reset_index()
+    resumen = cubo.tabla('departamento_anio')[
+        ['tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta']].reset_index()
     st.dataframe(resumen.head(20))
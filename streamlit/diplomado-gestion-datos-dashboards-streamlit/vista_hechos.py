@@ -0,0 +1,124 @@
+import threading
+import weakref
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import etapa
+
+# Columnas de las dimensiones que se copian a la vista como categóricas
+COLUMNAS_GEO = ['c_digo_departamento', 'departamento', 'municipio']
+
+# Una vista por versión del modelo estrella (identidad del DataFrame de hechos)
+_vistas: dict = {}
+_lock = threading.Lock()
+# Las sesiones que piden la misma vista a la vez esperan a la primera en vez de repetirla
+_construccion = threading.Lock()
+
+
+def _categorica(valores_dim: pd.Series, posiciones: np.ndarray) -> pd.Categorical:
+    """Lleva una columna de dimensión a las filas de hechos sin copiar textos."""
+    codigos, categorias = pd.factorize(valores_dim, sort=True)
+    return pd.Categorical.from_codes(codigos[posiciones], categories=categorias)
+
+
+# ===================================================================
+# Clase: VistaHechos
+# ===================================================================
+class VistaHechos:
+    """
+    Vista ancha (hechos + dimensiones) materializada una sola vez por versión del modelo.
+
+    Las columnas geográficas se guardan como categóricas y las posiciones por
+    departamento y por año quedan precalculadas, así que filtrar no recorre
+    toda la tabla ni repite los joins.
+    """
+
+    def __init__(self, df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame):
+        pos_geo = pd.Index(dim_geo['id_geo']).get_indexer(df_fact['id_geo'])
+        pos_tiempo = pd.Index(dim_tiempo['id_tiempo']).get_indexer(df_fact['id_tiempo'])
+
+        columnas = {
+            'id_tiempo': df_fact['id_tiempo'].to_numpy(),
+            'id_geo': df_fact['id_geo'].to_numpy(),
+            'a_o': dim_tiempo['a_o'].to_numpy()[pos_tiempo],
+        }
+        for col in COLUMNAS_GEO:
+            columnas[col] = _categorica(dim_geo[col], pos_geo)
+        for col in df_fact.columns.difference(['id_tiempo', 'id_geo'], sort=False):
+            columnas[col] = df_fact[col].to_numpy()
+        self.df = pd.DataFrame(columnas)
+
+        self._por_depto = self.df.groupby('departamento', observed=True).indices
+        self._por_anio = self.df.groupby('a_o').indices
+
+    def departamentos(self) -> list:
+        """Departamentos presentes, ordenados alfabéticamente."""
+        return sorted(self._por_depto)
+
+    def anios(self) -> list:
+        """Años presentes, en orden ascendente."""
+        return sorted(self._por_anio)
+
+    def contar(self, departamento: Optional[str] = None) -> int:
+        """Filas de un departamento (o de toda la vista) sin materializarlas."""
+        if departamento is None:
+            return len(self.df)
+        return len(self._por_depto.get(departamento, ()))
+
+    def filtrar(self, departamento: Optional[str] = None, anio=None,
+                columnas: Optional[list] = None) -> pd.DataFrame:
+        """
+        Devuelve las filas de un departamento y/o año, solo con las columnas pedidas.
+
+        Args:
+            departamento (str): Nombre del departamento (None = todos).
+            anio: Año (None = todos).
+            columnas (list): Columnas a devolver (None = todas).
+
+        Returns:
+            pd.DataFrame: Subconjunto de la vista. Sin filtros se devuelve la vista
+                compartida, que no debe modificarse en su lugar.
+        """
+        posiciones = None
+        if departamento is not None:
+            posiciones = self._por_depto.get(departamento, np.array([], dtype=np.int64))
+        if anio is not None:
+            del_anio = self._por_anio.get(anio, np.array([], dtype=np.int64))
+            posiciones = del_anio if posiciones is None else np.intersect1d(posiciones, del_anio)
+
+        df = self.df if columnas is None else self.df[columnas]
+        return df if posiciones is None else df.take(posiciones)
+
+
+# ===================================================================
+# Función: obtener_vista
+# ===================================================================
+def obtener_vista(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> VistaHechos:
+    """
+    Devuelve la vista desnormalizada del modelo estrella, construyéndola solo
+    la primera vez que se pide para este `df_fact`.
+
+    Returns:
+        VistaHechos: Vista compartida por todas las pestañas.
+    """
+    clave = id(df_fact)
+    with etapa("vista desnormalizada", filas_entrada=len(df_fact)) as e:
+        with _lock:
+            conocida = _vistas.get(clave)
+        if conocida and conocida[0]() is df_fact:
+            e.cache(True)
+            return conocida[1]
+
+        with _construccion:
+            with _lock:
+                conocida = _vistas.get(clave)
+            if conocida and conocida[0]() is df_fact:
+                e.cache(True)
+                return conocida[1]
+            vista = VistaHechos(df_fact, dim_geo, dim_tiempo)
+            e.cache(False).filas(len(vista.df))
+            with _lock:
+                _vistas[clave] = (weakref.ref(df_fact, lambda _, k=clave: _vistas.pop(k, None)), vista)
+    return vista
@@ -3,6 +3,14 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 
+import figuras
+import particiones
+from cubo_olap import obtener_cubo
+from instrumentacion import medir
+from modelo_estrella import huella
+from pronosticos import HORIZONTE, obtener_pronosticos
+from vista_hechos import obtener_vista
+
 def show_visualization_tab():
     st.header("📈 Visualizaciones por Departamento")
 
@@ -10,26 +18,75 @@ def show_visualization_tab():
         st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    dim_tiempo = st.session_state['dim_tiempo']
-
-    df = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
-
-    # ================================
-    # PRIMER GRÁFICO
-    # ================================
+    vista = obtener_vista(st.session_state['df_fact'], st.session_state['dim_geo'], st.session_state['dim_tiempo'])
+    # Agregados precalculados: los promedios por departamento se ponderan por población 5-16
+    cubo = obtener_cubo(vista)
+    # Las figuras se memorizan por versión de los datos (ver figuras.py)
+    version = huella(st.session_state['df_fact'])
+
+    # Pronóstico de todas las series a la vez, memorizado por versión (ver pronosticos.py).
+    # Apagado por defecto: leer los libros del DANE y ajustar no entra en la primera visita
+    pronostico = None
+    if st.toggle(f"🔮 Extender las series con el pronóstico a {HORIZONTE} años", value=False,
+                 key='pronostico_series'):
+        pronostico = obtener_pronosticos(cubo, version)
+        st.caption(f"Línea punteada: tendencia{' + población proyectada (DANE)' if pronostico.covariable else ''}, "
+                   f"ajustada a la vez para {pronostico.n_series:,} series de municipios y departamentos "
+                   f"en {pronostico.ms_ajuste:.0f} ms.")
+
+    # Cada gráfico con selector es un fragmento: cambiar su selector solo lo vuelve a
+    # ejecutar a él, sin reconstruir el mapa de calor ni la animación 3D
+    grafico_serie_matricula(vista, cubo, version, pronostico)
+    grafico_serie_cobertura_bruta(vista, cubo, version, pronostico)
+    grafico_burbujas(vista, cubo, version)
+    mapa_de_calor(cubo, version)
+    grafico_boxplot(vista, version)
+    grafico_3d(cubo, version)
+
+
+# ================================
+# PRIMER GRÁFICO
+# ================================
+@st.fragment
+@medir("gráfico: serie matrícula vs cobertura neta")
+def grafico_serie_matricula(vista, cubo, version, pronostico=None):
     st.subheader("📊 Serie de tiempo: Tasa de Matriculación vs Cobertura Neta")
 
-    deptos = sorted(df['departamento'].unique())
-    selected_depto_1 = st.selectbox("Selecciona un departamento (Gráfico 1)", deptos)
-
-    df_1 = df[df['departamento'] == selected_depto_1]
-    df_1 = df_1.groupby('a_o')[['tasa_matriculaci_n_5_16', 'cobertura_neta']].mean().reset_index()
+    deptos = vista.departamentos()
+    selected_depto_1 = st.selectbox("Selecciona un departamento (Gráfico 1)", deptos, key='depto_grafico_1')
+
+    figuras.mostrar("serie matrícula", version, (selected_depto_1, pronostico is not None),
+                    lambda ligero: figura_serie_matricula(cubo, selected_depto_1, ligero, pronostico),
+                    puntos=2 * len(vista.anios()), use_container_width=True)
+
+
+def agregar_pronostico(fig, historia, futuro, trazas, ligero=False):
+    """
+    Extiende con línea punteada cada serie de `trazas` [(columna, nombre, eje, color)]
+    desde su último año observado en `historia` hasta los años de `futuro`.
+    """
+    traza = go.Scattergl if ligero else go.Scatter
+    for columna, nombre, eje, color in trazas:
+        if columna not in futuro.columns or futuro.empty:
+            continue
+        observado = historia[['a_o', columna]].dropna().tail(1)
+        fig.add_trace(traza(
+            x=list(observado['a_o']) + list(futuro.index),
+            y=list(observado[columna]) + list(futuro[columna]),
+            name=f"{nombre} (pronóstico)",
+            mode='lines',
+            yaxis=eje,
+            line=dict(color=color, dash='dash')
+        ))
+
+
+def figura_serie_matricula(cubo, departamento, ligero=False, pronostico=None):
+    df_1 = cubo.serie_departamento(departamento)[['tasa_matriculaci_n_5_16', 'cobertura_neta']].reset_index()
+    traza = go.Scattergl if ligero else go.Scatter
 
     fig1 = go.Figure()
 
-    fig1.add_trace(go.Scatter(
+    fig1.add_trace(traza(
         x=df_1['a_o'],
         y=df_1['tasa_matriculaci_n_5_16'],
         name='Tasa de matriculación (5-16)',
@@ -38,7 +95,7 @@ def show_visualization_tab():
         line=dict(color='blue')
     ))
 
-    fig1.add_trace(go.Scatter(
+    fig1.add_trace(traza(
         x=df_1['a_o'],
         y=df_1['cobertura_neta'],
         name='Cobertura neta',
@@ -47,8 +104,14 @@ def show_visualization_tab():
         line=dict(color='orange')
     ))
 
+    if pronostico is not None:
+        agregar_pronostico(fig1, df_1, pronostico.departamento(departamento), [
+            ('tasa_matriculaci_n_5_16', 'Tasa de matriculación (5-16)', 'y1', 'blue'),
+            ('cobertura_neta', 'Cobertura neta', 'y2', 'orange'),
+        ], ligero)
+
     fig1.update_layout(
-        title=f"Serie de tiempo - {selected_depto_1}",
+        title=f"Serie de tiempo - {departamento}",
         xaxis=dict(title='Año'),
         yaxis=dict(
             title=dict(text='Tasa de Matriculación (%)', font=dict(color='blue')),
@@ -64,30 +127,46 @@ def show_visualization_tab():
         height=500,
         margin=dict(l=40, r=40, t=60, b=40)
     )
+    return fig1
 
-    st.plotly_chart(fig1, use_container_width=True)
 
-    # ================================
-    # SEGUNDO GRÁFICO
-    # ================================
+# ================================
+# SEGUNDO GRÁFICO
+# ================================
+@st.fragment
+@medir("gráfico: serie cobertura bruta")
+def grafico_serie_cobertura_bruta(vista, cubo, version, pronostico=None):
     st.subheader("📊 Serie de tiempo: Cobertura Bruta vs Otra Métrica")
 
-    selected_depto_2 = st.selectbox("Selecciona un departamento (Gráfico 2)", deptos, index=deptos.index(selected_depto_1))
+    deptos = vista.departamentos()
+    # Arranca en el departamento del Gráfico 1; después es independiente
+    inicial = st.session_state.get('depto_grafico_1')
+    selected_depto_2 = st.selectbox("Selecciona un departamento (Gráfico 2)", deptos, key='depto_grafico_2',
+                                    index=deptos.index(inicial) if inicial in deptos else 0)
+
+    figuras.mostrar("serie cobertura bruta", version, (selected_depto_2, pronostico is not None),
+                    lambda ligero: figura_serie_cobertura_bruta(cubo, selected_depto_2, ligero, pronostico),
+                    puntos=2 * len(vista.anios()), use_container_width=True)
+
 
-    df_2 = df[df['departamento'] == selected_depto_2]
-    df_2 = df_2.groupby('a_o')[['cobertura_bruta']].mean().reset_index()
+def figura_serie_cobertura_bruta(cubo, departamento, ligero=False, pronostico=None):
+    serie = cubo.serie_departamento(departamento)
+    traza = go.Scattergl if ligero else go.Scatter
 
     # Simulamos métrica adicional
-    if 'repitencia_secundaria' in df.columns:
-        df_2['otra_metrica'] = df[df['departamento'] == selected_depto_2].groupby('a_o')['repitencia_secundaria'].mean().values
+    columnas = ['cobertura_bruta', 'repitencia_secundaria' if 'repitencia_secundaria' in serie.columns
+                else 'tasa_matriculaci_n_5_16']
+    df_2 = serie[columnas].reset_index()
+    if 'repitencia_secundaria' in df_2.columns:
+        df_2['otra_metrica'] = df_2['repitencia_secundaria']
         nombre_metrica = 'Repitencia secundaria'
     else:
-        df_2['otra_metrica'] = df[df['departamento'] == selected_depto_2].groupby('a_o')['tasa_matriculaci_n_5_16'].mean().values
+        df_2['otra_metrica'] = df_2['tasa_matriculaci_n_5_16']
         nombre_metrica = 'Tasa de Matriculación (5-16)'
 
     fig2 = go.Figure()
 
-    fig2.add_trace(go.Scatter(
+    fig2.add_trace(traza(
         x=df_2['a_o'],
         y=df_2['cobertura_bruta'],
         name='Cobertura Bruta',
@@ -96,7 +175,7 @@ def show_visualization_tab():
         line=dict(color='green')
     ))
 
-    fig2.add_trace(go.Scatter(
+    fig2.add_trace(traza(
         x=df_2['a_o'],
         y=df_2['otra_metrica'],
         name=nombre_metrica,
@@ -105,8 +184,17 @@ def show_visualization_tab():
         line=dict(color='purple')
     ))
 
+    if pronostico is not None:
+        futuro = pronostico.departamento(departamento)
+        if 'repitencia_secundaria' in df_2.columns:
+            futuro = futuro.drop(columns='tasa_matriculaci_n_5_16')
+        agregar_pronostico(fig2, df_2, futuro.rename(columns={'tasa_matriculaci_n_5_16': 'otra_metrica'}), [
+            ('cobertura_bruta', 'Cobertura Bruta', 'y1', 'green'),
+            ('otra_metrica', nombre_metrica, 'y2', 'purple'),
+        ], ligero)
+
     fig2.update_layout(
-        title=f"Cobertura Bruta vs {nombre_metrica} - {selected_depto_2}",
+        title=f"Cobertura Bruta vs {nombre_metrica} - {departamento}",
         xaxis=dict(title='Año'),
         yaxis=dict(
             title=dict(text='Cobertura Bruta (%)', font=dict(color='green')),
@@ -122,28 +210,32 @@ def show_visualization_tab():
         height=500,
         margin=dict(l=40, r=40, t=60, b=40)
     )
+    return fig2
 
-    st.plotly_chart(fig2, use_container_width=True)
-        # ================================
-    # TERCER GRÁFICO - BURBUJAS
-    # ================================
-    st.subheader("🟢 Comparativo de Departamentos: Matrícula vs Cobertura (Gráfico de Burbujas)")
 
-    # Preparación del dataframe base
-    df_bubble = df[['departamento', 'a_o', 'tasa_matriculaci_n_5_16', 'cobertura_neta', 'poblaci_n_5_16']].copy()
-    df_bubble = df_bubble.dropna()
+# ================================
+# TERCER GRÁFICO - BURBUJAS
+# ================================
+@st.fragment
+@medir("gráfico: burbujas por año")
+def grafico_burbujas(vista, cubo, version):
+    st.subheader("🟢 Comparativo de Departamentos: Matrícula vs Cobertura (Gráfico de Burbujas)")
 
     # Selección del año
-    years = sorted(df_bubble['a_o'].unique())
+    years = vista.anios()
     selected_year = st.selectbox("Selecciona un año (Gráfico 3)", years, index=len(years)-1)
 
-    # Filtrar y agregar datos por departamento
-    df_filtered = df_bubble[df_bubble['a_o'] == selected_year]
-    df_grouped = df_filtered.groupby('departamento', as_index=False).agg({
-        'tasa_matriculaci_n_5_16': 'mean',
-        'cobertura_neta': 'mean',
-        'poblaci_n_5_16': 'mean'
-    })
+    figuras.mostrar("burbujas", version, (selected_year,),
+                    lambda ligero: figura_burbujas(cubo, selected_year, ligero),
+                    puntos=len(vista.departamentos()), use_container_width=True)
+
+
+def figura_burbujas(cubo, anio, ligero=False):
+    # Corte del año: tasas ponderadas y población total por departamento
+    df_grouped = cubo.corte_anio(anio)[['tasa_matriculaci_n_5_16', 'cobertura_neta']]
+    df_grouped['poblaci_n_5_16'] = cubo.corte_anio(anio, 'suma')['poblaci_n_5_16']
+    df_grouped = df_grouped.reset_index().dropna(
+        subset=['tasa_matriculaci_n_5_16', 'cobertura_neta', 'poblaci_n_5_16'])
 
     fig3 = px.scatter(
         df_grouped,
@@ -153,45 +245,57 @@ def show_visualization_tab():
         color='departamento',
         hover_name='departamento',
         size_max=60,
+        render_mode='webgl' if ligero else 'auto',
         labels={
             'cobertura_neta': 'Cobertura Neta (%)',
             'tasa_matriculaci_n_5_16': 'Tasa de Matrícula (%)',
             'poblaci_n_5_16': 'Población 5-16 años'
         },
-        title=f"Tasa de Matrícula vs Cobertura Neta - Año {selected_year}"
+        title=f"Tasa de Matrícula vs Cobertura Neta - Año {anio}"
     )
 
     fig3.update_layout(
         height=600,
         margin=dict(l=40, r=40, t=60, b=40)
     )
+    return fig3
 
-    st.plotly_chart(fig3, use_container_width=True)
 
-    # mapa de calor
+# mapa de calor
+@medir("gráfico: mapa de calor")
+def mapa_de_calor(cubo, version):
     st.subheader("🔥 Mapa de Calor Interactivo: Cobertura Neta por Departamento y Año")
 
-    df_heatmap = df.dropna(subset=['cobertura_neta'])
-
-    df_pivot = df_heatmap.pivot_table(
-        index='departamento',
-        columns='a_o',
-        values='cobertura_neta',
-        aggfunc='mean'
-    ).round(1).reset_index()
-
-    # Convertimos a formato largo
-    df_melted = df_pivot.melt(id_vars='departamento', var_name='a_o', value_name='cobertura_neta')
-
-    fig_heatmap = px.density_heatmap(
-        df_melted,
-        x='a_o',
-        y='departamento',
-        z='cobertura_neta',
-        color_continuous_scale='YlGnBu',
-        text_auto=True,
-        title="Mapa de Calor: Cobertura Neta Promedio por Departamento y Año"
-    )
+    figuras.mostrar("mapa de calor", version, (), lambda ligero: figura_mapa_de_calor(cubo, ligero),
+                    puntos=cubo.matriz('cobertura_neta').size, use_container_width=True)
+
+
+def figura_mapa_de_calor(cubo, ligero=False):
+    titulo = "Mapa de Calor: Cobertura Neta Promedio (ponderado por población) por Departamento y Año"
+    matriz = cubo.matriz('cobertura_neta').round(1)
+
+    if ligero:
+        # Con muchas celdas se envía la matriz ya agregada y sin el texto de cada celda
+        fig_heatmap = go.Figure(go.Heatmap(
+            z=matriz.to_numpy(),
+            x=matriz.columns,
+            y=matriz.index,
+            coloraxis='coloraxis'
+        ))
+        fig_heatmap.update_layout(title=titulo, coloraxis=dict(colorscale='YlGnBu'))
+    else:
+        # Convertimos a formato largo
+        df_melted = matriz.reset_index().melt(id_vars='departamento', var_name='a_o', value_name='cobertura_neta')
+
+        fig_heatmap = px.density_heatmap(
+            df_melted,
+            x='a_o',
+            y='departamento',
+            z='cobertura_neta',
+            color_continuous_scale='YlGnBu',
+            text_auto=True,
+            title=titulo
+        )
 
     fig_heatmap.update_layout(
         height=700,
@@ -200,43 +304,72 @@ def show_visualization_tab():
         coloraxis_colorbar=dict(title="Cobertura (%)"),
         margin=dict(l=0, r=0, t=60, b=0)
     )
-
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    return fig_heatmap
 
 
 # boxplot
-    # ================================
-    # GRÁFICO 3: Boxplot de cobertura neta por departamento con filtro individual
-    # ================================
+# ================================
+# GRÁFICO 3: Boxplot de cobertura neta por departamento con filtro individual
+# ================================
+@st.fragment
+@medir("gráfico: boxplot")
+def grafico_boxplot(vista, version):
     st.subheader("📊 Distribución de Cobertura Neta por Departamento")
 
+    deptos = vista.departamentos()
     selected_depto_3 = st.selectbox("Selecciona un departamento (Gráfico 3)", deptos)
 
-    df_3 = df[df['departamento'] == selected_depto_3]
+    # Las filas del departamento solo se leen si la figura no está memorizada
+    figuras.mostrar("boxplot", version, (selected_depto_3,),
+                    lambda ligero: figura_boxplot(cobertura_departamento(vista, version, selected_depto_3),
+                                                  selected_depto_3, ligero),
+                    puntos=vista.contar(selected_depto_3), use_container_width=True)
+
+
+def cobertura_departamento(vista, version, departamento):
+    # Con el dataset particionado listo se leen del disco solo las filas y columnas necesarias
+    if particiones.disponible(version):
+        return particiones.leer_hechos(version, departamento=departamento,
+                                       columnas=['departamento', 'cobertura_neta'])
+    return vista.filtrar(departamento=departamento, columnas=['departamento', 'cobertura_neta'])
 
-    fig3 = px.box(df_3, x='departamento', y='cobertura_neta', points='all', color='departamento')
+
+def figura_boxplot(df_3, departamento, ligero=False):
+    if ligero:
+        # Cuartiles calculados aquí y una muestra de los puntos, en vez de todos los valores
+        fig3 = go.Figure(figuras.caja_resumida(df_3['cobertura_neta'].to_numpy(dtype=float), departamento,
+                                               px.colors.qualitative.Plotly[0]))
+        fig3.update_layout(xaxis=dict(tickvals=[0], ticktext=[departamento], range=[-0.9, 0.5]),
+                           legend_title_text='departamento')
+    else:
+        fig3 = px.box(df_3, x='departamento', y='cobertura_neta', points='all', color='departamento')
     fig3.update_layout(
         xaxis_title="Departamento",
         yaxis_title="Cobertura Neta (%)",
         height=500
     )
-    st.plotly_chart(fig3, use_container_width=True)
+    return fig3
+
 
-         # ================================
-    # CUARTO GRÁFICO - GRÁFICO 3D INTERACTIVO CORREGIDO
-    # ================================
+# ================================
+# CUARTO GRÁFICO - GRÁFICO 3D INTERACTIVO CORREGIDO
+# ================================
+@medir("gráfico: 3D animado")
+def grafico_3d(cubo, version):
     st.subheader("🧊 Gráfico 3D: Matrícula, Cobertura y Población (Animado)")
 
-    df_3d = df[['departamento', 'a_o', 'tasa_matriculaci_n_5_16', 'cobertura_neta', 'poblaci_n_5_16']].dropna()
+    # scatter_3d ya es WebGL y sus puntos no pasan de departamentos × años: no tiene modo ligero
+    figuras.mostrar("3D animado", version, (), lambda ligero: figura_3d(cubo), use_container_width=True)
 
-    # Filtrar población válida (mayores a 500)
-    df_3d = df_3d[df_3d['poblaci_n_5_16'] > 500]
 
-    df_3d_grouped = df_3d.groupby(['departamento', 'a_o'], as_index=False).agg({
-        'tasa_matriculaci_n_5_16': 'mean',
-        'cobertura_neta': 'mean',
-        'poblaci_n_5_16': 'mean'
-    })
+def figura_3d(cubo):
+    df_3d_grouped = cubo.tabla('departamento_anio')[['tasa_matriculaci_n_5_16', 'cobertura_neta']]
+    df_3d_grouped['poblaci_n_5_16'] = cubo.tabla('departamento_anio', 'suma')['poblaci_n_5_16']
+    df_3d_grouped = df_3d_grouped.reset_index().dropna(
+        subset=['tasa_matriculaci_n_5_16', 'cobertura_neta', 'poblaci_n_5_16'])
+
+    # Filtrar población válida (mayores a 500)
+    df_3d_grouped = df_3d_grouped[df_3d_grouped['poblaci_n_5_16'] > 500]
 
     # Escala logarítmica para mejorar visibilidad si hay mucha disparidad
     fig3d = px.scatter_3d(
@@ -268,4 +401,5 @@ def show_visualization_tab():
         margin=dict(l=10, r=10, t=40, b=10)
     )
 
-    st.plotly_chart(fig3d, use_container_width=True)
+    # Cada cuadro lleva solo coordenadas y tamaños; el estilo viaja una vez
+    return figuras.aligerar_cuadros(fig3d, 'Año')